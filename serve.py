@@ -0,0 +1,19 @@
+#! /usr/bin/env python3
+
+# Copyright (C)
+# Author: alberto-ferrero
+
+""" Launch E2E Perfomance Simulator service, running the Simulation Requests posted to it """
+
+###############################################################################
+
+if __name__ == "__main__":
+    from src.orchestrator.service import serve, DEFAULT_SERVICE_ADDRESS, DEFAULT_SERVICE_PORT
+    from src.orchestrator.scheduler import DEFAULT_MAX_WORKERS
+    import argparse
+    parser = argparse.ArgumentParser(description="Run E2E Performance Simulator service")
+    parser.add_argument('-a', '--address', type=str, default=DEFAULT_SERVICE_ADDRESS, help="Address the service listens to")
+    parser.add_argument('-p', '--port', type=int, default=DEFAULT_SERVICE_PORT, help="Port the service listens to")
+    parser.add_argument('-w', '--workers', type=int, default=DEFAULT_MAX_WORKERS, help="Max number of modules run at the same time, for each simulation")
+    args = parser.parse_args()
+    serve(args.address, args.port, args.workers)
@@ -8,9 +8,14 @@
 ###############################################################################
 
 if __name__ == "__main__":
-    from src.orchestrator.main import main
+    from src.orchestrator.scheduler import DEFAULT_MAX_WORKERS
     import argparse
     parser = argparse.ArgumentParser(description="Run E2E Performance Simulator")
-    parser.add_argument('-i', '--input', type=str, help="E2E Simulation Request configuration file", required=True)
+    parser.add_argument('-i', '--input', type=str, help="E2E Simulation Request configuration file")
+    parser.add_argument('-r', '--resume', type=str, help="Output folder of an interrupted simulation, to be resumed skipping completed stages")
+    parser.add_argument('-w', '--workers', type=int, default=DEFAULT_MAX_WORKERS, help="Max number of modules run at the same time (1 to run them in sequence)")
     args = parser.parse_args()
-    main(args.input)
+    if not args.input and not args.resume:
+        parser.error("one of the arguments -i/--input or -r/--resume is required")
+    from src.orchestrator.main import main
+    main(args.input, args.workers, args.resume)
@@ -0,0 +1,79 @@
+#! /usr/bin/env python3
+
+# Copyright (C)
+# Author: alberto-ferrero
+
+""""
+Builtin air link budget engine, calculating link data in process instead of calling the Air Link Budget Calculator.
+
+Link data are got for all states, of all ground points in contact with a satellite, at once as arrays:
+slant range from satellite EME2000 positions and ground points Earth fixed positions, free space loss,
+parabolic antennas gains, EIRP, G/T and carrier to noise ratio, of uplink (ground to satellite) and of
+downlink (satellite to ground), from the antenna properties of the mapper. Link data have the same
+layout as the server ones: grId, utcTime, uCNR [dB], dCNR [dB].
+
+Receivers noise temperatures and antennas efficiency are fixed, no atmospheric or pointing losses.
+"""
+
+import numpy as np
+import pandas as pd
+
+from ..flightdynamics.contacts import getEarthFixedPositions, getTopocentricFrames
+
+#Speed of light [m/s] and Boltzmann constant [dBW/K/Hz]
+SPEED_OF_LIGHT = 299792458.0
+BOLTZMANN_CONSTANT_DB = -228.6
+
+#Parabolic antennas efficiency
+ANTENNA_EFFICIENCY = 0.6
+
+#Receivers system noise temperature [K]
+SATELLITE_NOISE_TEMPERATURE = 500.0
+GROUND_NOISE_TEMPERATURE = 150.0
+
+#Link data columns
+AIR_LINK_COLUMNS = ['grId', 'utcTime', 'uCNR', 'dCNR']
+
+def getAirLinksData(satelliteAntennaProperties: dict, grounds: list) -> pd.DataFrame:
+    """ Get link data of a satellite antenna with ground points, as list of (grId, location, ground antenna properties, states in contact),
+        all states of all ground points calculated at once
+    """
+    grounds = [ground for ground in grounds if ground[3] is not None and len(ground[3]) > 0]
+    if len(grounds) == 0:
+        return pd.DataFrame(columns=AIR_LINK_COLUMNS)
+    statesDf = pd.concat([ground[3] for ground in grounds], ignore_index=True)
+    counts = [len(ground[3]) for ground in grounds]
+    #Ground points positions and antennas, repeated for each state
+    groundPositions, _ = getTopocentricFrames([ground[1] for ground in grounds])
+    groundPositions = np.repeat(groundPositions, counts, axis=0)
+    groundTxSizes = np.repeat([float(ground[2]['txSize']) for ground in grounds], counts)
+    groundRxSizes = np.repeat([float(ground[2]['rxSize']) for ground in grounds], counts)
+    groundTxPowers = np.repeat([float(ground[2]['txPower']) for ground in grounds], counts)
+
+    positions = getEarthFixedPositions(statesDf[['X', 'Y', 'Z']].to_numpy(dtype=float), statesDf['timestamp'].to_numpy(dtype=np.int64))
+    distances = np.linalg.norm(positions - groundPositions, axis=-1)
+
+    uplinkCNR = getCarrierToNoiseRatios(distances, groundTxPowers, groundTxSizes, satelliteAntennaProperties['rxSize'],
+                                        satelliteAntennaProperties['uplinkFrequency'], satelliteAntennaProperties['uplinkBandwidth'], SATELLITE_NOISE_TEMPERATURE)
+    downlinkCNR = getCarrierToNoiseRatios(distances, satelliteAntennaProperties['txPower'], satelliteAntennaProperties['txSize'], groundRxSizes,
+                                          satelliteAntennaProperties['downlinkFrequency'], satelliteAntennaProperties['downlinkBandwidth'], GROUND_NOISE_TEMPERATURE)
+    return pd.DataFrame({'grId': np.repeat([ground[0] for ground in grounds], counts), 'utcTime': statesDf['utcTime'].to_numpy(),
+                         'uCNR': uplinkCNR, 'dCNR': downlinkCNR})
+
+def getCarrierToNoiseRatios(distances: np.ndarray, txPower, txSize, rxSize, frequency: float, bandwidth: float, noiseTemperature: float) -> np.ndarray:
+    """ Get carrier to noise ratio [dB] at distances [m], of transmitter power [W] and antenna size [m], and receiver antenna size [m],
+        at frequency [Hz], bandwidth [Hz] and receiver noise temperature [K]
+    """
+    eirp = 10 * np.log10(txPower) + getAntennaGain(txSize, frequency)
+    gainOverTemperature = getAntennaGain(rxSize, frequency) - 10 * np.log10(noiseTemperature)
+    return eirp - getFreeSpaceLoss(distances, frequency) + gainOverTemperature - BOLTZMANN_CONSTANT_DB - 10 * np.log10(bandwidth)
+
+def getAntennaGain(size, frequency: float):
+    """ Get gain [dBi] of parabolic antenna of diameter [m] at frequency [Hz] """
+    return 10 * np.log10(ANTENNA_EFFICIENCY * (np.pi * np.asarray(size, dtype=float) * frequency / SPEED_OF_LIGHT) ** 2)
+
+def getFreeSpaceLoss(distances: np.ndarray, frequency: float) -> np.ndarray:
+    """ Get free space loss [dB] at distances [m] and frequency [Hz] """
+    return 20 * np.log10(4 * np.pi * np.asarray(distances, dtype=float) * frequency / SPEED_OF_LIGHT)
+
+# -*- coding: utf-8 -*-
@@ -6,16 +6,18 @@
 import os
 import time
 
-from ..airlink.request import airlink, getAirLinkRequest
+from ..airlink.request import airlink, airlinkBatch, getAirLinkRequest, getAirLinkBatchRequests
+from ..airlink.linkbudget import getAirLinksData
 
 from ..orchestrator.preprocessor.preprocessor import readSatellites, readGroundStations, readUserTerminals
-from ..flightdynamics.filemanager import readCsvPropagationDataFilesAsDataframe
-from ..airlink.filemanager import saveAirLinkData, extractAirLinkDataFromCsv
+from ..orchestrator.preprocessor.utcells import getUserTerminalsWeights
+from ..flightdynamics.dataset import getPropagationDataset
+from ..airlink.filemanager import saveAirLinkData, extractAirLinkDataFromCsv, getAirLinkDataOutputPath
 from ..airlink.mapper import Band, getGrounStationAntennaProperties, getUserTerminalAntennaProperties, getSatelliteAntennaProperties
 
 from ..utils.results import AppResult
-from ..utils.timeconverter import getTimestampFromDate
-from ..utils.filemanager import saveDictToJson
+from ..utils.filemanager import getDfRecords
+from ..utils.manifest import getCompletedItems, setItemsCompleted, saveItemJournal, mergeItemsJournals
 
 """ E2E Performance Simulator Air Link Budget Calculator Handler """
 
@@ -26,65 +28,90 @@ def getAirLinkBudgetData(simulationRequest: dict, outputDataFolderPath: str, fli
 
     linkBudgetInfo = simulationRequest['modules']['airLinkBudget']
     
-    linkRequestFull = {}
+    journaledSatIds = []
+    airLinkBudgetDataOutputPath = getAirLinkDataOutputPath(outputDataFolderPath)
 
     #Define propagation data source
-    if linkBudgetInfo['data'] == 'run':
+    if linkBudgetInfo['data'] in ['run', 'builtin']:
 
-        print(' - Run Air Link Budget calculation, calling server at {}'.format(linkBudgetInfo['address']))
+        if linkBudgetInfo['data'] == 'builtin':
+            print(' - Run Air Link Budget calculation, with builtin link budget engine')
+        else:
+            print(' - Run Air Link Budget calculation, calling server at {}'.format(linkBudgetInfo['address']))
         tick = time.time()
         
-        print('   - Calculate air link budget propagation of {} satellites, {} ground stations, {} user terminals'.format(len(simulationRequest['satellites']), len(simulationRequest['groundstations']), len(simulationRequest['userterminals'])))
         print('   - Calculating air link for contacts from {} to {} ...'.format(simulationRequest['simulationWindow']['start'].replace("T", " at ").replace("Z", ""), simulationRequest['simulationWindow']['end'].replace("T", " at ").replace("Z", "")))
         
-        url = linkBudgetInfo['address']
+        url = linkBudgetInfo.get('address')
+        #Ground points per request, if batched
+        maxGroundsPerRequest = linkBudgetInfo.get('properties', {}).get('maxGroundsPerRequest')
 
         #Load assets
         satellites = readSatellites(simulationRequest)
         groundstations = readGroundStations(simulationRequest)
         userterminals = readUserTerminals(simulationRequest)
+        print('   - Calculate air link budget propagation of {} satellites, {} ground stations, {} user terminals in {} points'.format(len(satellites), len(groundstations), sum(getUserTerminalsWeights(userterminals).values()), len(userterminals)))
 
-        #Read propagation data, from Flight Dynamics calculation
-        propagationDataFrame = readCsvPropagationDataFilesAsDataframe(flightDynamicsDataOutputPath)
+        #Get propagation data, from Flight Dynamics calculation
+        propagationDataset = getPropagationDataset(flightDynamicsDataOutputPath)
+
+        #Resume satellites completed in a previous run, their link requests kept in their journals
+        completedSatIds = getCompletedItems(outputDataFolderPath, 'airLinkBudget')
+        journaledSatIds = [sat['id'] for sat in satellites]
+        if completedSatIds:
+            print('   - Resuming, {} satellites already calculated'.format(len(completedSatIds)))
 
         #Get Air Link Budget request, for each satellite, considering calculated contacts
         
         for sat in satellites:
             satId = sat['id']
-            #Get contacts and group by ground stations and user terminals
-            contactsDf = propagationDataFrame[satId]['contactList']
-            statesDf = propagationDataFrame[satId]['orbitStateList']
-            statesDf['timestamp'] = statesDf['utcTime'].apply(getTimestampFromDate)
+            if satId in completedSatIds:
+                continue
+            #Get states in contacts windows, grouped by ground stations and user terminals
+            contactsDf = propagationDataset.getContacts(satId)
+            contactStates = propagationDataset.getStateIndex(satId).getStatesByArgument(contactsDf)
 
-            #Calculate air link budget for groundstations and user terminals
-            airLinkData = []
+            #Get ground points in contact, groundstations and user terminals, grouped by satellite antenna
+            groundsGroups = []
 
             #Check if satellite has Ka connection, to link with user terminal
             if 'Ka' in [ant['band'] for ant in sat['antennas']]:
-                satelliteAntennaProperties = getSatelliteAntennaProperties(Band.Ka)
-                for ut in userterminals:
-                    groundAntennaProperties = getUserTerminalAntennaProperties(ut['class'])
-                    airLinkRequest = getAirLinkRequest(satId, satelliteAntennaProperties, statesDf, contactsDf, ut['id'], ut['location'], groundAntennaProperties)
-                    #Call air link budget calculation and save
-                    if airLinkRequest != {}:
-                        linkRequestFull[satId] = airLinkRequest
-                        airLinkDataRes: AppResult = airlink(url, airLinkRequest)
-                        airLinkData.extend(airLinkDataRes.result[satId])
+                grounds = [(ut['id'], ut['location'], getUserTerminalAntennaProperties(ut['class']), contactStates.get(ut['id'])) for ut in userterminals]
+                groundsGroups.append((getSatelliteAntennaProperties(Band.Ka), grounds))
 
             #Check if satellite has S connection, to link with user terminal
             if 'S' in [ant['band'] for ant in sat['antennas']]:
-                satelliteAntennaProperties = getSatelliteAntennaProperties(Band.S)
-                groundAntennaProperties = getGrounStationAntennaProperties(Band.S)
-                for gs in groundstations:
-                    airLinkRequest = getAirLinkRequest(satId, satelliteAntennaProperties, statesDf, contactsDf, gs['id'], gs['location'], groundAntennaProperties)
-                    #Call air link budget calculation and save
-                    if airLinkRequest != {}:
-                        linkRequestFull[satId] = airLinkRequest
+                grounds = [(gs['id'], gs['location'], getGrounStationAntennaProperties(Band.S), contactStates.get(gs['id'])) for gs in groundstations]
+                groundsGroups.append((getSatelliteAntennaProperties(Band.S), grounds))
+
+            #Calculate air link budget with builtin engine, or call server for each couple or in batches of ground points, journaling all requests
+            airLinkData = []
+            satLinkRequests = []
+            for satelliteAntennaProperties, grounds in groundsGroups:
+                if linkBudgetInfo['data'] == 'builtin':
+                    airLinkData.extend(getDfRecords(getAirLinksData(satelliteAntennaProperties, grounds)))
+                    continue
+                airLinkRequests = [getAirLinkRequest(satId, satelliteAntennaProperties, statesDf, grId, location, groundAntennaProperties)
+                                   for grId, location, groundAntennaProperties, statesDf in grounds]
+                airLinkRequests = [airLinkRequest for airLinkRequest in airLinkRequests if airLinkRequest != {}]
+                if maxGroundsPerRequest:
+                    for airLinkBatchRequest in getAirLinkBatchRequests(satId, satelliteAntennaProperties, airLinkRequests, maxGroundsPerRequest):
+                        satLinkRequests.append(airLinkBatchRequest)
+                        airLinkDataRes: AppResult = airlinkBatch(url, airLinkBatchRequest)
+                        for ground in airLinkBatchRequest['grounds']:
+                            airLinkData.extend(airLinkDataRes.result[ground['id']])
+                else:
+                    for airLinkRequest in airLinkRequests:
+                        satLinkRequests.append(airLinkRequest)
                         airLinkDataRes: AppResult = airlink(url, airLinkRequest)
                         airLinkData.extend(airLinkDataRes.result[satId])
 
             #Save for satId
-            airLinkBudgetDataOutputPath = saveAirLinkData(outputDataFolderPath, airLinkData)
+            airLinkBudgetDataOutputPath = saveAirLinkData(outputDataFolderPath, satId, airLinkData)
+            #Journal of satellite requests, not kept in memory for the whole constellation
+            if satLinkRequests:
+                saveItemJournal(airLinkBudgetDataOutputPath, 'linkrequest', satId, satLinkRequests)
+            setItemsCompleted(outputDataFolderPath, 'airLinkBudget', [satId])
             
         print('   - Air Link Budget calculation completed in {:.4f} seconds'.format(time.time() - tick))
     
@@ -95,7 +122,7 @@ def getAirLinkBudgetData(simulationRequest: dict, outputDataFolderPath: str, fli
         for satId in airLinkDataRes:
             airLinkBudgetDataOutputPath = saveAirLinkData(outputDataFolderPath, satId, airLinkDataRes[satId])
     
-    saveDictToJson(linkRequestFull, os.path.join(airLinkBudgetDataOutputPath, 'linkrequest.json'))
+    mergeItemsJournals(airLinkBudgetDataOutputPath, 'linkrequest', journaledSatIds, os.path.join(airLinkBudgetDataOutputPath, 'linkrequest.json'))
     
     print('   - Saved Propagation Data in output folder {}'.format(airLinkBudgetDataOutputPath))        
     return airLinkBudgetDataOutputPath
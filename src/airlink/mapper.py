@@ -5,6 +5,7 @@
 
 """ E2E Performance Simulator Air Link Budget Calculator Handler: Antenna properties mapper """
 
+import numpy as np
 from enum import Enum
 
 class Band(str, Enum):
@@ -24,6 +25,11 @@ def getClassFromThroughput(th: float) -> Class:
     else:
         return Class.LARGE
 
+def getClassesFromThroughputs(ths) -> list:
+    """ Get classes of throughputs, as getClassFromThroughput for an array of throughputs """
+    classes = [Class.SMALL, Class.MEDIUM, Class.LARGE]
+    return [classes[c] for c in np.searchsorted([100, 2000], np.asarray(ths, dtype=float), side='left').tolist()]
+
 def getSatelliteAntennaProperties(satBand: Band):
     """ Get antenna properties for satellite """
     if satBand == Band.S:
@@ -6,27 +6,63 @@
 """ E2E Performance Simulator Air Link Budget Calculator Handler: REST API Requests """
 
 from ..utils.results import AppResult
+from ..utils.tracer import span
+from ..utils.filemanager import getDfRecords
 import pandas as pd
 import requests
 import json
 
 def airlink(url: str, airLinkRequest: dict) -> dict:
     """ Call the Air Link Budget Calculator and get link data """
-    payload = json.dumps(airLinkRequest)
-    response = requests.request("POST", url,
-                                headers={'Content-Type': 'application/json'},
-                                data=payload).json()
+    with span('air link request', 'http', satellite=airLinkRequest['satellite']['id'], ground=airLinkRequest['ground']['id']):
+        payload = json.dumps(airLinkRequest)
+        response = requests.request("POST", url,
+                                    headers={'Content-Type': 'application/json'},
+                                    data=payload).json()
     if 'status' in response:
         return AppResult(response['status'], airLinkRequest, response['error'])
     else:
         return AppResult(200, airLinkRequest, response)
 
-def getAirLinkRequest(satId: str, satelliteAntennaProperties: dict, statesDf: pd.DataFrame, contactsDf: pd.DataFrame, antennaId: str, antennaLocation: dict, antennatProperties: dict) -> dict:
-    """ For couple Satellite-GroundPoint, get all satellite states in between contacts, and assets communication properties """
-    airLinkRequest = {}
-    poiContactsDf = contactsDf[contactsDf['argumentOfInterestId'] == antennaId]
+def airlinkBatch(url: str, airLinkBatchRequest: dict) -> dict:
+    """ Call the Air Link Budget Calculator with a batch of ground points of a satellite, and get link data by ground point """
+    satId = airLinkBatchRequest['satellite']['id']
+    groundIds = [ground['id'] for ground in airLinkBatchRequest['grounds']]
+    with span('air link batch request', 'http', satellite=satId, grounds=len(groundIds)):
+        payload = json.dumps(airLinkBatchRequest)
+        response = requests.request("POST", url,
+                                    headers={'Content-Type': 'application/json'},
+                                    data=payload).json()
+    if 'status' in response:
+        return AppResult(response['status'], airLinkBatchRequest, response['error'])
+    else:
+        return AppResult(200, airLinkBatchRequest, getGroundsLinkData(satId, groundIds, response))
+
+def getGroundsLinkData(satId: str, groundIds: list, response: dict) -> dict:
+    """ Split link data of a batch response by ground point id, in order of ground points of the batch request """
+    groundsLinkData = {groundId: [] for groundId in groundIds}
+    for linkData in response.get(satId, []):
+        #Link data of a single ground point batch may not repeat its id
+        groundId = linkData.get('grId', groundIds[0] if len(groundIds) == 1 else None)
+        if groundId not in groundsLinkData:
+            raise Exception('ERROR: air link data of satellite {} for ground point {}, not in batch request'.format(satId, groundId))
+        groundsLinkData[groundId].append(linkData)
+    return groundsLinkData
+
+def getAirLinkBatchRequests(satId: str, satelliteAntennaProperties: dict, airLinkRequests: list, maxGroundsPerRequest: int) -> list:
+    """ Merge air link requests of a satellite, with the same satellite antenna, in batch requests of up to max ground points,
+        each ground point with its states in contact windows
+    """
+    batchRequests = []
+    for i in range(0, len(airLinkRequests), maxGroundsPerRequest):
+        grounds = [dict(airLinkRequest['ground'], states=airLinkRequest['satellite']['states']) for airLinkRequest in airLinkRequests[i:i + maxGroundsPerRequest]]
+        batchRequests.append({'satellite': {'id': satId, 'antenna': satelliteAntennaProperties}, 'grounds': grounds})
+    return batchRequests
+
+def getAirLinkRequest(satId: str, satelliteAntennaProperties: dict, contactStatesDf: pd.DataFrame, antennaId: str, antennaLocation: dict, antennatProperties: dict) -> dict:
+    """ For couple Satellite-GroundPoint, get all satellite states in between contacts, as got from satellite state index, and assets communication properties """
     airLinkRequest = {}
-    if len(poiContactsDf) > 0:
+    if contactStatesDf is not None:
         # Build Point of Interest (poi) properties
         airLinkRequest['ground'] = {}
         airLinkRequest['ground']['id'] = antennaId
@@ -37,16 +73,11 @@ def getAirLinkRequest(satId: str, satelliteAntennaProperties: dict, statesDf: pd
         airLinkRequest['satellite']['id'] = satId
         airLinkRequest['satellite']['antenna'] = satelliteAntennaProperties
         # Get states for each contact window
-        airLinkRequest['satellite']['states'] = getContactStates(poiContactsDf, statesDf)
+        airLinkRequest['satellite']['states'] = getContactStates(contactStatesDf)
     return airLinkRequest
 
-def getContactStates(poiContacts: pd.DataFrame, states: pd.DataFrame) -> list:
-    #Build intervals
-    intervals = [pd.Interval(poiContacts.iloc[i]['startTimestamp'], poiContacts.iloc[i]['endTimestamp'], 'both') for i in range(len(poiContacts))]
-    #Get states inside intervales
-    mask = states['timestamp'].apply(lambda x: any([x in interval for interval in intervals]))
-    filteredStates = states[mask]
-    filteredStates = filteredStates[['utcTime', 'X', 'Y', 'Z']]
-    return filteredStates.T.apply(lambda x: x.dropna().to_dict()).tolist()
+def getContactStates(contactStatesDf: pd.DataFrame) -> list:
+    """ Get states in contact windows as records """
+    return getDfRecords(contactStatesDf[['utcTime', 'X', 'Y', 'Z']])
 
 # -*- coding: utf-8 -*-
@@ -0,0 +1,378 @@
+#! /usr/bin/env python3
+
+# Copyright (C)
+# Author: alberto-ferrero
+
+""""
+Local contacts engine, detecting contacts in process from builtin propagation of the assets orbits.
+
+Contacts are detected on a time grid of detection step, and are the runs of consecutive visible times
+of each pair, their start and end refined by bisection to the millisecond. Contacts have the same layout
+as the server ones.
+
+Ground contacts (POI) of each satellite with each point of interest: satellites ground tracks are put
+in a KD-tree, and only satellite positions and points of interest closer than the satellite footprint
+are checked for elevation. Max elevation is refined by golden section search.
+
+Space contacts (ISV) between satellites, of the pairs listed as space contacts, or of all pairs closer
+than a max range: satellites positions are hashed in cells as large as the max range, and only satellites
+in neighbour cells are checked. Line of sight is clear if not crossing the WGS84 ellipsoid raised of the
+grazing altitude. Azimuth and elevation are in the satellite nadir pointing frame, elevation toward nadir.
+
+Earth fixed frame is got from EME2000 with IAU-76 precession and Greenwich mean sidereal time,
+neglecting nutation and polar motion.
+"""
+
+import numpy as np
+import pandas as pd
+from itertools import product
+
+from .propagator import Ephemeris, getUtcTimes, getNadirFrames, UNIX_EPOCH_JD
+from .dataset import CONTACT_COLUMNS
+
+#WGS84 ellipsoid
+WGS84_A = 6378137.0
+WGS84_B = 6356752.314245
+WGS84_E2 = 6.69437999014e-3
+
+#Detection step [ms], min elevation [deg] and footprint margin [deg], for positions close to the footprint edge
+DEFAULT_CONTACTS_STEP = 60000
+DEFAULT_MIN_ELEVATION = 0.0
+FOOTPRINT_MARGIN = 0.5
+
+#Space contacts: altitude [m] of line of sight grazing the Earth
+DEFAULT_GRAZING_ALTITUDE = 0.0
+
+#Max satellite positions checked at once, to limit memory
+MAX_CHUNK_POSITIONS = 500000
+
+#Refinement: bisection iterations of start and end, and golden section iterations of max elevation
+BISECTION_ITERATIONS = 24
+GOLDEN_SECTION_ITERATIONS = 30
+
+def getLocalGroundContacts(propagationRequest: dict, assets: list, j2: bool = False, step: int = DEFAULT_CONTACTS_STEP) -> dict:
+    """ Get ground contacts of assets with points of interest of Propagation Request, as satId: contacts list """
+    scenario = propagationRequest['scenario']
+    contacts = getGroundContacts(Ephemeris(assets, j2), propagationRequest['pointsOfInterest'], scenario['startTimestamp'], scenario['endTimestamp'], step)
+    return {satId: getContactRecords(contactsDf) for satId, contactsDf in contacts.items()}
+
+def getLocalSpaceContacts(propagationRequest: dict, assets: list, j2: bool = False, step: int = DEFAULT_CONTACTS_STEP, allPairs: bool = False,
+                          maxRange: float = None, grazingAltitude: float = DEFAULT_GRAZING_ALTITUDE) -> dict:
+    """ Get space contacts of assets with satellites of Propagation Request, of their listed space contacts or of all pairs
+        closer than max range, as satId: contacts list
+    """
+    scenario = propagationRequest['scenario']
+    satIds = [sat['id'] for sat in propagationRequest['assets']]
+    pairs = None
+    if not allPairs:
+        satIndices = {satId: i for i, satId in enumerate(satIds)}
+        pairs = sorted(set([tuple(sorted((satIndices[sat['id']], satIndices[soiId]))) for sat in assets for soiId in sat['spaceContacts'] if soiId != sat['id']]))
+        pairs = np.array(pairs, dtype=np.int64).reshape(-1, 2)
+    contacts = getSpaceContacts(Ephemeris(propagationRequest['assets'], j2), scenario['startTimestamp'], scenario['endTimestamp'], step, pairs, maxRange, grazingAltitude)
+    return {sat['id']: getContactRecords(contacts[sat['id']]) for sat in assets}
+
+def getContactRecords(contactsDf: pd.DataFrame) -> list:
+    """ Get contacts dataframe as list of contact dicts, from columns as lists, much faster than by rows """
+    return [dict(zip(CONTACT_COLUMNS, row)) for row in zip(*[contactsDf[column].tolist() for column in CONTACT_COLUMNS])]
+
+def getGroundContacts(ephemeris: Ephemeris, pointsOfInterest: list, startTimestamp: int, endTimestamp: int,
+                      step: int = DEFAULT_CONTACTS_STEP, minElevation: float = DEFAULT_MIN_ELEVATION) -> dict:
+    """ Get contacts of ephemeris satellites with points of interest, as satId: contacts dataframe """
+    from scipy.spatial import cKDTree
+
+    contacts = {satId: pd.DataFrame(columns=CONTACT_COLUMNS) for satId in ephemeris.satIds}
+    if not pointsOfInterest or not ephemeris.satIds:
+        return contacts
+    timestamps = np.append(np.arange(startTimestamp, endTimestamp, max(int(step), 1), dtype=np.int64), np.int64(endTimestamp))
+    poiIds = [poi['id'] for poi in pointsOfInterest]
+    poiPositions, poiFrames = getTopocentricFrames(pointsOfInterest)
+    poiTree = cKDTree(poiPositions / np.linalg.norm(poiPositions, axis=1, keepdims=True))
+
+    #Visible satellite, point of interest and time, as keys sorting by pair then time, checking positions in chunks of times
+    nPois, nTimes = len(pointsOfInterest), len(timestamps)
+    poiUps = poiFrames[:, 2, :]
+    minSinElevation = np.sin(np.radians(minElevation))
+    visibleKeys, visibleSinElevations = [], []
+    chunkSize = max(1, MAX_CHUNK_POSITIONS // len(ephemeris.satIds))
+    for chunkStart in range(0, nTimes, chunkSize):
+        chunkTimestamps = timestamps[chunkStart:chunkStart + chunkSize]
+        positions = getEarthFixedPositions(ephemeris.getStates(chunkTimestamps)[0], chunkTimestamps)
+        radii = np.linalg.norm(positions, axis=-1)
+        #Prune with footprint of the highest satellite, as chord among directions
+        footprintAngle = getFootprintAngle(np.max(radii), minElevation) + np.radians(FOOTPRINT_MARGIN)
+        satTree = cKDTree((positions / radii[..., None]).reshape(-1, 3))
+        pairs = satTree.sparse_distance_matrix(poiTree, 2 * np.sin(min(footprintAngle, np.pi) / 2), output_type='ndarray')
+        if len(pairs) == 0:
+            continue
+        satIndices, timeIndices = np.divmod(pairs['i'], len(chunkTimestamps))
+        poiIndices = pairs['j']
+        relative = positions[satIndices, timeIndices] - poiPositions[poiIndices]
+        sinElevations = np.einsum('ij,ij->i', relative, poiUps[poiIndices]) / np.linalg.norm(relative, axis=-1)
+        isVisible = sinElevations >= minSinElevation
+        visibleKeys.append((satIndices[isVisible].astype(np.int64) * nPois + poiIndices[isVisible]) * nTimes + timeIndices[isVisible] + chunkStart)
+        visibleSinElevations.append(sinElevations[isVisible])
+    if not visibleKeys:
+        return contacts
+    visibleKeys, visibleSinElevations = np.concatenate(visibleKeys), np.concatenate(visibleSinElevations)
+
+    #Contacts, as runs of consecutive visible times of each satellite and point of interest
+    order, runIds, pairKeys, firstIndices, lastIndices = getVisibilityRuns(visibleKeys, nTimes)
+    satIndices, poiIndices = np.divmod(pairKeys, nPois)
+    #Highest visible time of each run
+    visibleSinElevations, timeIndices = visibleSinElevations[order], visibleKeys[order] % nTimes
+    isMax = visibleSinElevations == np.maximum.reduceat(visibleSinElevations, np.flatnonzero(np.diff(runIds, prepend=-1)))[runIds]
+    maxIndices = timeIndices[isMax][np.unique(runIds[isMax], return_index=True)[1]]
+
+    def getPairElevations(pairTimestamps: np.ndarray) -> tuple:
+        positions = getEarthFixedPositions(ephemeris.getPairStates(satIndices, pairTimestamps)[0], pairTimestamps)
+        return getElevations(positions, poiPositions[poiIndices], poiFrames[poiIndices])
+
+    startTimestamps, endTimestamps = getCrossingTimestamps(lambda pairTimestamps: getPairElevations(pairTimestamps)[0] >= minElevation,
+                                                           timestamps, firstIndices, lastIndices)
+    maxTimestamps = refineMaxElevation(getPairElevations,
+                                       np.maximum(timestamps[np.maximum(maxIndices - 1, 0)], startTimestamps),
+                                       np.minimum(timestamps[np.minimum(maxIndices + 1, len(timestamps) - 1)], endTimestamps))
+
+    contactsDf = pd.DataFrame({'satIndex': satIndices, 'size': 'triple', 'argumentOfInterestId': np.array(poiIds, dtype=object)[poiIndices],
+                               'contactType': 'POI', 'durationInMillis': endTimestamps - startTimestamps})
+    for event, eventTimestamps in [('start', startTimestamps), ('maxElevation', maxTimestamps), ('end', endTimestamps)]:
+        elevations, azimuths, distances = getPairElevations(eventTimestamps)
+        contactsDf[event + 'UtcTime'] = getUtcTimes(eventTimestamps)
+        contactsDf[event + 'Azimuth'] = azimuths
+        contactsDf[event + 'Elevation'] = elevations
+        contactsDf[event + 'Distance'] = distances
+    contactsDf['startTimestamp'] = startTimestamps
+    contactsDf = contactsDf.sort_values(['satIndex', 'startTimestamp', 'argumentOfInterestId'], kind='stable')
+    for satIndex, satContactsDf in contactsDf.groupby('satIndex', sort=False):
+        contacts[ephemeris.satIds[satIndex]] = satContactsDf[CONTACT_COLUMNS].reset_index(drop=True)
+    return contacts
+
+def getSpaceContacts(ephemeris: Ephemeris, startTimestamp: int, endTimestamp: int, step: int = DEFAULT_CONTACTS_STEP, pairs: np.ndarray = None,
+                     maxRange: float = None, grazingAltitude: float = DEFAULT_GRAZING_ALTITUDE) -> dict:
+    """ Get line of sight contacts among ephemeris satellites, of pairs of indices if given, else of all pairs closer than max range [m],
+        as satId: contacts dataframe
+    """
+    contacts = {satId: pd.DataFrame(columns=CONTACT_COLUMNS) for satId in ephemeris.satIds}
+    if pairs is None and maxRange is None:
+        raise Exception('ERROR: space contacts among all satellites require a max range')
+    if (pairs is not None and len(pairs) == 0) or len(ephemeris.satIds) < 2:
+        return contacts
+    timestamps = np.append(np.arange(startTimestamp, endTimestamp, max(int(step), 1), dtype=np.int64), np.int64(endTimestamp))
+    nSats, nTimes = len(ephemeris.satIds), len(timestamps)
+    maxRange = np.inf if maxRange is None else maxRange
+
+    #Visible pairs and times, as keys sorting by pair then time, checking positions in chunks of times
+    visibleKeys = []
+    chunkSize = max(1, MAX_CHUNK_POSITIONS // (len(pairs) if pairs is not None else nSats))
+    for chunkStart in range(0, nTimes, chunkSize):
+        chunkTimestamps = timestamps[chunkStart:chunkStart + chunkSize]
+        positions = ephemeris.getStates(chunkTimestamps)[0]
+        if pairs is not None:
+            satIndices, soiIndices = np.repeat(pairs[:, 0], len(chunkTimestamps)), np.repeat(pairs[:, 1], len(chunkTimestamps))
+            timeIndices = np.tile(np.arange(len(chunkTimestamps)), len(pairs))
+        else:
+            satIndices, soiIndices, timeIndices = getSpatialHashPairs(positions, maxRange)
+        isClear, distances = getLineOfSight(positions[satIndices, timeIndices], positions[soiIndices, timeIndices], grazingAltitude)
+        isVisible = isClear & (distances <= maxRange)
+        visibleKeys.append((satIndices[isVisible] * nSats + soiIndices[isVisible]) * nTimes + timeIndices[isVisible] + chunkStart)
+    visibleKeys = np.concatenate(visibleKeys)
+    if len(visibleKeys) == 0:
+        return contacts
+
+    #Contacts, as runs of consecutive visible times of each pair
+    _, _, pairKeys, firstIndices, lastIndices = getVisibilityRuns(visibleKeys, nTimes)
+    firstSatIndices, secondSatIndices = np.divmod(pairKeys, nSats)
+
+    def isPairVisible(pairTimestamps: np.ndarray) -> np.ndarray:
+        isClear, distances = getLineOfSight(ephemeris.getPairStates(firstSatIndices, pairTimestamps)[0],
+                                            ephemeris.getPairStates(secondSatIndices, pairTimestamps)[0], grazingAltitude)
+        return isClear & (distances <= maxRange)
+
+    startTimestamps, endTimestamps = getCrossingTimestamps(isPairVisible, timestamps, firstIndices, lastIndices)
+
+    #Contact of each satellite of the pair with the other one, seen from its own frame
+    satIds = np.array(ephemeris.satIds, dtype=object)
+    contactsDfs = []
+    for satIndices, soiIndices in [(firstSatIndices, secondSatIndices), (secondSatIndices, firstSatIndices)]:
+        contactsDf = pd.DataFrame({'satIndex': satIndices, 'size': 'double', 'argumentOfInterestId': satIds[soiIndices],
+                                   'contactType': 'ISV', 'durationInMillis': endTimestamps - startTimestamps})
+        for event, eventTimestamps in [('start', startTimestamps), ('end', endTimestamps)]:
+            positions, velocities = ephemeris.getPairStates(satIndices, eventTimestamps)
+            azimuths, elevations, distances = getRelativeDirections(positions, velocities, ephemeris.getPairStates(soiIndices, eventTimestamps)[0])
+            contactsDf[event + 'UtcTime'] = getUtcTimes(eventTimestamps)
+            contactsDf[event + 'Azimuth'] = azimuths
+            contactsDf[event + 'Elevation'] = elevations
+            contactsDf[event + 'Distance'] = distances
+        contactsDf['startTimestamp'] = startTimestamps
+        contactsDfs.append(contactsDf)
+    contactsDf = pd.concat(contactsDfs, ignore_index=True)
+    for column in ['maxElevationUtcTime', 'maxElevationAzimuth', 'maxElevationElevation', 'maxElevationDistance']:
+        contactsDf[column] = np.nan
+    contactsDf = contactsDf.sort_values(['satIndex', 'argumentOfInterestId', 'startTimestamp'], kind='stable')
+    for satIndex, satContactsDf in contactsDf.groupby('satIndex', sort=False):
+        contacts[ephemeris.satIds[satIndex]] = satContactsDf[CONTACT_COLUMNS].reset_index(drop=True)
+    return contacts
+
+def getSpatialHashPairs(positions: np.ndarray, cellSize: float) -> tuple:
+    """ Get pairs of satellites, first index lower than second, and times, with positions (satellites x times x 3)
+        in the same or neighbour cells of size cellSize [m], so closer than cell size
+    """
+    nTimes = positions.shape[1]
+    cells = np.floor(positions / cellSize).astype(np.int64)
+    #Non negative cells, with room for neighbours
+    cells = cells - cells.min(axis=(0, 1)) + 1
+    size = int(cells.max()) + 2
+    keys = ((np.arange(nTimes, dtype=np.int64)[None, :] * size + cells[..., 0]) * size + cells[..., 1]) * size + cells[..., 2]
+    order = np.argsort(keys, axis=None, kind='stable')
+    sortedKeys = keys.ravel()[order]
+    satIndices, timeIndices = np.divmod(order, nTimes)
+    firstIndices, secondIndices, pairTimeIndices = [], [], []
+    for dx, dy, dz in product([-1, 0, 1], repeat=3):
+        neighbourKeys = sortedKeys + (dx * size + dy) * size + dz
+        lower, upper = np.searchsorted(sortedKeys, neighbourKeys, 'left'), np.searchsorted(sortedKeys, neighbourKeys, 'right')
+        counts = upper - lower
+        first = np.repeat(np.arange(len(sortedKeys)), counts)
+        second = np.repeat(lower - np.cumsum(counts) + counts, counts) + np.arange(np.sum(counts))
+        isLower = satIndices[first] < satIndices[second]
+        firstIndices.append(satIndices[first][isLower])
+        secondIndices.append(satIndices[second][isLower])
+        pairTimeIndices.append(timeIndices[first][isLower])
+    return np.concatenate(firstIndices), np.concatenate(secondIndices), np.concatenate(pairTimeIndices)
+
+def getLineOfSight(positions: np.ndarray, otherPositions: np.ndarray, grazingAltitude: float) -> tuple:
+    """ Get if line of sight between positions does not cross the Earth ellipsoid raised of grazing altitude [m], and distances [m] """
+    relative = otherPositions - positions
+    distances = np.linalg.norm(relative, axis=-1)
+    #Scale along polar axis, so that the raised ellipsoid is a sphere, and get the point of the segment closest to Earth center
+    scale = np.array([1.0, 1.0, (WGS84_A + grazingAltitude) / (WGS84_B + grazingAltitude)])
+    positions, relative = positions * scale, relative * scale
+    closest = np.clip(-np.sum(positions * relative, axis=-1) / np.maximum(np.sum(relative * relative, axis=-1), 1e-9), 0, 1)
+    return np.linalg.norm(positions + closest[..., None] * relative, axis=-1) > WGS84_A + grazingAltitude, distances
+
+def getRelativeDirections(positions: np.ndarray, velocities: np.ndarray, otherPositions: np.ndarray) -> tuple:
+    """ Get azimuth [deg], elevation toward nadir [deg] and distance [m] of other positions, in satellites nadir pointing frame """
+    x, y, z = getNadirFrames(positions, velocities)
+    relative = otherPositions - positions
+    distances = np.linalg.norm(relative, axis=-1)
+    azimuths = np.mod(np.degrees(np.arctan2(np.sum(relative * y, axis=-1), np.sum(relative * x, axis=-1))), 360.0)
+    elevations = np.degrees(np.arcsin(np.clip(np.sum(relative * z, axis=-1) / distances, -1, 1)))
+    return azimuths, elevations, distances
+
+def getVisibilityRuns(visibleKeys: np.ndarray, nTimes: int) -> tuple:
+    """ Get runs of consecutive visible times of each pair, from keys of visible pair and time (pair * nTimes + time):
+        sort order of keys, run of each sorted key, and for each run pair key, first and last time indices
+    """
+    order = np.argsort(visibleKeys, kind='stable')
+    pairKeys, timeIndices = np.divmod(visibleKeys[order], nTimes)
+    isNewRun = np.ones(len(order), dtype=bool)
+    isNewRun[1:] = (pairKeys[1:] != pairKeys[:-1]) | (timeIndices[1:] != timeIndices[:-1] + 1)
+    runStarts = np.flatnonzero(isNewRun)
+    runEnds = np.append(runStarts[1:], len(order)) - 1
+    return order, np.cumsum(isNewRun) - 1, pairKeys[runStarts], timeIndices[runStarts], timeIndices[runEnds]
+
+def getCrossingTimestamps(isVisibleAt, timestamps: np.ndarray, firstIndices: np.ndarray, lastIndices: np.ndarray) -> tuple:
+    """ Get start and end times [ms] of runs of visible times, refined between last not visible and first visible times,
+        unless at the time window limits
+    """
+    startTimestamps = refineCrossing(isVisibleAt, timestamps[np.maximum(firstIndices - 1, 0)], timestamps[firstIndices])
+    endTimestamps = refineCrossing(isVisibleAt, timestamps[np.minimum(lastIndices + 1, len(timestamps) - 1)], timestamps[lastIndices])
+    startTimestamps = np.where(firstIndices == 0, timestamps[0], startTimestamps)
+    endTimestamps = np.where(lastIndices == len(timestamps) - 1, timestamps[-1], endTimestamps)
+    return startTimestamps, endTimestamps
+
+def refineCrossing(isVisibleAt, outTimestamps: np.ndarray, inTimestamps: np.ndarray) -> np.ndarray:
+    """ Refine by bisection the time [ms] of visibility change, between not visible and visible times """
+    outTimestamps, inTimestamps = outTimestamps.copy(), inTimestamps.copy()
+    for _ in range(BISECTION_ITERATIONS):
+        if np.all(np.abs(inTimestamps - outTimestamps) <= 1):
+            break
+        midTimestamps = (outTimestamps + inTimestamps) // 2
+        isVisible = isVisibleAt(midTimestamps)
+        inTimestamps = np.where(isVisible, midTimestamps, inTimestamps)
+        outTimestamps = np.where(isVisible, outTimestamps, midTimestamps)
+    return inTimestamps
+
+def refineMaxElevation(getPairElevations, lowerTimestamps: np.ndarray, upperTimestamps: np.ndarray) -> np.ndarray:
+    """ Refine by golden section search the time of max elevation [ms], between lower and upper times """
+    ratio = (np.sqrt(5) - 1) / 2
+    lower, upper = lowerTimestamps.astype(float), upperTimestamps.astype(float)
+    left, right = upper - ratio * (upper - lower), lower + ratio * (upper - lower)
+    leftElevations = getPairElevations(np.round(left).astype(np.int64))[0]
+    rightElevations = getPairElevations(np.round(right).astype(np.int64))[0]
+    for _ in range(GOLDEN_SECTION_ITERATIONS):
+        if np.all(upper - lower <= 1):
+            break
+        #Keep the side of the highest point, evaluating only one new point
+        isLeftHigher = leftElevations >= rightElevations
+        lower, upper = np.where(isLeftHigher, lower, left), np.where(isLeftHigher, right, upper)
+        left, right, leftElevations, rightElevations = (
+            np.where(isLeftHigher, upper - ratio * (upper - lower), right),
+            np.where(isLeftHigher, left, lower + ratio * (upper - lower)),
+            np.where(isLeftHigher, 0.0, rightElevations),
+            np.where(isLeftHigher, leftElevations, 0.0))
+        elevations = getPairElevations(np.round(np.where(isLeftHigher, left, right)).astype(np.int64))[0]
+        leftElevations = np.where(isLeftHigher, elevations, leftElevations)
+        rightElevations = np.where(isLeftHigher, rightElevations, elevations)
+    return np.round((lower + upper) / 2).astype(np.int64)
+
+def getTopocentricFrames(pointsOfInterest: list) -> tuple:
+    """ Get Earth fixed positions [m] of points of interest, and their east, north, up unit vectors as n x 3 x 3 array """
+    latitudes = np.radians([float(poi['latitude']) for poi in pointsOfInterest])
+    longitudes = np.radians([float(poi['longitude']) for poi in pointsOfInterest])
+    altitudes = np.array([float(poi.get('altitude', 0)) for poi in pointsOfInterest])
+    N = WGS84_A / np.sqrt(1 - WGS84_E2 * np.sin(latitudes) ** 2)
+    positions = np.stack([(N + altitudes) * np.cos(latitudes) * np.cos(longitudes),
+                          (N + altitudes) * np.cos(latitudes) * np.sin(longitudes),
+                          (N * (1 - WGS84_E2) + altitudes) * np.sin(latitudes)], axis=-1)
+    east = np.stack([-np.sin(longitudes), np.cos(longitudes), np.zeros_like(longitudes)], axis=-1)
+    north = np.stack([-np.sin(latitudes) * np.cos(longitudes), -np.sin(latitudes) * np.sin(longitudes), np.cos(latitudes)], axis=-1)
+    up = np.stack([np.cos(latitudes) * np.cos(longitudes), np.cos(latitudes) * np.sin(longitudes), np.sin(latitudes)], axis=-1)
+    return positions, np.stack([east, north, up], axis=1)
+
+def getElevations(positions: np.ndarray, poiPositions: np.ndarray, poiFrames: np.ndarray) -> tuple:
+    """ Get elevation [deg], azimuth [deg] and distance [m] of Earth fixed positions, seen from points of interest """
+    relative = positions - poiPositions
+    distances = np.linalg.norm(relative, axis=-1)
+    enu = np.einsum('nij,nj->ni', poiFrames, relative)
+    elevations = np.degrees(np.arcsin(np.clip(enu[:, 2] / distances, -1, 1)))
+    azimuths = np.mod(np.degrees(np.arctan2(enu[:, 1], enu[:, 0])), 360.0)
+    return elevations, azimuths, distances
+
+def getFootprintAngle(radius: float, minElevation: float) -> float:
+    """ Get Earth central angle [rad] of footprint of a satellite at radius [m], for min elevation, on the minor axis sphere """
+    elevation = np.radians(minElevation)
+    return np.arccos(min(1.0, WGS84_B * np.cos(elevation) / radius)) - elevation
+
+def getEarthFixedPositions(positions: np.ndarray, timestamps: np.ndarray) -> np.ndarray:
+    """ Get Earth fixed positions [m] from EME2000 positions at timestamps [ms], timestamps being the second to last axis,
+        with precession at the middle time, being almost constant along a simulation window
+    """
+    positions = positions @ getPrecessionRotation((np.min(timestamps) + np.max(timestamps)) / 2).T
+    gmst = getGreenwichSiderealTime(timestamps)
+    cos, sin = np.cos(gmst), np.sin(gmst)
+    return np.stack([cos * positions[..., 0] + sin * positions[..., 1], -sin * positions[..., 0] + cos * positions[..., 1], positions[..., 2]], axis=-1)
+
+def getPrecessionRotation(timestamp: float) -> np.ndarray:
+    """ Get IAU-76 precession rotation, from EME2000 to mean of date frame at timestamp [ms] """
+    T = (timestamp / 86400000.0 + UNIX_EPOCH_JD - 2451545.0) / 36525.0
+    arcsec = np.pi / 648000
+    zeta = (2306.2181 * T + 0.30188 * T ** 2 + 0.017998 * T ** 3) * arcsec
+    theta = (2004.3109 * T - 0.42665 * T ** 2 - 0.041833 * T ** 3) * arcsec
+    z = (2306.2181 * T + 1.09468 * T ** 2 + 0.018203 * T ** 3) * arcsec
+    return getFrameRotation(-z, 2) @ getFrameRotation(theta, 1) @ getFrameRotation(-zeta, 2)
+
+def getGreenwichSiderealTime(timestamps: np.ndarray) -> np.ndarray:
+    """ Get Greenwich mean sidereal time [rad] at timestamps [ms], UT1 taken as UTC """
+    T = (timestamps / 86400000.0 + UNIX_EPOCH_JD - 2451545.0) / 36525.0
+    return np.radians(np.mod(67310.54841 + (876600 * 3600 + 8640184.812866) * T + 0.093104 * T ** 2 - 6.2e-6 * T ** 3, 86400.0) / 240.0)
+
+def getFrameRotation(angle: float, axis: int) -> np.ndarray:
+    """ Get rotation of frame by angle [rad] around axis (0 x, 1 y, 2 z) """
+    cos, sin = np.cos(angle), np.sin(angle)
+    rotation = np.eye(3)
+    i, j = [k for k in range(3) if k != axis]
+    rotation[i, i], rotation[j, j] = cos, cos
+    rotation[i, j], rotation[j, i] = (sin, -sin) if axis != 1 else (-sin, sin)
+    return rotation
+
+# -*- coding: utf-8 -*-
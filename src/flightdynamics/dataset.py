@@ -0,0 +1,154 @@
+#! /usr/bin/env python3
+
+# Copyright (C)
+# Author: alberto-ferrero
+
+""""
+Propagation dataset, shared in process among the modules consuming Flight Dynamics data.
+
+The Flight Dynamics handler builds the dataset while propagating, and registers it with its
+output folder, so that link budgets and analysis get orbit states and contacts as dataframes,
+with timestamps already parsed, without reading back the csv files. If no dataset is registered
+for a folder (data cached, or resumed run), it is loaded once from the csv files.
+
+Only the most recently used datasets are kept, so that a long running process (service mode)
+reuses them among runs without growing in memory.
+"""
+
+import threading
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+
+from ..utils.timeconverter import getTimestampsFromDates
+from .filemanager import readCsvPropagationDataFilesAsDataframe
+
+#Columns of contacts list, to define also empty contacts dataframes
+CONTACT_COLUMNS = ['size', 'argumentOfInterestId', 'contactType', 'durationInMillis',
+                   'startUtcTime', 'startAzimuth', 'startElevation', 'startDistance',
+                   'maxElevationUtcTime', 'maxElevationAzimuth', 'maxElevationElevation', 'maxElevationDistance',
+                   'endUtcTime', 'endAzimuth', 'endElevation', 'endDistance']
+
+#Max number of datasets kept in memory
+MAX_PROPAGATION_DATASETS = 8
+
+datasetsLock = threading.Lock()
+datasets = OrderedDict()
+
+class StateIndex:
+    """ Orbit states of a satellite, with timestamps sorted once, to get states in contact windows, or at times, by binary search """
+    def __init__(self, statesDf: pd.DataFrame):
+        self.statesDf: pd.DataFrame = statesDf
+        timestamps = statesDf['timestamp'].to_numpy(dtype=np.int64) if len(statesDf) > 0 else np.array([], dtype=np.int64)
+        self.order: np.ndarray = np.argsort(timestamps, kind='stable')
+        self.timestamps: np.ndarray = timestamps[self.order]
+
+    def getWindowsMask(self, startTimestamps, endTimestamps) -> np.ndarray:
+        """ Get mask of states inside any of the windows, start and end included, in states order """
+        first = np.searchsorted(self.timestamps, np.asarray(startTimestamps, dtype=np.int64), side='left')
+        last = np.searchsorted(self.timestamps, np.asarray(endTimestamps, dtype=np.int64), side='right')
+        #Union of windows, as count of windows open at each sorted state
+        opened = np.zeros(len(self.timestamps) + 1, dtype=np.int64)
+        np.add.at(opened, first[first < last], 1)
+        np.add.at(opened, last[first < last], -1)
+        mask = np.empty(len(self.timestamps), dtype=bool)
+        mask[self.order] = np.cumsum(opened[:-1]) > 0
+        return mask
+
+    def getStates(self, startTimestamps, endTimestamps) -> pd.DataFrame:
+        """ Get states inside any of the windows, start and end included """
+        return self.statesDf[self.getWindowsMask(startTimestamps, endTimestamps)]
+
+    def getStatesByArgument(self, contactsDf: pd.DataFrame) -> dict:
+        """ Get states inside contacts windows, for each argument of interest of contacts, in one pass, as argumentOfInterestId: states """
+        statesByArgument = {}
+        for argId, argContactsDf in contactsDf.groupby('argumentOfInterestId', sort=False):
+            statesByArgument[argId] = self.getStates(argContactsDf['startTimestamp'], argContactsDf['endTimestamp'])
+        return statesByArgument
+
+    def getStatesIndexes(self, timestamps) -> np.ndarray:
+        """ Get positions in states of the only state at each timestamp, -1 if none or more than one """
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        first = np.searchsorted(self.timestamps, timestamps, side='left')
+        last = np.searchsorted(self.timestamps, timestamps, side='right')
+        return np.where(last - first == 1, self.order[np.minimum(first, len(self.order) - 1)] if len(self.order) > 0 else -1, -1)
+
+class PropagationDataset:
+    """ Orbit states and contacts of each satellite, with parsed timestamps """
+    def __init__(self):
+        self.orbitStates: dict = {}
+        self.contacts: dict = {}
+        self.stateIndexes: dict = {}
+
+    def addSatellitesData(self, propagationData: dict):
+        """ Add propagation data, as satId: orbitStateList, contactList """
+        for satId, satData in propagationData.items():
+            self.setOrbitStates(satId, pd.DataFrame(satData.get('orbitStateList', [])))
+            self.setContacts(satId, pd.DataFrame(satData.get('contactList', [])))
+
+    def setOrbitStates(self, satId: str, statesDf: pd.DataFrame):
+        #Timestamps parsed, unless already read from columnar files
+        if len(statesDf) > 0 and 'timestamp' not in statesDf.columns:
+            statesDf['timestamp'] = getTimestampsFromDates(statesDf['utcTime'])
+        self.orbitStates[satId] = statesDf
+        self.stateIndexes.pop(satId, None)
+
+    def setContacts(self, satId: str, contactsDf: pd.DataFrame):
+        if len(contactsDf) == 0:
+            contactsDf = pd.DataFrame(columns=CONTACT_COLUMNS)
+        if 'startTimestamp' not in contactsDf.columns or 'endTimestamp' not in contactsDf.columns:
+            contactsDf['startTimestamp'] = getTimestampsFromDates(contactsDf['startUtcTime'])
+            contactsDf['endTimestamp'] = getTimestampsFromDates(contactsDf['endUtcTime'])
+        self.contacts[satId] = contactsDf
+
+    def getSatIds(self) -> list:
+        return sorted(self.orbitStates.keys())
+
+    def getOrbitStates(self, satId: str) -> pd.DataFrame:
+        """ Get copy of orbit states of satellite, with timestamp column """
+        return self.orbitStates[satId].copy()
+
+    def getStateIndex(self, satId: str) -> StateIndex:
+        """ Get index of orbit states of satellite, built only the first time """
+        if satId not in self.stateIndexes:
+            self.stateIndexes[satId] = StateIndex(self.getOrbitStates(satId))
+        return self.stateIndexes[satId]
+
+    def getContacts(self, satId: str, contactType: str = None) -> pd.DataFrame:
+        """ Get copy of contacts of satellite, filtered by type if given, with start and end timestamp columns """
+        contactsDf = self.contacts.get(satId, pd.DataFrame(columns=CONTACT_COLUMNS + ['startTimestamp', 'endTimestamp']))
+        if contactType:
+            return contactsDf[contactsDf['contactType'] == contactType].copy()
+        return contactsDf.copy()
+
+def registerPropagationDataset(flightDynamicsDataOutputPath: str, dataset: PropagationDataset):
+    """ Register dataset of Flight Dynamics output folder, dropping the least recently used ones """
+    with datasetsLock:
+        datasets[flightDynamicsDataOutputPath] = dataset
+        datasets.move_to_end(flightDynamicsDataOutputPath)
+        while len(datasets) > MAX_PROPAGATION_DATASETS:
+            datasets.popitem(last=False)
+
+def linkPropagationDataset(flightDynamicsDataPath: str, linkedPath: str):
+    """ Register dataset of a Flight Dynamics folder also for its copy, if registered """
+    with datasetsLock:
+        dataset = datasets.get(flightDynamicsDataPath)
+    if dataset is not None:
+        registerPropagationDataset(linkedPath, dataset)
+
+def getPropagationDataset(flightDynamicsDataOutputPath: str) -> PropagationDataset:
+    """ Get dataset of Flight Dynamics output folder, loading it from csv, or parquet or feather, files if not registered """
+    with datasetsLock:
+        if flightDynamicsDataOutputPath in datasets:
+            datasets.move_to_end(flightDynamicsDataOutputPath)
+            return datasets[flightDynamicsDataOutputPath]
+        dataset = PropagationDataset()
+        propagationData = readCsvPropagationDataFilesAsDataframe(flightDynamicsDataOutputPath)
+        for satId, satData in propagationData.items():
+            if 'orbitStateList' in satData:
+                dataset.setOrbitStates(satId, pd.DataFrame(satData['orbitStateList']))
+                dataset.setContacts(satId, pd.DataFrame(satData.get('contactList', [])))
+    registerPropagationDataset(flightDynamicsDataOutputPath, dataset)
+    return dataset
+
+# -*- coding: utf-8 -*-
@@ -7,8 +7,9 @@ import os
 import pandas as pd
 
 from ..utils.results import AppResult
-from ..utils.filemanager import makeOutputFolder, saveListDictToCsv
-from ..utils.filemanager import readLocalCsvToDict, readRemoteCsvToDict, readRemoteCsvToDf, readLocalCsvToDf
+from ..utils.filemanager import makeOutputFolder, saveListDictToCsv, saveDfToColumnar, readColumnarToDf, getDfRecords
+from ..utils.filemanager import readRemoteCsvToDf, readLocalCsvToDf
+from ..utils.timeconverter import getTimestampsFromDates
 
 #Define Propagation Data csv file tag
 PROPAGATION_DATA_FILES_MAP = {
@@ -16,54 +17,86 @@ PROPAGATION_DATA_FILES_MAP = {
     "contactList": "contacts"
 }
 
+#Propagation Data storage formats, as file extensions, columnar ones first when looking for files
+PROPAGATION_DATA_FORMATS = ['parquet', 'feather', 'csv']
+
+#Epoch millis columns of columnar formats, from UTC time columns
+PROPAGATION_DATA_TIMESTAMP_COLUMNS = {
+    "orbitStateList": {"timestamp": "utcTime"},
+    "contactList": {"startTimestamp": "startUtcTime", "endTimestamp": "endUtcTime"}
+}
+
+#Default max number of propagation data files read in parallel
+DEFAULT_MAX_PARALLEL_READS = 8
+
 """ E2E Performance Simulator Flight Dynamics Provider Handler: File Manager """
 
-def readCsvPropagationDataFiles(flightDynamicsDataPath: str, source: str = 'local', filesMap: dict = PROPAGATION_DATA_FILES_MAP) -> list:
-    """ Read csv propagation data files and validate
+def readCsvPropagationDataFiles(flightDynamicsDataPath: str, source: str = 'local', filesMap: dict = PROPAGATION_DATA_FILES_MAP,
+                                maxParallelReads: int = DEFAULT_MAX_PARALLEL_READS) -> list:
+    """ Read csv, or parquet or feather, propagation data files as lists of records
         source 'local' from local repository, source 'remote' from remote git repository 
     """
-    import glob
-    propagationData = {}
-    for propagationDataEntry, propgationDataFile in filesMap.items():
-        #Build file name as convention /path/satId-stateTag.csv
-        for filePath in glob.glob(os.path.join(flightDynamicsDataPath, "*_" + propgationDataFile + ".csv")):
-            satId = filePath.split(os.sep)[-1].split("_")[0]
-            if satId not in propagationData:
-                propagationData[satId] = {}
-            #Read from file
-            if source == 'local':
-                orbitDataParsed = readLocalCsvToDict(filePath)
-            else:
-                orbitDataParsed = readRemoteCsvToDict(filePath)
-            propagationData[satId][propagationDataEntry] = orbitDataParsed
-    if propagationData == {}:
-        raise Exception("ERROR: in folder {}, no compatible Flight Dynamics Propagation Data found.".format(flightDynamicsDataPath))
-    return propagationData
+    return getPropagationDataRecords(readCsvPropagationDataFilesAsDataframe(flightDynamicsDataPath, source, filesMap, maxParallelReads))
 
-def readCsvPropagationDataFilesAsDataframe(flightDynamicsDataPath: str, source: str = 'local', filesMap: dict = PROPAGATION_DATA_FILES_MAP) -> pd.DataFrame:
-    """ Read csv propagation data files and validate
+def readCsvPropagationDataFilesAsDataframe(flightDynamicsDataPath: str, source: str = 'local', filesMap: dict = PROPAGATION_DATA_FILES_MAP,
+                                           maxParallelReads: int = DEFAULT_MAX_PARALLEL_READS) -> dict:
+    """ Read csv, or parquet or feather, propagation data files as dataframes, columnar ones with epoch millis columns,
+        files read in parallel, up to max parallel reads
         source 'local' from local repository, source 'remote' from remote git repository 
     """
     import glob
-    propagationData = {}
+    from concurrent.futures import ThreadPoolExecutor
+    fileFormat = getPropagationDataFormat(flightDynamicsDataPath)
+    #Build file name as convention /path/satId-stateTag.csv
+    files = []
     for propagationDataEntry, propgationDataFile in filesMap.items():
-        #Build file name as convention /path/satId-stateTag.csv
-        for filePath in glob.glob(os.path.join(flightDynamicsDataPath, "*_" + propgationDataFile + ".csv")):
-            satId = filePath.split(os.sep)[-1].split("_")[0]
-            if satId not in propagationData:
-                propagationData[satId] = {}
-            #Read from file
-            if source == 'local':
-                orbitDataParsed = readLocalCsvToDf(filePath)
-            else:
-                orbitDataParsed = readRemoteCsvToDf(filePath)
-            propagationData[satId][propagationDataEntry] = orbitDataParsed
-    if propagationData == {}:
+        for filePath in sorted(glob.glob(os.path.join(flightDynamicsDataPath, "*_" + propgationDataFile + "." + fileFormat))):
+            files.append((filePath.split(os.sep)[-1].split("_")[0], propagationDataEntry, filePath))
+    if files == []:
         raise Exception("ERROR: in folder {}, no compatible Flight Dynamics Propagation Data found.".format(flightDynamicsDataPath))
+    #Read from files
+    with ThreadPoolExecutor(max_workers=max(min(maxParallelReads, len(files)), 1)) as executor:
+        dfs = list(executor.map(lambda file: readPropagationDataFile(file[2], fileFormat, source), files))
+    propagationData = {}
+    for (satId, propagationDataEntry, _), df in zip(files, dfs):
+        if satId not in propagationData:
+            propagationData[satId] = {}
+        propagationData[satId][propagationDataEntry] = df
     return propagationData
 
-def savePropagationData(outputDataFolderPath: str, propagationData: AppResult):
-    """ Save to output/data/flightdynamics """
+def readPropagationDataFile(filePath: str, fileFormat: str, source: str = 'local') -> pd.DataFrame:
+    """ Read propagation data file as dataframe, empty if file has no rows """
+    if fileFormat != 'csv':
+        df = readColumnarToDf(filePath)
+    elif source == 'local':
+        df = readLocalCsvToDf(filePath)
+    else:
+        df = readRemoteCsvToDf(filePath)
+    return df if isinstance(df, pd.DataFrame) else pd.DataFrame()
+
+def getPropagationDataRecords(propagationData: dict) -> dict:
+    """ Get propagation data with orbit states and contacts as lists of records, without epoch millis columns, as Propagation Data api """
+    propagationDataRecords = {}
+    for satId, satData in propagationData.items():
+        propagationDataRecords[satId] = {}
+        for propagationDataEntry, data in satData.items():
+            if isinstance(data, pd.DataFrame):
+                data = getDfRecords(data.drop(columns=list(PROPAGATION_DATA_TIMESTAMP_COLUMNS.get(propagationDataEntry, {})), errors='ignore'))
+            propagationDataRecords[satId][propagationDataEntry] = data
+    return propagationDataRecords
+
+def getPropagationDataFormat(flightDynamicsDataPath: str) -> str:
+    """ Get format of propagation data files in folder, csv if none found """
+    import glob
+    for fileFormat in PROPAGATION_DATA_FORMATS:
+        if glob.glob(os.path.join(flightDynamicsDataPath, "*_" + PROPAGATION_DATA_FILES_MAP['orbitStateList'] + "." + fileFormat)):
+            return fileFormat
+    return 'csv'
+
+def savePropagationData(outputDataFolderPath: str, propagationData: AppResult, storage: str = 'csv'):
+    """ Save to output/data/flightdynamics, as csv, or parquet or feather with epoch millis columns,
+        then kept in propagation data as dataframes, not to parse times again
+    """
     outputPath = getFlightDynamicsDataOutputPath(outputDataFolderPath)
     makeOutputFolder(outputPath)
     result = propagationData.result
@@ -71,7 +104,20 @@ def savePropagationData(outputDataFolderPath: str, propagationData: AppResult):
         for propagationDataEntry, propgationDataFile in PROPAGATION_DATA_FILES_MAP.items():
             if propagationDataEntry not in result[satId]:
                 result[satId][propagationDataEntry] = []
-            saveListDictToCsv(result[satId][propagationDataEntry], os.path.join(outputPath, satId + "_" + propgationDataFile + ".csv"))
+            filePath = os.path.join(outputPath, satId + "_" + propgationDataFile + "." + storage)
+            if storage == 'csv':
+                data = result[satId][propagationDataEntry]
+                if isinstance(data, pd.DataFrame):
+                    data = data.drop(columns=list(PROPAGATION_DATA_TIMESTAMP_COLUMNS[propagationDataEntry]), errors='ignore')
+                saveListDictToCsv(data, filePath)
+                continue
+            df = pd.DataFrame(result[satId][propagationDataEntry])
+            if len(df) > 0:
+                for timestampColumn, utcTimeColumn in PROPAGATION_DATA_TIMESTAMP_COLUMNS[propagationDataEntry].items():
+                    if timestampColumn not in df.columns:
+                        df[timestampColumn] = getTimestampsFromDates(df[utcTimeColumn])
+            saveDfToColumnar(df, filePath)
+            result[satId][propagationDataEntry] = df
     return outputPath
 
 def getFlightDynamicsDataOutputPath(outputDataFolderPath: str) -> str:
@@ -4,56 +4,47 @@
 # Author: alberto-ferrero
 
 import os
-from jsonschema import validate
-import json
 import time
+from math import ceil
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 
 from ..utils.results import AppResult
-from ..flightdynamics.filemanager import readCsvPropagationDataFiles, savePropagationData
+from ..flightdynamics.filemanager import readCsvPropagationDataFilesAsDataframe, savePropagationData, getFlightDynamicsDataOutputPath
+from ..flightdynamics.filemanager import DEFAULT_MAX_PARALLEL_READS
 from ..orchestrator.preprocessor.preprocessor import readSatellites, readUserTerminals, readGroundStations
-from ..utils.filemanager import getBasePath, saveDictToJson
+from ..utils.filemanager import saveDictToJson
 from ..utils.timeconverter import getTimestampFromDate
+from ..utils.tracer import span, tracedCall, getCurrentSpanId
+from ..utils.manifest import getCompletedItems, setItemsCompleted
 from .request import propagate
+from .dataset import PropagationDataset, registerPropagationDataset
+from .planner import getPropagationBatches, getBatchPropagationRequest
+from .validator import validatePropagationData
+from .shards import getPropagationShards, getShardPropagationRequest, getShardPropagationData, mergeShardsPropagationData, DEFAULT_SHARD_DURATION
+from .propagator import propagateBuiltin
+from .contacts import getLocalGroundContacts, getLocalSpaceContacts, DEFAULT_CONTACTS_STEP, DEFAULT_GRAZING_ALTITUDE
 
 DEFAULT_PERIODIC_UPDATE = 1000000 #[sec]
 
+#Propagation batches: max estimated rows (orbit states and contacts) per batch, max satellites per batch,
+#max batches propagated at the same time, and estimated contacts per point of interest per day for each satellite
+MAX_BATCH_ROWS = 30000
+DEFAULT_MAX_BATCH_SIZE = 50
+DEFAULT_MAX_PARALLEL_REQUESTS = 4
+CONTACTS_PER_POI_DAY = 0.4
+
 """ E2E Performance Simulator Flight Dynamics Provider Handler """
 
 def getFlightDynamicsPropagationData(simulationRequest: dict, outputDataFolderPath: str) -> str:
     flightDynamicsInfo = simulationRequest['modules']['flightDynamics']
     propagationRequest = {}
+    #Propagation data shared with consumer modules, files being only persisted, as csv or columnar storage format
+    dataset = PropagationDataset()
+    storage = flightDynamicsInfo.get('properties', {}).get('storage', 'csv')
 
     #Define propagation data source
     if flightDynamicsInfo['data'] == 'run':
 
-        #Constants
-        N_MAX_SATS = 20
-
-        def getAssetById(assets: list, id: str) -> dict:
-            for asset in assets:
-                if asset['id'] == id:
-                    return asset.copy()
-            return Exception("ERROR: in list of assets, not possible to find one with id {}".format(id))
-        
-        def getSubSetPropagationRequest(propagationRequest: dict, idxi: int, idf: int) -> dict:
-            #Get batch of assets
-            subPropagationRequest = {}
-            subPropagationRequest['scenario'] = propagationRequest['scenario']
-            subPropagationRequest['assets'] = propagationRequest['assets'][idxi:idf+1]
-            subPropagationRequest['pointsOfInterest'] = propagationRequest['pointsOfInterest']
-            #Extend with non propagating satellties for ISV
-            satIds = [sat['id'] for sat in subPropagationRequest['assets']]
-            soiIds = []
-            for sat in subPropagationRequest['assets']:
-                spaceContacts = sat['spaceContacts']
-                for soiId in spaceContacts:
-                    if soiId not in soiIds and soiId not in satIds:
-                        soiIds.append(soiId)
-                        soi = getAssetById(propagationRequest['assets'], soiId)
-                        soi['propagate'] = False
-                        subPropagationRequest['assets'].append(soi)
-            return subPropagationRequest
-
         print(' - Run Flight Dynamics propagation, calling server at {}'.format(flightDynamicsInfo['address']))
         tick = time.time()
         
@@ -65,38 +56,151 @@ def getFlightDynamicsPropagationData(simulationRequest: dict, outputDataFolderPa
         print('   - Propagating orbit from {} to {} ...'.format(simulationRequest['simulationWindow']['start'].replace("T", " at ").replace("Z", ""), simulationRequest['simulationWindow']['end'].replace("T", " at ").replace("Z", "")))
         
         url = flightDynamicsInfo['address']
+        flightDynamicsDataOutputPath = getFlightDynamicsDataOutputPath(outputDataFolderPath)
+
+        #Skip satellites already propagated, in the run being resumed, whose data is then read from files
+        propagatedSatIds = getCompletedItems(outputDataFolderPath, 'flightDynamics')
+        assets = [sat for sat in propagationRequest['assets'] if sat['id'] not in propagatedSatIds]
+        if len(assets) < len(propagationRequest['assets']):
+            print('   - Resuming, {} satellites already propagated'.format(len(propagationRequest['assets']) - len(assets)))
 
-        #Propagate and return propagation data, cutting run to not overkill memory
-        nSats = len(propagationRequest['assets'])
-
-        for ii in range(int(nSats / N_MAX_SATS)):
-            #Get batch of assets, call app and get results
-            subPropagationRequest = getSubSetPropagationRequest(propagationRequest, ii * N_MAX_SATS, ((ii + 1) * N_MAX_SATS) - 1)
-            propagationDataRes: AppResult = propagate(url, subPropagationRequest)
-            flightDynamicsDataOutputPath = savePropagationData(outputDataFolderPath, propagationDataRes)
-        if nSats % N_MAX_SATS != 0:
-            # Get batch of assets, call app and get results
-            subPropagationRequest = getSubSetPropagationRequest(propagationRequest, int(nSats / N_MAX_SATS) * N_MAX_SATS, int(nSats / N_MAX_SATS) * N_MAX_SATS + nSats % N_MAX_SATS)
-            propagationDataRes: AppResult = propagate(url, subPropagationRequest)
-            flightDynamicsDataOutputPath = savePropagationData(outputDataFolderPath, propagationDataRes)
+        #Detect contacts locally, if requested, not sending points of interest and space contacts to server
+        serverPropagationRequest = propagationRequest
+        localContacts = {}
+        if flightDynamicsInfo['properties'].get('contacts', 'server') == 'local':
+            localContacts = getLocalContacts(propagationRequest, assets, flightDynamicsInfo['properties'], simulationRequest['satellites']['spacecontacts'])
+            serverPropagationRequest = dict(propagationRequest, pointsOfInterest=[])
+            serverPropagationRequest['assets'] = [dict(sat, groundContacts=[], spaceContacts=[]) for sat in propagationRequest['assets']]
+            assets = [dict(sat, groundContacts=[], spaceContacts=[]) for sat in assets]
+
+        #Split long windows in time shards, propagated in parallel and merged back for each batch
+        shards = getPropagationShards(serverPropagationRequest['scenario'], flightDynamicsInfo['properties'].get('shardDuration', DEFAULT_SHARD_DURATION))
+        if len(shards) > 1:
+            print('   - Splitting propagation window in {} time shards'.format(len(shards)))
+
+        #Propagate in batches sized not to overkill server and memory, with some batches in flight while saving completed ones
+        batchSize = getPropagationBatchSize(getShardPropagationRequest(serverPropagationRequest, shards[0]), len(assets), flightDynamicsInfo['properties'], len(shards))
+        maxParallelRequests = flightDynamicsInfo['properties'].get('maxParallelRequests', DEFAULT_MAX_PARALLEL_REQUESTS)
+        assetsIndex = {sat['id']: sat for sat in serverPropagationRequest['assets']}
+        batchRequests = [getBatchPropagationRequest(serverPropagationRequest, batch, assetsIndex) for batch in getPropagationBatches(assets, batchSize)]
+        print('   - Propagating {} batches of up to {} satellites, {} at a time'.format(len(batchRequests), batchSize, maxParallelRequests))
+        jobs = [(batchIndex, shardIndex) for batchIndex in range(len(batchRequests)) for shardIndex in range(len(shards))]
+        batchesShardsData = {}
+        with ThreadPoolExecutor(max_workers=maxParallelRequests) as executor:
+            running = {}
+            while jobs or running:
+                #Keep up to max parallel requests in flight
+                while jobs and len(running) < maxParallelRequests:
+                    batchIndex, shardIndex = jobs.pop(0)
+                    subPropagationRequest = getShardPropagationRequest(batchRequests[batchIndex], shards[shardIndex])
+                    future = executor.submit(tracedCall, 'propagation batch', 'flightdynamics', getCurrentSpanId(), propagate, url, subPropagationRequest)
+                    running[future] = (batchIndex, shardIndex)
+                #Save batches as all their shards completed
+                done, _ = wait(running.keys(), return_when=FIRST_COMPLETED)
+                for future in done:
+                    batchIndex, shardIndex = running.pop(future)
+                    propagationDataRes: AppResult = future.result()
+                    shardsData = batchesShardsData.setdefault(batchIndex, [None] * len(shards))
+                    shardsData[shardIndex] = getShardPropagationData(propagationDataRes.result)
+                    del propagationDataRes
+                    if any(shardData is None for shardData in shardsData):
+                        continue
+                    batchSatIds = [sat['id'] for sat in batchRequests[batchIndex]['assets'] if sat.get('propagate', True)]
+                    propagationDataRes = AppResult(200, batchRequests[batchIndex], mergeShardsPropagationData(batchesShardsData.pop(batchIndex), shards))
+                    addLocalContacts(propagationDataRes.result, localContacts)
+                    with span('save batch', 'io', assets=len(batchSatIds)):
+                        savePropagationData(outputDataFolderPath, propagationDataRes, storage)
+                        dataset.addSatellitesData(propagationDataRes.result)
+                    setItemsCompleted(outputDataFolderPath, 'flightDynamics', batchSatIds)
+                    del propagationDataRes
         
         print('   - Propagation completed in {:.4f} seconds'.format(time.time() - tick))
+        if not propagatedSatIds:
+            registerPropagationDataset(flightDynamicsDataOutputPath, dataset)
     
+    elif flightDynamicsInfo['data'] == 'builtin':
+
+        #Propagate in process, with contacts detected locally
+        withJ2 = isBuiltinJ2(flightDynamicsInfo['properties'])
+        print(' - Run Flight Dynamics propagation with builtin propagator, {}'.format('with J2 secular terms' if withJ2 else 'two body'))
+        tick = time.time()
+
+        propagationRequest: dict = extractFlightDynamicsScenario(simulationRequest)
+        print('   - Propagating orbit of {} satellites from {} to {} ...'.format(len(propagationRequest['assets']), simulationRequest['simulationWindow']['start'].replace("T", " at ").replace("Z", ""), simulationRequest['simulationWindow']['end'].replace("T", " at ").replace("Z", "")))
+        with span('builtin propagation', 'flightdynamics', assets=len(propagationRequest['assets'])):
+            propagationDataRes = AppResult(200, {'builtin': propagationRequest['scenario']['propagator']}, propagateBuiltin(propagationRequest, withJ2))
+        addLocalContacts(propagationDataRes.result, getLocalContacts(propagationRequest, propagationRequest['assets'], flightDynamicsInfo['properties'],
+                                                                     simulationRequest['satellites']['spacecontacts']))
+        print('   - Propagation completed in {:.4f} seconds'.format(time.time() - tick))
+        with span('save propagation', 'io', assets=len(propagationDataRes.result)):
+            flightDynamicsDataOutputPath = savePropagationData(outputDataFolderPath, propagationDataRes, storage)
+            dataset.addSatellitesData(propagationDataRes.result)
+        registerPropagationDataset(flightDynamicsDataOutputPath, dataset)
+        del propagationDataRes
+
     else:
         print('   - Read Propagation Data from {} repository, at {}'.format(flightDynamicsInfo['data'], flightDynamicsInfo['address']))
         #Read, validate and return propagation data
         propagationDataRes = extractPropagationDataFromCsv(simulationRequest)
-        flightDynamicsDataOutputPath = savePropagationData(outputDataFolderPath, propagationDataRes)
+        flightDynamicsDataOutputPath = savePropagationData(outputDataFolderPath, propagationDataRes, storage)
+        dataset.addSatellitesData(propagationDataRes.result)
+        registerPropagationDataset(flightDynamicsDataOutputPath, dataset)
+        del propagationDataRes
     saveDictToJson(propagationRequest, os.path.join(flightDynamicsDataOutputPath, 'propagationrequest.json'))
     
     print('   - Saved Propagation Data in output folder {}'.format(flightDynamicsDataOutputPath))        
-    del propagationDataRes
 
     return flightDynamicsDataOutputPath
 
 
 #######################################################################################################
 
+def getPropagationBatchSize(propagationRequest: dict, nSats: int, properties: dict, nShards: int = 1) -> int:
+    """ Get number of satellites per propagation batch, from the rows estimated for each satellite in the request window:
+        orbit states, periodic and at contact events, and contacts with points of interest
+    """
+    scenario = propagationRequest['scenario']
+    windowMillis = scenario['endTimestamp'] - scenario['startTimestamp']
+    windowDays = windowMillis / 86400000.0
+    nContacts = len(propagationRequest['pointsOfInterest']) * windowDays * CONTACTS_PER_POI_DAY
+    #Each contact with start, max elevation and end orbit states, no periodic orbit states if periodic update not positive
+    periodicRows = windowMillis / scenario['periodicUpdate'] if scenario['periodicUpdate'] > 0 else 0
+    rowsPerSat = periodicRows + 4 * nContacts + 1
+    batchSize = min(int(MAX_BATCH_ROWS / rowsPerSat), properties.get('maxBatchSize', DEFAULT_MAX_BATCH_SIZE))
+    #Split in at least as many batches and time shards as parallel requests
+    batchSize = min(batchSize, ceil(nSats / ceil(properties.get('maxParallelRequests', DEFAULT_MAX_PARALLEL_REQUESTS) / nShards)))
+    return max(batchSize, 1)
+
+def isBuiltinJ2(properties: dict) -> bool:
+    """ Check if builtin propagation has J2 secular terms, by default only for numerical propagator """
+    return properties.get('j2', properties['propagator'] == 'NUMERICAL')
+
+def getLocalContacts(propagationRequest: dict, assets: list, properties: dict, withSpaceContacts: bool) -> dict:
+    """ Detect contacts of assets locally, with points of interest and, if requested, with other satellites, as satId: contacts list """
+    withJ2 = isBuiltinJ2(properties)
+    step = properties.get('contactsStep', DEFAULT_CONTACTS_STEP)
+    localContacts = {}
+    if propagationRequest['pointsOfInterest']:
+        print('   - Detecting ground contacts locally, with {} points of interest'.format(len(propagationRequest['pointsOfInterest'])))
+        with span('local ground contacts', 'flightdynamics', assets=len(assets)):
+            localContacts = getLocalGroundContacts(propagationRequest, assets, withJ2, step)
+    if withSpaceContacts:
+        allPairs = properties.get('isvPairs', 'listed') == 'all'
+        if allPairs and 'isvMaxRange' not in properties:
+            raise Exception('ERROR: space contacts among all satellites require isvMaxRange property')
+        print('   - Detecting space contacts locally, {}'.format('among all satellites closer than {} km'.format(properties['isvMaxRange'] / 1000) if allPairs else 'with listed satellites'))
+        with span('local space contacts', 'flightdynamics', assets=len(assets)):
+            spaceContacts = getLocalSpaceContacts(propagationRequest, assets, withJ2, step, allPairs, properties.get('isvMaxRange'),
+                                                  properties.get('grazingAltitude', DEFAULT_GRAZING_ALTITUDE))
+        localContacts = {sat['id']: localContacts.get(sat['id'], []) + spaceContacts.get(sat['id'], []) for sat in assets}
+    return localContacts
+
+def addLocalContacts(propagationData: dict, localContacts: dict):
+    """ Add locally detected contacts to propagation data contacts, for satellites in propagation data """
+    for satId, satData in propagationData.items():
+        if localContacts.get(satId):
+            satData['contactList'] = list(satData.get('contactList', [])) + localContacts[satId]
+
 def extractFlightDynamicsScenario(simulationRequest: dict) -> dict:
     """ From Simulation Request, extract information to build Flight Dynamics Propagation Request """
 
@@ -179,19 +283,17 @@ def extractFlightDynamicsScenario(simulationRequest: dict) -> dict:
     return propagationRequest
 
 def extractPropagationDataFromCsv(simulationRequest: dict) -> dict:
-    """ Read from repository required csv files and parse back to propagation data """
+    """ Read from repository required csv, or parquet or feather, files and parse back to propagation data, as dataframes """
     #Build Propagation Data object reading from stored files
-    flightDynamicsDataPath = simulationRequest['modules']['flightDynamics']['address']
-    source = simulationRequest['modules']['flightDynamics']['data']
+    flightDynamicsInfo = simulationRequest['modules']['flightDynamics']
+    flightDynamicsDataPath = flightDynamicsInfo['address']
+    source = flightDynamicsInfo['data']
+    maxParallelReads = flightDynamicsInfo.get('properties', {}).get('maxParallelReads', DEFAULT_MAX_PARALLEL_READS)
     propagationData: dict = {}
-    propagationData = readCsvPropagationDataFiles(flightDynamicsDataPath, source)
-    #Validate format
+    propagationData = readCsvPropagationDataFilesAsDataframe(flightDynamicsDataPath, source, maxParallelReads=maxParallelReads)
+    #Validate format, by columns, of a sample of satellites if requested
     try:
-        #Set validation schema
-        propagationDataSchema = os.path.join('api', 'propagationdata-schema.json')
-        #Validate with schema
-        with open(os.path.join(getBasePath(), propagationDataSchema), "r") as f:
-            validate(instance=propagationData, schema=json.load(f))
+        validatePropagationData(propagationData, flightDynamicsInfo.get('properties', {}).get('validationSample'))
     except Exception as e:
         #Raise error
         raise Exception('ERROR: validation of Propagation Data failed due to: {}'.format(str(e)))
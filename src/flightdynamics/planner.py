@@ -0,0 +1,80 @@
+#! /usr/bin/env python3
+
+# Copyright (C)
+# Author: alberto-ferrero
+
+""" E2E Performance Simulator Flight Dynamics Provider Handler: Propagation Batches Planner """
+
+def getPropagationBatches(assets: list, batchSize: int) -> list:
+    """ Split satellites in batches of up to batchSize satellites, keeping together satellites with space contacts,
+        so that few contacts satellites are outside the batch, then added as non propagating.
+        Each batch is grown from the first satellite left, in order of orbital plane, adding among the satellites
+        in contact with the batch the one adding fewest new contacts outside the batch, or the next one in order
+        of plane if none is in contact.
+    """
+    #Order by plane, then position on the plane
+    orderedAssets = sorted(enumerate(assets), key=lambda a: (getOrbitValue(a[1], 'rightAscensionAscendingNode'), getOrbitValue(a[1], 'meanAnomaly'), a[0]))
+    orderedIds = [asset['id'] for _, asset in orderedAssets]
+    ranks = {satId: rank for rank, satId in enumerate(orderedIds)}
+    assetsIndex = {asset['id']: asset for asset in assets}
+
+    #Space contacts graph, among satellites to be batched
+    links = {satId: set() for satId in orderedIds}
+    for asset in assets:
+        for soiId in asset.get('spaceContacts', []):
+            if soiId in links and soiId != asset['id']:
+                links[asset['id']].add(soiId)
+                links[soiId].add(asset['id'])
+
+    batches = []
+    left = set(orderedIds)
+    position = 0
+    while left:
+        #Start from first satellite left, in order of plane
+        while orderedIds[position] not in left:
+            position += 1
+        satId = orderedIds[position]
+        batch = []
+        batchIds = set()
+        #Satellites in contact with batch, but outside it
+        frontier = set()
+        while True:
+            batch.append(satId)
+            batchIds.add(satId)
+            left.remove(satId)
+            frontier.discard(satId)
+            frontier.update(links[satId] - batchIds)
+            if len(batch) == batchSize or not left:
+                break
+            candidates = [soiId for soiId in frontier if soiId in left]
+            if candidates:
+                satId = min(candidates, key=lambda soiId: (len(links[soiId] - frontier - batchIds), -len(links[soiId] & batchIds), ranks[soiId]))
+            else:
+                satId = next(soiId for soiId in orderedIds[position:] if soiId in left)
+        batches.append([assetsIndex[satId] for satId in batch])
+    return batches
+
+def getBatchPropagationRequest(propagationRequest: dict, batch: list, assetsIndex: dict) -> dict:
+    """ Get propagation request of a batch of satellites, extended with the non propagating satellites they have space contacts with """
+    subPropagationRequest = {}
+    subPropagationRequest['scenario'] = propagationRequest['scenario']
+    subPropagationRequest['assets'] = list(batch)
+    subPropagationRequest['pointsOfInterest'] = propagationRequest['pointsOfInterest']
+    #Extend with non propagating satellties for ISV
+    satIds = set([sat['id'] for sat in batch])
+    for sat in batch:
+        for soiId in sat['spaceContacts']:
+            if soiId not in satIds:
+                if soiId not in assetsIndex:
+                    raise Exception("ERROR: in list of assets, not possible to find one with id {}".format(soiId))
+                satIds.add(soiId)
+                soi = assetsIndex[soiId].copy()
+                soi['propagate'] = False
+                subPropagationRequest['assets'].append(soi)
+    return subPropagationRequest
+
+def getOrbitValue(asset: dict, key: str) -> float:
+    """ Get orbit value, 0 if not defined (as for TLE) """
+    return float(asset['orbit'].get(key, 0)) if isinstance(asset.get('orbit'), dict) else 0.0
+
+# -*- coding: utf-8 -*-
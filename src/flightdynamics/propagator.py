@@ -0,0 +1,260 @@
+#! /usr/bin/env python3
+
+# Copyright (C)
+# Author: alberto-ferrero
+
+""""
+Builtin Flight Dynamics propagator, running in process without the Flight Dynamics server.
+
+Orbits of the Propagation Request assets are propagated over the whole scenario time grid at once,
+as arrays of satellites by times:
+- Keplerian orbits (KEPLERIAN, BLSKEPLERIAN, and CARTESIAN converted to Keplerian elements) analytically,
+  solving Kepler equation, optionally with J2 secular drift of node, periapsis and mean anomaly
+- TLE orbits with SGP4, requiring the optional sgp4 package, its TEME frame taken as EME2000
+
+Orbit states have the same layout as the server ones, on the periodic update grid only, with nadir pointing
+attitude and insolation from a cylindrical Earth shadow. Contacts are calculated by the local contacts engine.
+"""
+
+import numpy as np
+import pandas as pd
+
+#Earth gravitational parameter [m3/s2], equatorial radius [m] and J2 zonal harmonic
+MU = 3.986004418e14
+EARTH_RADIUS = 6378137.0
+J2 = 1.08262668e-3
+
+#Kepler equation solver: max Newton iterations and tolerance [rad]
+KEPLER_MAX_ITERATIONS = 20
+KEPLER_TOLERANCE = 1e-12
+
+#Unix epoch as julian day
+UNIX_EPOCH_JD = 2440587.5
+
+class Ephemeris:
+    """ Positions and velocities of assets at any time, from builtin propagation of their orbits """
+    def __init__(self, assets: list, j2: bool = False):
+        self.satIds: list = [sat['id'] for sat in assets]
+        self.j2: bool = j2
+        self.isTle = np.array([sat['orbit']['type'] == 'TLE' for sat in assets], dtype=bool)
+        self.keplerianIndices = np.flatnonzero(~self.isTle)
+        self.tleIndices = np.flatnonzero(self.isTle)
+        self.elements: dict = getKeplerianElements([assets[i] for i in self.keplerianIndices]) if len(self.keplerianIndices) else {}
+        self.satellites: list = getTleSatellites([assets[i] for i in self.tleIndices]) if len(self.tleIndices) else []
+
+    def getStates(self, timestamps: np.ndarray) -> tuple:
+        """ Get positions [m] and velocities [m/s] of all assets at timestamps [ms], as assets x times x 3 arrays """
+        positions = np.empty((len(self.satIds), len(timestamps), 3))
+        velocities = np.empty((len(self.satIds), len(timestamps), 3))
+        if len(self.keplerianIndices):
+            elements = {key: values[:, None] for key, values in self.elements.items()}
+            positions[self.keplerianIndices], velocities[self.keplerianIndices] = propagateKeplerian(elements, timestamps[None, :], self.j2)
+        if len(self.tleIndices):
+            positions[self.tleIndices], velocities[self.tleIndices] = propagateTle(self.satellites, [self.satIds[i] for i in self.tleIndices], timestamps)
+        return positions, velocities
+
+    def getPairStates(self, satIndices: np.ndarray, timestamps: np.ndarray) -> tuple:
+        """ Get positions [m] and velocities [m/s] of assets of indices at timestamps [ms], one each, as n x 3 arrays """
+        positions = np.empty((len(satIndices), 3))
+        velocities = np.empty((len(satIndices), 3))
+        isTle = self.isTle[satIndices]
+        if np.any(~isTle):
+            #Index of asset among Keplerian ones
+            keplerianPositions = np.searchsorted(self.keplerianIndices, satIndices[~isTle])
+            elements = {key: values[keplerianPositions] for key, values in self.elements.items()}
+            positions[~isTle], velocities[~isTle] = propagateKeplerian(elements, timestamps[~isTle], self.j2)
+        for tlePosition, satIndex in enumerate(self.tleIndices):
+            mask = satIndices == satIndex
+            if np.any(mask):
+                satPositions, satVelocities = propagateTle(self.satellites[tlePosition:tlePosition + 1], [self.satIds[satIndex]], timestamps[mask])
+                positions[mask], velocities[mask] = satPositions[0], satVelocities[0]
+        return positions, velocities
+
+def propagateBuiltin(propagationRequest: dict, j2: bool = False) -> dict:
+    """ Propagate assets to be propagated of Propagation Request, returning propagation data as satId: orbitStateList, contactList """
+    timestamps = getScenarioTimestamps(propagationRequest['scenario'])
+    assets = [sat for sat in propagationRequest['assets'] if sat.get('propagate', True)]
+    positions, velocities = Ephemeris(assets, j2).getStates(timestamps)
+
+    utcTimes = getUtcTimes(timestamps)
+    sunDirections = getSunDirections(timestamps)
+    propagationData = {}
+    for i, sat in enumerate(assets):
+        propagationData[sat['id']] = {
+            'orbitStateList': getOrbitStatesDataframe(utcTimes, positions[i], velocities[i], sunDirections, float(sat['mass'])),
+            'contactList': []
+        }
+    return propagationData
+
+def getScenarioTimestamps(scenario: dict) -> np.ndarray:
+    """ Get time grid [ms] from start to end, every periodic update, end included """
+    if int(scenario['periodicUpdate']) <= 0:
+        raise Exception('ERROR: builtin propagation requires a positive periodic update [ms], not {}'.format(scenario['periodicUpdate']))
+    timestamps = np.arange(scenario['startTimestamp'], scenario['endTimestamp'], int(scenario['periodicUpdate']), dtype=np.int64)
+    return np.append(timestamps, np.int64(scenario['endTimestamp']))
+
+def getKeplerianElements(assets: list) -> dict:
+    """ Get Keplerian elements of assets, as arrays, angles in radians, with mean anomaly at epoch """
+    elements = {key: [] for key in ['a', 'e', 'i', 'raan', 'argp', 'M', 'epoch']}
+    for sat in assets:
+        orbit = sat['orbit']
+        if orbit.get('referenceFrame', 'EME2000') != 'EME2000':
+            raise Exception('ERROR: for satellite {}, builtin propagation supports only EME2000 orbits, not {}'.format(sat['id'], orbit['referenceFrame']))
+        if orbit['type'] == 'CARTESIAN':
+            a, e, i, raan, argp, M = getKeplerianFromCartesian(np.array([orbit['X'], orbit['Y'], orbit['Z']], dtype=float),
+                                                               np.array([orbit['Vx'], orbit['Vy'], orbit['Vz']], dtype=float))
+        else:
+            a, e = float(orbit['semiMajorAxis']), float(orbit['eccentricity'])
+            i, raan, argp = np.radians([orbit['inclination'], orbit['rightAscensionAscendingNode'], orbit['argumentPeriapsis']])
+            if orbit['type'] == 'KEPLERIAN':
+                M = getMeanFromTrueAnomaly(np.radians(orbit['trueAnomaly']), e)
+            else:
+                M = np.radians(orbit['meanAnomaly'])
+        for key, value in zip(elements.keys(), [a, e, i, raan, argp, M, orbit['utcEpochMillis']]):
+            elements[key].append(value)
+    return {key: np.array(values, dtype=np.int64 if key == 'epoch' else float) for key, values in elements.items()}
+
+def propagateKeplerian(elements: dict, timestamps: np.ndarray, j2: bool = False) -> tuple:
+    """ Propagate Keplerian elements to timestamps [ms], broadcasting elements arrays with timestamps,
+        returning positions [m] and velocities [m/s] with a last axis of 3
+    """
+    a, e, i = elements['a'], elements['e'], elements['i']
+    dt = (timestamps - elements['epoch']) / 1000.0
+    n = np.sqrt(MU / a ** 3)
+    raanDot, argpDot, MDot = np.zeros_like(a), np.zeros_like(a), n
+    if j2:
+        #Secular rates due to Earth oblateness
+        k = 0.75 * n * J2 * (EARTH_RADIUS / (a * (1 - e ** 2))) ** 2
+        cosi = np.cos(i)
+        raanDot = -2 * k * cosi
+        argpDot = k * (5 * cosi ** 2 - 1)
+        MDot = n + k * np.sqrt(1 - e ** 2) * (3 * cosi ** 2 - 1)
+    raan = elements['raan'] + raanDot * dt
+    argp = elements['argp'] + argpDot * dt
+    M = np.mod(elements['M'] + MDot * dt, 2 * np.pi)
+    e = np.broadcast_to(e, M.shape)
+    E = solveKepler(M, e)
+
+    #Perifocal position and velocity
+    cosE, sinE = np.cos(E), np.sin(E)
+    b = np.sqrt(1 - e ** 2)
+    r = a * (1 - e * cosE)
+    x, y = a * (cosE - e), a * b * sinE
+    vFactor = np.sqrt(MU * a) / r
+    vx, vy = -vFactor * sinE, vFactor * b * cosE
+
+    #Rotate to inertial frame
+    cosO, sinO, cosw, sinw, cosi, sini = np.cos(raan), np.sin(raan), np.cos(argp), np.sin(argp), np.cos(i), np.sin(i)
+    P = np.stack([cosO * cosw - sinO * sinw * cosi, sinO * cosw + cosO * sinw * cosi, sinw * sini], axis=-1)
+    Q = np.stack([-cosO * sinw - sinO * cosw * cosi, -sinO * sinw + cosO * cosw * cosi, cosw * sini], axis=-1)
+    positions = x[..., None] * P + y[..., None] * Q
+    velocities = vx[..., None] * P + vy[..., None] * Q
+    return positions, velocities
+
+def solveKepler(M: np.ndarray, e: np.ndarray) -> np.ndarray:
+    """ Solve Kepler equation M = E - e sin(E) for eccentric anomaly, with Newton iterations """
+    E = np.where(e < 0.8, M, np.pi * np.ones_like(M))
+    for _ in range(KEPLER_MAX_ITERATIONS):
+        delta = (E - e * np.sin(E) - M) / (1 - e * np.cos(E))
+        E = E - delta
+        if np.max(np.abs(delta), initial=0.0) < KEPLER_TOLERANCE:
+            break
+    return E
+
+def getMeanFromTrueAnomaly(nu: float, e: float) -> float:
+    E = 2 * np.arctan2(np.sqrt(1 - e) * np.sin(nu / 2), np.sqrt(1 + e) * np.cos(nu / 2))
+    return E - e * np.sin(E)
+
+def getKeplerianFromCartesian(r: np.ndarray, v: np.ndarray) -> tuple:
+    """ Get Keplerian elements a, e, i, raan, argp, M, angles in radians, from inertial position [m] and velocity [m/s] """
+    rNorm = np.linalg.norm(r)
+    h = np.cross(r, v)
+    node = np.cross([0.0, 0.0, 1.0], h)
+    eVector = np.cross(v, h) / MU - r / rNorm
+    e = np.linalg.norm(eVector)
+    a = 1 / (2 / rNorm - np.dot(v, v) / MU)
+    if e >= 1:
+        raise Exception('ERROR: builtin propagation supports only elliptical orbits')
+    i = np.arccos(np.clip(h[2] / np.linalg.norm(h), -1, 1))
+    nodeNorm = np.linalg.norm(node)
+    #Reference directions for equatorial and circular orbits
+    nodeDirection = node / nodeNorm if nodeNorm > 1e-9 * np.linalg.norm(h) else np.array([1.0, 0.0, 0.0])
+    raan = np.arctan2(nodeDirection[1], nodeDirection[0])
+    periapsisDirection = eVector / e if e > 1e-10 else nodeDirection
+    hDirection = h / np.linalg.norm(h)
+    argp = np.arctan2(np.dot(np.cross(nodeDirection, periapsisDirection), hDirection), np.dot(nodeDirection, periapsisDirection))
+    nu = np.arctan2(np.dot(np.cross(periapsisDirection, r), hDirection), np.dot(periapsisDirection, r))
+    return a, e, i, raan, argp, getMeanFromTrueAnomaly(nu, e)
+
+def getTleSatellites(assets: list) -> list:
+    """ Parse TLE orbits of assets, requiring optional sgp4 package """
+    try:
+        from sgp4.api import Satrec
+    except ImportError:
+        raise Exception('ERROR: builtin propagation of TLE orbits requires sgp4 package, not installed')
+    return [Satrec.twoline2rv(sat['orbit']['line1'], sat['orbit']['line2']) for sat in assets]
+
+def propagateTle(satellites: list, satIds: list, timestamps: np.ndarray) -> tuple:
+    """ Propagate TLE satellites with SGP4, returning positions [m] and velocities [m/s] as satellites x times x 3 arrays """
+    from sgp4.api import SatrecArray
+    #Julian date split in day and fraction, for precision
+    jd = UNIX_EPOCH_JD + (timestamps // 86400000).astype(float)
+    fr = (timestamps % 86400000) / 86400000.0
+    errors, positions, velocities = SatrecArray(satellites).sgp4(jd, fr)
+    for i, satId in enumerate(satIds):
+        if np.any(errors[i]):
+            raise Exception('ERROR: SGP4 propagation of satellite {} failed with error code {}'.format(satId, int(np.max(errors[i]))))
+    return positions * 1000.0, velocities * 1000.0
+
+def getSunDirections(timestamps: np.ndarray) -> np.ndarray:
+    """ Get Sun direction in inertial frame at timestamps, from low precision solar coordinates """
+    d = timestamps / 86400000.0 + UNIX_EPOCH_JD - 2451545.0
+    L = np.radians(280.460 + 0.9856474 * d)
+    g = np.radians(357.528 + 0.9856003 * d)
+    ecliptic = L + np.radians(1.915 * np.sin(g) + 0.020 * np.sin(2 * g))
+    obliquity = np.radians(23.439 - 0.0000004 * d)
+    return np.stack([np.cos(ecliptic), np.cos(obliquity) * np.sin(ecliptic), np.sin(obliquity) * np.sin(ecliptic)], axis=-1)
+
+def getInsolation(positions: np.ndarray, sunDirections: np.ndarray) -> np.ndarray:
+    """ Get if positions are insolated, out of the cylindrical shadow of Earth """
+    projection = np.sum(positions * sunDirections, axis=-1)
+    distance = np.linalg.norm(positions - projection[..., None] * sunDirections, axis=-1)
+    return ~((projection < 0) & (distance < EARTH_RADIUS))
+
+def getNadirFrames(positions: np.ndarray, velocities: np.ndarray) -> tuple:
+    """ Get axes of nadir pointing frame: x along track, y opposite to orbit normal, z to nadir """
+    z = -positions / np.linalg.norm(positions, axis=-1, keepdims=True)
+    h = np.cross(positions, velocities)
+    y = -h / np.linalg.norm(h, axis=-1, keepdims=True)
+    return np.cross(y, z), y, z
+
+def getNadirQuaternions(positions: np.ndarray, velocities: np.ndarray) -> np.ndarray:
+    """ Get attitude quaternions q0 (scalar), q1, q2, q3 of nadir pointing frame """
+    #Rotation matrix with body axes as columns, to quaternion
+    m = np.stack(getNadirFrames(positions, velocities), axis=-1)
+    q0 = 0.5 * np.sqrt(np.maximum(0, 1 + m[..., 0, 0] + m[..., 1, 1] + m[..., 2, 2]))
+    q1 = np.copysign(0.5 * np.sqrt(np.maximum(0, 1 + m[..., 0, 0] - m[..., 1, 1] - m[..., 2, 2])), m[..., 2, 1] - m[..., 1, 2])
+    q2 = np.copysign(0.5 * np.sqrt(np.maximum(0, 1 - m[..., 0, 0] + m[..., 1, 1] - m[..., 2, 2])), m[..., 0, 2] - m[..., 2, 0])
+    q3 = np.copysign(0.5 * np.sqrt(np.maximum(0, 1 - m[..., 0, 0] - m[..., 1, 1] + m[..., 2, 2])), m[..., 1, 0] - m[..., 0, 1])
+    return np.stack([q0, q1, q2, q3], axis=-1)
+
+def getUtcTimes(timestamps: np.ndarray) -> np.ndarray:
+    """ Get UTC times of timestamps [ms], with millis only if not zero, as in server orbit states """
+    dates = timestamps.astype('datetime64[ms]')
+    utcTimes = np.where(timestamps % 1000 == 0, np.datetime_as_string(dates, unit='s'), np.datetime_as_string(dates, unit='ms'))
+    return np.char.add(utcTimes.astype(str), 'Z')
+
+def getOrbitStatesDataframe(utcTimes: np.ndarray, positions: np.ndarray, velocities: np.ndarray, sunDirections: np.ndarray, mass: float) -> pd.DataFrame:
+    """ Get orbit states of a satellite, with server orbit state columns """
+    quaternions = getNadirQuaternions(positions, velocities)
+    return pd.DataFrame({
+        'utcTime': utcTimes,
+        'frame': 'EME2000',
+        'isInsolating': getInsolation(positions, sunDirections),
+        'q0': quaternions[:, 0], 'q1': quaternions[:, 1], 'q2': quaternions[:, 2], 'q3': quaternions[:, 3],
+        'mass': mass,
+        'X': positions[:, 0], 'Y': positions[:, 1], 'Z': positions[:, 2],
+        'Vx': velocities[:, 0], 'Vy': velocities[:, 1], 'Vz': velocities[:, 2]
+    })
+
+# -*- coding: utf-8 -*-
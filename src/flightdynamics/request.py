@@ -6,15 +6,17 @@
 """ E2E Performance Simulator Flight Dynamics Provider Handler: REST API Requests """
 
 from ..utils.results import AppResult
+from ..utils.tracer import span
 import requests
 import json
 
 def propagate(url: str, propagationRequest: dict) -> dict:
     """ Call the Flight Dynamics Provider and get propagation data """
-    payload = json.dumps(propagationRequest)
-    response = requests.request("POST", url,
-                                headers={'Content-Type': 'application/json'},
-                                data=payload).json()
+    with span('propagate request', 'http', assets=len(propagationRequest['assets'])):
+        payload = json.dumps(propagationRequest)
+        response = requests.request("POST", url,
+                                    headers={'Content-Type': 'application/json'},
+                                    data=payload).json()
     if 'status' in response:
         return AppResult(response['status'], propagationRequest, response['error'])
     else:
@@ -0,0 +1,133 @@
+#! /usr/bin/env python3
+
+# Copyright (C)
+# Author: alberto-ferrero
+
+""""
+Propagation time shards, splitting long simulation windows in shorter propagation requests.
+
+Shards are consecutive sub windows, with boundaries on the periodic update grid of the whole window,
+so that each boundary orbit state is in both shards it bounds. Shard requests keep the assets orbits,
+defined at their own epoch, so that the server propagates the same states as for the whole window,
+and shards can be propagated in parallel.
+
+Shards propagation data are merged in time order: orbit states deduplicated by time, and contacts
+ending at a shard end stitched with the contacts of the same point or satellite of interest, and type,
+starting at the next shard start.
+"""
+
+import pandas as pd
+from math import isnan
+
+from ..utils.timeconverter import getTimestampFromDate, getTimestampsFromDates
+
+#Default max shard duration [ms]
+DEFAULT_SHARD_DURATION = 86400000
+
+def getPropagationShards(scenario: dict, shardDuration: int = DEFAULT_SHARD_DURATION) -> list:
+    """ Split scenario window in shards up to shard duration [ms], rounded down to a multiple of periodic update, as start, end timestamps,
+        not rounded if periodic update not positive, as no periodic orbit states
+    """
+    periodicUpdate = int(scenario['periodicUpdate'])
+    if periodicUpdate > 0:
+        shardDuration = max(int(shardDuration) // periodicUpdate, 1) * periodicUpdate
+    startTimestamp, endTimestamp = scenario['startTimestamp'], scenario['endTimestamp']
+    if endTimestamp <= startTimestamp:
+        return [(startTimestamp, endTimestamp)]
+    boundaries = list(range(startTimestamp, endTimestamp, shardDuration)) + [endTimestamp]
+    #Do not leave a last shard shorter than a periodic update
+    if len(boundaries) > 2 and boundaries[-1] - boundaries[-2] < periodicUpdate:
+        boundaries.pop(-2)
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+def getShardPropagationRequest(propagationRequest: dict, shard: tuple) -> dict:
+    """ Get propagation request restricted to shard window """
+    subPropagationRequest = dict(propagationRequest)
+    subPropagationRequest['scenario'] = dict(propagationRequest['scenario'], startTimestamp=shard[0], endTimestamp=shard[1])
+    return subPropagationRequest
+
+def getShardPropagationData(propagationData: dict) -> dict:
+    """ Get shard propagation data with orbit states as dataframes, lighter than lists of dicts while waiting for other shards """
+    return {satId: {'orbitStateList': pd.DataFrame(satData.get('orbitStateList', [])), 'contactList': list(satData.get('contactList', []))}
+            for satId, satData in propagationData.items()}
+
+def mergeShardsPropagationData(shardsData: list, shards: list) -> dict:
+    """ Merge propagation data of shards, in time order, as satId: orbitStateList, contactList """
+    if len(shardsData) == 1:
+        return shardsData[0]
+    propagationData = {}
+    for satId in shardsData[0]:
+        propagationData[satId] = {
+            'orbitStateList': mergeOrbitStates([shardData[satId]['orbitStateList'] for shardData in shardsData]),
+            'contactList': mergeContacts([shardData[satId]['contactList'] for shardData in shardsData], [shard[0] for shard in shards[1:]])
+        }
+    return propagationData
+
+def mergeOrbitStates(shardsStates: list) -> pd.DataFrame:
+    """ Merge orbit states of shards, dropping states at the same time of a previous one """
+    statesDf = pd.concat([pd.DataFrame(states) for states in shardsStates], ignore_index=True)
+    if len(statesDf) == 0:
+        return statesDf
+    timestamps = pd.Series(getTimestampsFromDates(statesDf['utcTime']), index=statesDf.index)
+    isFirst = ~timestamps.duplicated(keep='first')
+    order = timestamps[isFirst].sort_values(kind='stable').index
+    return statesDf.loc[order].reset_index(drop=True)
+
+def mergeContacts(shardsContacts: list, boundaries: list) -> list:
+    """ Merge contacts of shards, dropping contacts already in a previous shard, and stitching contacts ending
+        at a shard boundary with the ones of the same argument of interest and type starting there, in the next shard
+    """
+    contacts = list(shardsContacts[0])
+    keys = getContactKeys(contacts)
+    contactKeys = set(keys)
+    for boundary, shardContacts in zip(boundaries, shardsContacts[1:]):
+        #Contacts open at the boundary, by argument of interest and type
+        openContacts = {}
+        for k, key in enumerate(keys):
+            if key[3] == boundary:
+                openContacts[key[:2]] = k
+        shardKeys = getContactKeys(shardContacts)
+        for contact, contactKey in zip(shardContacts, shardKeys):
+            if contactKey in contactKeys:
+                continue
+            if contactKey[:2] in openContacts and contactKey[2] == boundary:
+                k = openContacts.pop(contactKey[:2])
+                contacts[k] = stitchContacts(contacts[k], contact)
+                keys[k] = getContactKey(contacts[k])
+                contactKeys.add(keys[k])
+            else:
+                contacts.append(contact)
+                keys.append(contactKey)
+                contactKeys.add(contactKey)
+    return contacts
+
+def getContactKeys(contacts: list) -> list:
+    """ Get keys of contacts, as getContactKey, with times of all contacts converted at once """
+    if len(contacts) == 0:
+        return []
+    startTimestamps = getTimestampsFromDates([contact['startUtcTime'] for contact in contacts]).tolist()
+    endTimestamps = getTimestampsFromDates([contact['endUtcTime'] for contact in contacts]).tolist()
+    return [(contact['argumentOfInterestId'], contact['contactType'], start, end) for contact, start, end in zip(contacts, startTimestamps, endTimestamps)]
+
+def getContactKey(contact: dict) -> tuple:
+    """ Get contact key, as argument of interest, type, start and end timestamps """
+    return (contact['argumentOfInterestId'], contact['contactType'], getTimestampFromDate(contact['startUtcTime']), getTimestampFromDate(contact['endUtcTime']))
+
+def stitchContacts(contact: dict, nextContact: dict) -> dict:
+    """ Stitch contact with the next one, starting at its end: start of the first, end of the next, highest max elevation """
+    stitchedContact = dict(contact)
+    for key in ['UtcTime', 'Azimuth', 'Elevation', 'Distance']:
+        stitchedContact['end' + key] = nextContact.get('end' + key)
+    if isHigherElevation(nextContact.get('maxElevationElevation'), contact.get('maxElevationElevation')):
+        for key in ['UtcTime', 'Azimuth', 'Elevation', 'Distance']:
+            stitchedContact['maxElevation' + key] = nextContact.get('maxElevation' + key)
+    stitchedContact['durationInMillis'] = getTimestampFromDate(stitchedContact['endUtcTime']) - getTimestampFromDate(stitchedContact['startUtcTime'])
+    return stitchedContact
+
+def isHigherElevation(elevation: float, otherElevation: float) -> bool:
+    """ Check if elevation is defined and higher than other elevation, or other not defined (as for ISV contacts) """
+    if elevation is None or isnan(elevation):
+        return False
+    return otherElevation is None or isnan(otherElevation) or elevation > otherElevation
+
+# -*- coding: utf-8 -*-
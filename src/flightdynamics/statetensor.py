@@ -0,0 +1,133 @@
+#! /usr/bin/env python3
+
+# Copyright (C)
+# Author: alberto-ferrero
+
+""""
+Constellation state tensor, shared among the analysis modules reading orbit states of all satellites at once.
+
+States of all satellites, at the times common to all of them, are a dense satellites x times x 6 array
+(X, Y, Z [m], Vx, Vy, Vz [m/s]), with satellites and times indexes. The array is persisted as npy file
+in the Flight Dynamics output folder, with its indexes as json file, and read back memory mapped, so that
+states are got by index without copies, and processes reading the same folder share the same pages.
+The tensor is built from the propagation dataset, once per folder, or again if orbit states files change.
+"""
+
+import os
+import json
+import glob
+import threading
+import numpy as np
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from .dataset import getPropagationDataset
+
+#Files of state tensor, and of its indexes, in Flight Dynamics output folder
+STATE_TENSOR_FILE = 'orbit-states.npy'
+STATE_TENSOR_INDEX_FILE = 'orbit-states-index.json'
+
+#State columns
+STATE_COLUMNS = ['X', 'Y', 'Z', 'Vx', 'Vy', 'Vz']
+
+#Max number of state tensors kept open
+MAX_STATE_TENSORS = 8
+
+stateTensorsLock = threading.Lock()
+stateTensors = OrderedDict()
+
+class StateTensor:
+    """ States of all satellites at common times, as satellites x times x 6 array, with satellites and times indexes """
+    def __init__(self, states: np.ndarray, satIds: list, timestamps: list, utcTimes: list):
+        self.states: np.ndarray = states
+        self.satIds: list = list(satIds)
+        self.timestamps: np.ndarray = np.array(timestamps, dtype=np.int64)
+        self.utcTimes: list = list(utcTimes)
+        self.satIndex: dict = {satId: i for i, satId in enumerate(self.satIds)}
+        self.timeIndex: dict = {int(timestamp): k for k, timestamp in enumerate(self.timestamps)}
+
+    def getTimeIndex(self, timestamp: int) -> int:
+        """ Get index of time [ms], raising if not a common time """
+        if int(timestamp) not in self.timeIndex:
+            raise Exception('ERROR: time {} not found among common times of orbit states'.format(timestamp))
+        return self.timeIndex[int(timestamp)]
+
+    def getDatetime(self, timeIndex: int) -> datetime:
+        """ Get UTC datetime of time index """
+        return datetime.fromtimestamp(self.timestamps[timeIndex] / 1000.0, tz=timezone.utc)
+
+    def getPositions(self, timeIndex: int, satIds: list = None) -> np.ndarray:
+        """ Get positions [m] at time index, of all satellites or of satellites ids, as n x 3 array """
+        if satIds is None:
+            return self.states[:, timeIndex, 0:3]
+        return self.states[[self.satIndex[satId] for satId in satIds], timeIndex, 0:3]
+
+    def getPosition(self, satId: str, timeIndex: int) -> np.ndarray:
+        """ Get position [m] of satellite at time index """
+        return self.states[self.satIndex[satId], timeIndex, 0:3]
+
+    def getState(self, satId: str, timeIndex: int) -> np.ndarray:
+        """ Get position [m] and velocity [m/s] of satellite at time index """
+        return self.states[self.satIndex[satId], timeIndex, :]
+
+def getStateTensor(flightDynamicsDataOutputPath: str) -> StateTensor:
+    """ Get state tensor of Flight Dynamics output folder, memory mapped from its files, built if missing or older than orbit states """
+    with stateTensorsLock:
+        tensorPath = os.path.join(flightDynamicsDataOutputPath, STATE_TENSOR_FILE)
+        indexPath = os.path.join(flightDynamicsDataOutputPath, STATE_TENSOR_INDEX_FILE)
+        stateTensor = stateTensors.get(flightDynamicsDataOutputPath)
+        #Tensors of read only folders are kept in memory, others memory mapped again if files changed
+        if stateTensor is None or (isinstance(stateTensor.states, np.memmap) and not isStateTensorUpToDate(flightDynamicsDataOutputPath)):
+            stateTensor = None
+            if not isStateTensorUpToDate(flightDynamicsDataOutputPath):
+                stateTensor = buildStateTensor(flightDynamicsDataOutputPath)
+                try:
+                    saveStateTensor(stateTensor, tensorPath, indexPath)
+                    stateTensor = None
+                except OSError:
+                    pass
+            if stateTensor is None:
+                with open(indexPath, 'r') as f:
+                    index = json.load(f)
+                stateTensor = StateTensor(np.load(tensorPath, mmap_mode='r'), index['satIds'], index['timestamps'], index['utcTimes'])
+            stateTensors[flightDynamicsDataOutputPath] = stateTensor
+        stateTensors.move_to_end(flightDynamicsDataOutputPath)
+        while len(stateTensors) > MAX_STATE_TENSORS:
+            stateTensors.popitem(last=False)
+        return stateTensors[flightDynamicsDataOutputPath]
+
+def isStateTensorUpToDate(flightDynamicsDataOutputPath: str) -> bool:
+    """ Check if state tensor files exist, and are not older than orbit states files """
+    tensorPath = os.path.join(flightDynamicsDataOutputPath, STATE_TENSOR_FILE)
+    indexPath = os.path.join(flightDynamicsDataOutputPath, STATE_TENSOR_INDEX_FILE)
+    if not os.path.isfile(tensorPath) or not os.path.isfile(indexPath):
+        return False
+    tensorTime = min(os.path.getmtime(tensorPath), os.path.getmtime(indexPath))
+    return all(os.path.getmtime(filePath) <= tensorTime for filePath in glob.glob(os.path.join(flightDynamicsDataOutputPath, '*_orbit-state.*')))
+
+def buildStateTensor(flightDynamicsDataOutputPath: str) -> StateTensor:
+    """ Build state tensor from propagation dataset, at the times common to all satellites """
+    propagationDataset = getPropagationDataset(flightDynamicsDataOutputPath)
+    satIds = [satId for satId in propagationDataset.getSatIds() if len(propagationDataset.getOrbitStates(satId)) > 0]
+    timestamps = None
+    for satId in satIds:
+        satTimestamps = propagationDataset.getOrbitStates(satId)['timestamp'].to_numpy(dtype=np.int64)
+        timestamps = satTimestamps if timestamps is None else np.intersect1d(timestamps, satTimestamps)
+    timestamps = np.unique(timestamps) if timestamps is not None else np.array([], dtype=np.int64)
+    states = np.empty((len(satIds), len(timestamps), len(STATE_COLUMNS)))
+    utcTimes = []
+    for i, satId in enumerate(satIds):
+        statesDf = propagationDataset.getOrbitStates(satId).drop_duplicates('timestamp')
+        statesDf = statesDf.set_index('timestamp').loc[timestamps]
+        states[i] = statesDf[STATE_COLUMNS].to_numpy(dtype=float)
+        if i == 0:
+            utcTimes = statesDf['utcTime'].tolist()
+    return StateTensor(states, satIds, timestamps, utcTimes)
+
+def saveStateTensor(stateTensor: StateTensor, tensorPath: str, indexPath: str):
+    """ Save state tensor as npy file, and its indexes as json file, written last as tensor completion mark """
+    np.save(tensorPath, stateTensor.states)
+    with open(indexPath, 'w') as f:
+        json.dump({'satIds': stateTensor.satIds, 'timestamps': stateTensor.timestamps.tolist(), 'utcTimes': stateTensor.utcTimes}, f)
+
+# -*- coding: utf-8 -*-
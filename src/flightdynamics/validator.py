@@ -0,0 +1,170 @@
+#! /usr/bin/env python3
+
+# Copyright (C)
+# Author: alberto-ferrero
+
+""""
+Columnar validation of propagation data, read as dataframes.
+
+Rules are the ones of the Propagation Data api schema, checked column by column instead of record by record:
+required and additional columns, types, enums and ranges, with the same messages as the schema validation.
+Null values are missing properties, as in the records of the api. Times are also checked to be dates, and
+orbit states to be in time order.
+
+Only a sample of satellites can be validated, for very large repositories: required and additional columns
+are still checked for all satellites, values only for the sampled ones.
+"""
+
+import random
+import numpy as np
+import pandas as pd
+
+from ..utils.schemas import getSchemaValidator
+from ..utils.timeconverter import getTimestampsFromDates
+from .filemanager import PROPAGATION_DATA_TIMESTAMP_COLUMNS
+
+#Schema of propagation data, in api folder
+PROPAGATION_DATA_SCHEMA = 'propagationdata-schema.json'
+
+#Seed of satellites sample, for the same satellites to be validated in each run
+VALIDATION_SAMPLE_SEED = 0
+
+class PropagationDataValidationError(Exception):
+    """ Propagation data not valid, with message as schema validation error """
+    def __init__(self, message: str, keyword: str, schemaPath: list, instancePath: list):
+        self.message = message
+        super().__init__('{}\n\nFailed validating {!r} in schema{}\n\nOn instance{}'.format(
+            message, keyword, ''.join(['[{!r}]'.format(p) for p in schemaPath]), ''.join(['[{!r}]'.format(p) for p in instancePath])))
+
+def validatePropagationData(propagationData: dict, sample: float = None):
+    """ Validate propagation data, as satId: entry: dataframe, against Propagation Data api schema,
+        values of only a sample fraction of satellites if sample given
+    """
+    satSchema = getSchemaValidator(PROPAGATION_DATA_SCHEMA).schema['additionalProperties']
+    satIds = sorted(propagationData.keys())
+    sampledSatIds = set(satIds)
+    if sample is not None and sample < 1:
+        sampledSatIds = set(random.Random(VALIDATION_SAMPLE_SEED).sample(satIds, max(int(round(sample * len(satIds))), 1)))
+    for satId in satIds:
+        satData = propagationData[satId]
+        schemaPath = ['additionalProperties']
+        for entry in satSchema.get('required', []):
+            if entry not in satData:
+                raise PropagationDataValidationError('{!r} is a required property'.format(entry), 'required', schemaPath, [satId])
+        unexpected = [entry for entry in satData if entry not in satSchema['properties']]
+        if unexpected:
+            raise PropagationDataValidationError(getAdditionalPropertiesMessage(unexpected), 'additionalProperties', schemaPath, [satId])
+        for entry, data in satData.items():
+            df = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
+            validateEntry(df, satSchema['properties'][entry]['items'], schemaPath + ['properties', entry, 'items'], [satId, entry], entry, satId in sampledSatIds)
+
+def validateEntry(df: pd.DataFrame, itemSchema: dict, schemaPath: list, instancePath: list, entry: str, withValues: bool = True):
+    """ Validate dataframe columns as items of entry schema, values only if requested """
+    properties = itemSchema['properties']
+    columns = [column for column in df.columns if column not in PROPAGATION_DATA_TIMESTAMP_COLUMNS.get(entry, {})]
+    if len(df) == 0:
+        return
+    #Required properties, also missing if null
+    for column in itemSchema.get('required', []):
+        if column not in df.columns:
+            raise PropagationDataValidationError('{!r} is a required property'.format(column), 'required', schemaPath, instancePath + [0])
+    if itemSchema.get('additionalProperties', True) is False:
+        unexpected = [column for column in columns if column not in properties]
+        if unexpected:
+            raise PropagationDataValidationError(getAdditionalPropertiesMessage(unexpected), 'additionalProperties', schemaPath, instancePath + [0])
+    if not withValues:
+        return
+    for column in itemSchema.get('required', []):
+        nulls = np.flatnonzero(df[column].isna().to_numpy())
+        if len(nulls) > 0:
+            raise PropagationDataValidationError('{!r} is a required property'.format(column), 'required', schemaPath, instancePath + [int(nulls[0])])
+    for column in columns:
+        validateColumn(df[column], properties[column], schemaPath + ['properties', column], instancePath, column)
+    #Orbit states in time order
+    if 'utcTime' in columns and entry == 'orbitStateList':
+        timestamps = df['timestamp'].to_numpy() if 'timestamp' in df.columns else getTimestampsFromDates(df['utcTime'])
+        decreasing = np.flatnonzero(np.diff(timestamps) < 0)
+        if len(decreasing) > 0:
+            k = int(decreasing[0]) + 1
+            raise PropagationDataValidationError('{!r} is before the previous orbit state time'.format(df['utcTime'].iloc[k]), 'order', schemaPath + ['properties', 'utcTime'], instancePath + [k, 'utcTime'])
+
+def validateColumn(column: pd.Series, propertySchema: dict, schemaPath: list, instancePath: list, columnName: str):
+    """ Validate not null values of column with property schema: type, format, enum and range """
+    mask = column.notna().to_numpy()
+    values = column.to_numpy()[mask]
+    rows = np.flatnonzero(mask)
+    if len(values) == 0:
+        return
+    def fail(message: str, keyword: str, index: int):
+        raise PropagationDataValidationError(message, keyword, schemaPath + [keyword], instancePath + [int(rows[index]), columnName])
+
+    #Type
+    propertyType = propertySchema.get('type')
+    invalid = ~getTypeMask(column, values, propertyType) if propertyType else np.zeros(len(values), dtype=bool)
+    if invalid.any():
+        k = int(np.argmax(invalid))
+        fail('{!r} is not of type {!r}'.format(getNativeValue(values[k]), propertyType), 'type', k)
+    #Format of dates
+    if propertySchema.get('format') == 'date':
+        try:
+            getTimestampsFromDates(values)
+        except Exception:
+            for k, value in enumerate(values.tolist()):
+                try:
+                    getTimestampsFromDates([value])
+                except Exception:
+                    fail('{!r} is not a {!r}'.format(value, 'date'), 'format', k)
+    #Enum
+    if 'enum' in propertySchema:
+        invalid = ~pd.Series(values).isin(propertySchema['enum']).to_numpy()
+        if invalid.any():
+            k = int(np.argmax(invalid))
+            fail('{!r} is not one of {!r}'.format(getNativeValue(values[k]), propertySchema['enum']), 'enum', k)
+    #Range
+    if propertyType in ['number', 'integer']:
+        numbers = values.astype(float)
+        for keyword, isInvalid, message in [
+            ('minimum', lambda limit: numbers < limit, '{!r} is less than the minimum of {!r}'),
+            ('maximum', lambda limit: numbers > limit, '{!r} is greater than the maximum of {!r}'),
+            ('exclusiveMinimum', lambda limit: numbers <= limit, '{!r} is less than or equal to the minimum of {!r}'),
+            ('exclusiveMaximum', lambda limit: numbers >= limit, '{!r} is greater than or equal to the maximum of {!r}')]:
+            if keyword in propertySchema:
+                invalid = isInvalid(propertySchema[keyword])
+                if invalid.any():
+                    k = int(np.argmax(invalid))
+                    fail(message.format(getNativeValue(values[k]), propertySchema[keyword]), keyword, k)
+
+def getTypeMask(column: pd.Series, values: np.ndarray, propertyType: str) -> np.ndarray:
+    """ Get mask of values of schema type, by column dtype, or value by value for object columns """
+    if propertyType == 'boolean':
+        if pd.api.types.is_bool_dtype(column.dtype):
+            return np.ones(len(values), dtype=bool)
+        return np.array([isinstance(value, (bool, np.bool_)) for value in values], dtype=bool)
+    if propertyType in ['number', 'integer']:
+        if pd.api.types.is_bool_dtype(column.dtype):
+            return np.zeros(len(values), dtype=bool)
+        if pd.api.types.is_numeric_dtype(column.dtype):
+            numbers = values.astype(float)
+        else:
+            isNumber = np.array([isinstance(value, (int, float, np.number)) and not isinstance(value, (bool, np.bool_)) for value in values], dtype=bool)
+            if not isNumber.all():
+                return isNumber
+            numbers = values.astype(float)
+        #Integers as in schema validation, also floats with no fractional part
+        return np.floor(numbers) == numbers if propertyType == 'integer' else np.ones(len(values), dtype=bool)
+    if propertyType == 'string':
+        if pd.api.types.is_string_dtype(column.dtype) and not pd.api.types.is_object_dtype(column.dtype):
+            return np.ones(len(values), dtype=bool)
+        return np.array([isinstance(value, str) for value in values], dtype=bool)
+    return np.ones(len(values), dtype=bool)
+
+def getNativeValue(value):
+    """ Get python value of numpy scalar, to be shown as in schema validation messages """
+    return value.item() if isinstance(value, np.generic) else value
+
+def getAdditionalPropertiesMessage(unexpected: list) -> str:
+    """ Get message of additional properties, as schema validation """
+    verb = 'was' if len(unexpected) == 1 else 'were'
+    return 'Additional properties are not allowed ({} {} unexpected)'.format(', '.join([repr(p) for p in unexpected]), verb)
+
+# -*- coding: utf-8 -*-
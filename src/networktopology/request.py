@@ -6,15 +6,17 @@
 """ E2E Performance Simulator Network Topology Handler: REST API Requests """
 
 from ..utils.results import AppResult
+from ..utils.tracer import span
 import requests
 import json
 
 def network(url: str, networkRequest: dict) -> dict:
     """ Call the Network Topology mapper and get network data """
-    payload = json.dumps(networkRequest)
-    response = requests.request("POST", url,
-                                headers={'Content-Type': 'application/json'},
-                                data=payload).json()
+    with span('network request', 'http'):
+        payload = json.dumps(networkRequest)
+        response = requests.request("POST", url,
+                                    headers={'Content-Type': 'application/json'},
+                                    data=payload).json()
     if 'status' in response:
         return AppResult(response['status'], networkRequest, response['error'])
     else:
@@ -21,10 +21,13 @@ import os
 import time
 from datetime import datetime
 from ..utils.filemanager import getBasePath, makeOutputFolder
+from ..utils.tracer import resetTrace, span, saveTrace
+from ..utils.manifest import initManifest, readManifestSimulationRequest
 
 #Import Orchestrator modules
 from .preprocessor.preprocessor import preProcessSimulationRequest
 from .postprocessor.postprocessor import postProcessSimulationData
+from .scheduler import runModules, textDataFrom, DEFAULT_MAX_WORKERS
 
 #Import Handlers
 from ..flightdynamics.main import getFlightDynamicsPropagationData
@@ -41,86 +44,82 @@ from ..spacelink.filemanager import getSpaceLinkDataOutputPath
 from ..networktopology.filemanager import getNetworkDataOutputPath
 from ..regulatory.filemanager import getRegulatoryDataOutputPath
 
-def main(inputFile: str) -> str:
-    """Main Orchestrator function call"""
+#Modules handlers, with the modules whose output is taken as input, and output folder
+MODULE_HANDLERS = {
+    'flightDynamics': {'name': 'Flight Dynamics', 'handler': getFlightDynamicsPropagationData, 'inputs': [], 'outputPath': getFlightDynamicsDataOutputPath},
+    'regulatoryMap': {'name': 'Regulatory', 'handler': getRegulatoryMapperData, 'inputs': [], 'outputPath': getRegulatoryDataOutputPath},
+    'airLinkBudget': {'name': 'Air Link Budget', 'handler': getAirLinkBudgetData, 'inputs': ['flightDynamics'], 'outputPath': getAirLinkDataOutputPath},
+    'spaceLinkBudget': {'name': 'Space Link Budget', 'handler': getSpaceLinkBudgetData, 'inputs': ['flightDynamics'], 'outputPath': getSpaceLinkDataOutputPath},
+    'networkTopology': {'name': 'Network Topology', 'handler': getNetworkTopologyData, 'inputs': [], 'outputPath': getNetworkDataOutputPath}
+}
+
+def main(inputFile: str, workers: int = DEFAULT_MAX_WORKERS, resumePath: str = None) -> str:
+    """Main Orchestrator function call, resuming the run in resumePath if given"""
 
     print('\nWelcome to RSN E2E Performance Simulator\n')
     tick = time.time()
-    init = tick
-
-    #Parse input simulation request
-    inputFileAbsPath = os.path.abspath(inputFile)
-    print(' - Reading input scenario file: {}'.format(inputFileAbsPath))
-    simulationRequest: dict = preProcessSimulationRequest(inputFileAbsPath)
+    resetTrace()
 
-    #Build output folder
-    simId = datetime.fromtimestamp(tick).strftime("%Y%m%d-%H%M%S") + "_" + simulationRequest['id']
-    outputPath = makeOutputFolder(os.path.join(getBasePath(), 'output', simId))
-    outputDataFolderPath = os.path.join(outputPath, 'data')
-
-    #Call Handlers if requested by the modules
-    if 'flightDynamics' in simulationRequest['modules']:
-        print(' - Getting Flight Dynamics Data {}'.format(textDataFrom(simulationRequest['modules']['flightDynamics']['data'])))
-        flightDynamicsDataOutputPath: str = getFlightDynamicsPropagationData(simulationRequest, outputDataFolderPath)
-        print(' - Flight Dynamics Data generated in {:.4f} seconds'.format(time.time() - tick))
-        tick = time.time()
+    if resumePath:
+        #Resume run from its output folder, skipping completed stages
+        outputPath = os.path.abspath(resumePath)
+        print(' - Resuming simulation from output folder: {}'.format(outputPath))
+        simulationRequest: dict = readManifestSimulationRequest(outputPath)
     else:
-        print(' - Flight Dynamics Data not generated')
-        flightDynamicsDataOutputPath = None
-    
-    if 'regulatoryMap' in simulationRequest['modules']:
-        print(' - Getting Regulatory Data {}'.format(textDataFrom(simulationRequest['modules']['regulatoryMap']['data'])))
-        regulatoryDataOutputPath: str = getRegulatoryMapperData(simulationRequest, outputDataFolderPath)
-        print(' - Regulatory Data generated in {:.4f} seconds'.format(time.time() - tick))
-        tick = time.time()
-    else:
-        print(' - Regulatory Data not generated')
-        regulatoryDataOutputPath = None
+        #Parse input simulation request
+        inputFileAbsPath = os.path.abspath(inputFile)
+        print(' - Reading input scenario file: {}'.format(inputFileAbsPath))
+        with span('preprocess'):
+            simulationRequest: dict = preProcessSimulationRequest(inputFileAbsPath)
+
+        #Build output folder
+        simId = datetime.fromtimestamp(tick).strftime("%Y%m%d-%H%M%S") + "_" + simulationRequest['id']
+        outputPath = makeOutputFolder(os.path.join(getBasePath(), 'output', simId))
+        initManifest(os.path.join(outputPath, 'data'), simulationRequest)
+
+    #Run simulation, saving stages timing also if failed
+    try:
+        runSimulation(simulationRequest, outputPath, workers)
+    finally:
+        saveTrace(outputPath)
+        print(' - Saved stages timing in output folder {}'.format(outputPath))
 
-    if 'airLinkBudget' in simulationRequest['modules']:
-        print(' - Getting Air Link Budget Data {}'.format(textDataFrom(simulationRequest['modules']['airLinkBudget']['data'])))
-        airLinkDataOutputPath: str = getAirLinkBudgetData(simulationRequest, outputDataFolderPath, flightDynamicsDataOutputPath)
-        print(' - Air Link Budget Data generated in {:.4f} seconds'.format(time.time() - tick))
-        tick = time.time()
-    else:
-        print(' - Air Link Budget Data not generated')
-        airLinkDataOutputPath = None
+    return outputPath
 
-    if 'spaceLinkBudget' in simulationRequest['modules']:
-        print(' - Getting Space Link Budget Data {}'.format(textDataFrom(simulationRequest['modules']['spaceLinkBudget']['data'])))
-        spaceLinkDataOutputPath: str = getSpaceLinkBudgetData(simulationRequest, outputDataFolderPath, flightDynamicsDataOutputPath)
-        print(' - Space Link Budget Data generated in {:.4f} seconds'.format(time.time() - tick))
-        tick = time.time()
-    else:
-        print(' - Space Link Budget Data not generated')
-        spaceLinkDataOutputPath = None
+def runSimulation(simulationRequest: dict, outputPath: str, workers: int = DEFAULT_MAX_WORKERS) -> str:
+    """ Run simulation modules and post processing, saving results in output folder """
+    tick = time.time()
+    init = tick
+    outputDataFolderPath = os.path.join(outputPath, 'data')
 
-    if 'networkTopology' in simulationRequest['modules']:
-        print(' - Getting Network Topology Data {}'.format(textDataFrom(simulationRequest['modules']['networkTopology']['data'])))
-        networkDataOutputPath: str = getNetworkTopologyData(simulationRequest, outputDataFolderPath)
-        print(' - Network Topology Data generated in {:.4f} seconds'.format(time.time() - tick))
-        tick = time.time()
-    else:
-        print(' - Network Topology Data not generated')
-        networkDataOutputPath = None
+    #Call Handlers if requested by the modules, running independent modules at the same time
+    with span('modules'):
+        outputPaths: dict = runModules(simulationRequest, outputDataFolderPath, MODULE_HANDLERS, workers)
+    flightDynamicsDataOutputPath = outputPaths['flightDynamics']
+    regulatoryDataOutputPath = outputPaths['regulatoryMap']
+    airLinkDataOutputPath = outputPaths['airLinkBudget']
+    spaceLinkDataOutputPath = outputPaths['spaceLinkBudget']
+    networkDataOutputPath = outputPaths['networkTopology']
 
     print(' - E2E Simulation run completed in {:.4f} seconds'.format(time.time() - init))
     tick = time.time()
 
     #Post Processing and generating perfomance output
-    postProcessSimulationData(simulationRequest, 
-                outputPath,
-                outputDataFolderPath,
-                flightDynamicsDataOutputPath,
-                regulatoryDataOutputPath,
-                airLinkDataOutputPath,
-                spaceLinkDataOutputPath,
-                networkDataOutputPath)
+    with span('postprocess'):
+        postProcessSimulationData(simulationRequest, 
+                    outputPath,
+                    outputDataFolderPath,
+                    flightDynamicsDataOutputPath,
+                    regulatoryDataOutputPath,
+                    airLinkDataOutputPath,
+                    spaceLinkDataOutputPath,
+                    networkDataOutputPath)
 
     #Export budgets    
     if 'systeBudgets' in simulationRequest['modules']:
         print(' - Exporting System Budgets Data {}'.format(textDataFrom(simulationRequest['modules']['systemBudgets']['data'])))
-        budgetsDataOutputPath: str = exportBudgetsData(simulationRequest, outputDataFolderPath)
+        with span('export budgets'):
+            budgetsDataOutputPath: str = exportBudgetsData(simulationRequest, outputDataFolderPath)
         print(' - System Budgets Data exported and stored in {:.4f} seconds'.format(time.time() - tick))
         tick = time.time()
     else:
@@ -132,12 +131,4 @@ def main(inputFile: str) -> str:
 
     return outputPath
 
-###############################################################################
-
-def textDataFrom(tag: str) -> str:
-    if tag == 'run':
-        return "running calculation from server"
-    else:
-        return "from stored {} repository".format(tag)
-
-# -*- coding: utf-8 -*-
\ No newline at end of file
+# -*- coding: utf-8 -*-
@@ -0,0 +1,23 @@
+#! /usr/bin/env python3
+
+# Copyright (C)
+# Author: alberto-ferrero
+
+import threading
+
+""" E2E Performance Simulator Analysis: world base map, shared by all plots """
+
+WORLD_MAP_DATASET = "naturalearth_lowres"
+
+worldMapLock = threading.Lock()
+worldMaps = {}
+
+def getWorldMap():
+    """ Get world map geodataframe, read only the first time, to be plotted not modified """
+    import geopandas as gpd
+    with worldMapLock:
+        if WORLD_MAP_DATASET not in worldMaps:
+            worldMaps[WORLD_MAP_DATASET] = gpd.read_file(gpd.datasets.get_path(WORLD_MAP_DATASET))
+        return worldMaps[WORLD_MAP_DATASET]
+
+# -*- coding: utf-8 -*-
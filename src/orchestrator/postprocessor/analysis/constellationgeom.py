@@ -4,19 +4,19 @@
 # Author: alberto-ferrero
 
 import os
-import glob
 import time
 import pyorb
-import geopandas as gpd
 import matplotlib.pyplot as plt
 import pandas as pd
 import numpy as np
 from PIL import Image
 from math import pi
 
-from ..analysis.noc import getSatelliteLatitudeLongitude, getSatellitePositionVelocity
+from ..analysis.noc import getSatellitesLatitudeLongitude
+from ..analysis.basemap import getWorldMap
 from ....utils.filemanager import makeOutputFolder
-from ....utils.timeconverter import getTimestampFromDate
+from ....utils.tracer import span
+from ....flightdynamics.statetensor import getStateTensor
 
 #HACK ignoring all conversion and deprecations WARNINGS
 import warnings
@@ -29,67 +29,52 @@ from docx import Document
 
 def write(doc: Document, simulationRequest: dict, outputPlotFolderPath: str, flightDynamicsDataOutputPath: str):
     """Write analyis chapter """
-    #Read from Flight Dynamics file and extract mean Keplerian elements
+    #Get Flight Dynamics data and extract mean Keplerian elements
     tick = time.time()
-    satsStatesDf = {}
-    utcTimestamps = []
-    for fileName in glob.glob(os.path.join(flightDynamicsDataOutputPath, "*_orbit-state.csv")):
-        df = pd.read_csv(fileName)
-        satId = fileName.split(os.sep)[-1].split("_")[0]
-        df = df[['utcTime', 'X', 'Y', 'Z', 'Vx', 'Vy', 'Vz']]
-        df['timestamp'] = df['utcTime'].apply(getTimestampFromDate)
-        satsStatesDf[satId] = df
-        #Get list of timestamps
-        if utcTimestamps == []:
-            utcTimestamps = df['timestamp'].to_list()
-        else:
-            utcTimestamps = set(utcTimestamps).intersection(df['timestamp'].to_list())
+    stateTensor = getStateTensor(flightDynamicsDataOutputPath)
 
-    if len(satsStatesDf) == 0:
+    if len(stateTensor.satIds) == 0:
         return
 
     #Get Keplerian Elements from orbit definition
     raan = []
     la = []
-    for satId in satsStatesDf:
-        kepl = pyorb.cart_to_kep(getSatellitePositionVelocity(satsStatesDf[satId], index=0)).tolist()
+    for satId in stateTensor.satIds:
+        kepl = pyorb.cart_to_kep(np.array(stateTensor.getState(satId, 0))).tolist()
         raan.append(kepl[4] * 180.0 / pi)
         la.append((kepl[3] + kepl[5]) * 180.0 / pi)
         la[-1] = la[-1] if la[-1] < 355 else 0
 
-    #Get list of timestamps
-    [set(utcTimestamps)].sort()
-
     #Save image for each time in tmp
     tmpPath = os.path.join(outputPlotFolderPath, 'tmp')
     makeOutputFolder(tmpPath)
     images = []
-    for i, utcTimestamp in enumerate(utcTimestamps):
+    for i, utcTimestamp in enumerate(stateTensor.timestamps.tolist()):
         if i > 100:
             break
-        #Build map
-        worldmap = gpd.read_file(gpd.datasets.get_path("naturalearth_lowres"))
-        fig, ax = plt.subplots(figsize=(8, 8))
-        ax.set_xlabel("Longitude [deg]")
-        ax.set_ylabel("Latitude [deg]")
-        worldmap.plot(color="darkgrey", ax=ax)
-        ax.set(xlim=[-180, 180], ylim=[-90, 90])
-        for satId in satsStatesDf:
-            index = np.where(satsStatesDf[satId]["timestamp"] == utcTimestamp)[0].tolist()[0]
-            lat, lng = getSatelliteLatitudeLongitude(satsStatesDf[satId], index=index)
-            ax.scatter(lng, lat, s=10, c=['black'], alpha=0.7)
-            ax.annotate(satId, (lng, lat), fontsize=7)
-        t = satsStatesDf[satId].iloc[index]['utcTime']
-        ax.set_title(t)
-        ax.margins(x=0.9,y=0)
-        figPath = os.path.join(tmpPath, "analysis_constellation-orbit-{}.jpg".format(utcTimestamp))
-        images.append(figPath)
-        fig.savefig(figPath)
-        #Save first, image and position
-        if i == 0:
-            timezero = t.replace("T", " at ").replace("Z", "")
-            figPath = os.path.join(outputPlotFolderPath, "analysis_constellation-orbit.jpg")
-            fig.savefig(figPath, bbox_inches='tight')
+        with span('orbit frame', 'render', timestamp=utcTimestamp):
+            #Build map
+            worldmap = getWorldMap()
+            fig, ax = plt.subplots(figsize=(8, 8))
+            ax.set_xlabel("Longitude [deg]")
+            ax.set_ylabel("Latitude [deg]")
+            worldmap.plot(color="darkgrey", ax=ax)
+            ax.set(xlim=[-180, 180], ylim=[-90, 90])
+            lats, lngs = getSatellitesLatitudeLongitude(stateTensor, i)
+            ax.scatter(lngs, lats, s=10, c=['black'], alpha=0.7)
+            for satId, lat, lng in zip(stateTensor.satIds, lats, lngs):
+                ax.annotate(satId, (lng, lat), fontsize=7)
+            t = stateTensor.utcTimes[i]
+            ax.set_title(t)
+            ax.margins(x=0.9,y=0)
+            figPath = os.path.join(tmpPath, "analysis_constellation-orbit-{}.jpg".format(utcTimestamp))
+            images.append(figPath)
+            fig.savefig(figPath)
+            #Save first, image and position
+            if i == 0:
+                timezero = t.replace("T", " at ").replace("Z", "")
+                figPath = os.path.join(outputPlotFolderPath, "analysis_constellation-orbit.jpg")
+                fig.savefig(figPath, bbox_inches='tight')
 
     #Save gifs
     images.sort()
@@ -4,7 +4,6 @@
 # Author: alberto-ferrero
 
 import os
-import glob
 import time
 
 import pandas as pd
@@ -16,7 +15,8 @@ from math import ceil
 
 from ....orchestrator.preprocessor.preprocessor import readGroundStations, readUserTerminals
 from ....utils.filemanager import makeOutputFolder
-from ....utils.timeconverter import getDatetimeFromDate
+from ....flightdynamics.dataset import getPropagationDataset
+from ....utils.timeconverter import getDatetimesFromTimestamps
 
 # Register time converters
 pd.plotting.register_matplotlib_converters()
@@ -30,21 +30,15 @@ def write(doc: Document, simulationRequest: dict, outputDataFolderPath: str, out
     """Write analyis chapter """
     from scipy.interpolate import RegularGridInterpolator as RGI
     tick = time.time()
-    #Read from Flight Dynamics file and extract contacts info
+    #Get Flight Dynamics data and extract contacts info
+    propagationDataset = getPropagationDataset(flightDynamicsDataOutputPath)
     utsDf = {}
     gssDf = {}
-    for fileName in glob.glob(os.path.join(flightDynamicsDataOutputPath, "*_contacts.csv")):
-        satId = fileName.split(os.sep)[-1].split("_")[0]
-        try:
-            df = pd.read_csv(fileName)
-            if df.empty:
-                continue
-        except:
-            continue
-        df = df.loc[df['contactType'] == "POI"]
+    for satId in propagationDataset.getSatIds():
+        df = propagationDataset.getContacts(satId, "POI")
         if len(df) == 0:
             continue
-        df = df[['argumentOfInterestId', 'startUtcTime', 'endUtcTime', 'maxElevationElevation']]
+        df = df[['argumentOfInterestId', 'startTimestamp', 'endTimestamp', 'maxElevationElevation']]
         df['satId'] = satId
         # Store contacts for the args
         argIds = set(df['argumentOfInterestId'].to_list())
@@ -84,7 +78,8 @@ def write(doc: Document, simulationRequest: dict, outputDataFolderPath: str, out
         if ut['id'] in utsDf.keys():
             coords[ut['id']] = {
                 "lat": ut['location']['latitude'],
-                "lng": ut['location']['longitude']
+                "lng": ut['location']['longitude'],
+                "weight": ut.get('weight', 1)
             }
     
     #Write       
@@ -121,16 +116,15 @@ def write(doc: Document, simulationRequest: dict, outputDataFolderPath: str, out
             
             ###############################################################
             #Extract number of contacts
-            startTimeDf: pd.DataFrame = df[['satId', 'startUtcTime', 'maxElevationElevation']].copy()
-            startTimeDf.rename(columns={"startUtcTime": "time"}, inplace=True)
+            startTimeDf: pd.DataFrame = df[['satId', 'startTimestamp', 'maxElevationElevation']].copy()
+            startTimeDf.rename(columns={"startTimestamp": "time"}, inplace=True)
             startTimeDf['contact'] = 1
-            endTimeDf: pd.DataFrame = df[['satId', 'endUtcTime', 'maxElevationElevation']].copy()
-            endTimeDf.rename(columns={"endUtcTime": "time"}, inplace=True)
+            endTimeDf: pd.DataFrame = df[['satId', 'endTimestamp', 'maxElevationElevation']].copy()
+            endTimeDf.rename(columns={"endTimestamp": "time"}, inplace=True)
             endTimeDf['contact'] = -1
             contactTimeDf = pd.concat([startTimeDf, endTimeDf], ignore_index=True)
-            contactTimeDf['time'] = contactTimeDf['time'].apply(getDatetimeFromDate)
             contactTimeDf.sort_values(by='time', inplace=True)
-            pd.to_datetime(contactTimeDf['time'], format='%Y-%m-%dT%H:%M:%S.%fZ')
+            contactTimeDf['time'] = getDatetimesFromTimestamps(contactTimeDf['time'])
             dates.extend([contactTimeDf['time'].to_list()[0], contactTimeDf['time'].to_list()[-1]])
             contactTimeDf['contacts'] = contactTimeDf['contact'].cumsum()
             maxContacts.append(max(contactTimeDf['contacts'].to_list()))
@@ -146,8 +140,10 @@ def write(doc: Document, simulationRequest: dict, outputDataFolderPath: str, out
                     filteredElevDf = filteredElevDf[filteredElevDf['maxElevationElevation'] < elev]
                     if not filteredElevDf.empty:
                         filteredElevDf['filtContacts'] = filteredElevDf['contact'].cumsum()
-                        visibility[elevIndex][latIndex] += filteredElevDf['filtContacts'].mean()
-                        numerosity[elevIndex][latIndex] += 1
+                        #User terminals cells weighted by their members
+                        weight = coords[poiId].get('weight', 1)
+                        visibility[elevIndex][latIndex] += weight * filteredElevDf['filtContacts'].mean()
+                        numerosity[elevIndex][latIndex] += weight
                     del filteredElevDf
 
         #Resize and set tags
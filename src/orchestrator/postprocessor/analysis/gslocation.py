@@ -5,9 +5,9 @@
 
 import os
 import time
-import geopandas as gpd
 import matplotlib.pyplot as plt
 
+from ..analysis.basemap import getWorldMap
 from ....orchestrator.preprocessor.preprocessor import readGroundStations
 
 #Import docx
@@ -34,7 +34,7 @@ def write(doc: Document, outputPlotFolderPath: str, simulationRequest: dict):
     if len(gss) > 0:
 
         #Build image
-        worldmap = gpd.read_file(gpd.datasets.get_path("naturalearth_lowres"))
+        worldmap = getWorldMap()
         fig, ax = plt.subplots(figsize=(8, 8))
         worldmap.plot(color="lightgrey", ax=ax)
         ax.set(xlim=[-180, 180], ylim=[-90, 90])
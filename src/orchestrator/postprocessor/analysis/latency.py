@@ -4,10 +4,8 @@
 # Author: alberto-ferrero
 
 import os
-import glob
 import time
 
-import geopandas as gpd
 import matplotlib.pyplot as plt
 from PIL import Image
 
@@ -20,9 +18,12 @@ import numpy as np
 
 from ..analysis.noc import getFlatXConnections, getItalXConnections
 from ..analysis.noc import getCloserSatelliteDistance, getCloserSatelliteDistanceMesh
-from ..analysis.noc import getGeopointFromLatLong, getSatelliteLatitudeLongitude, getDistance, getSatellitePosition
+from ..analysis.noc import getGeopointFromLatLong, getSatellitesLatitudeLongitude, getDistance
+from ..analysis.basemap import getWorldMap
 
 from ....utils.filemanager import makeOutputFolder
+from ....flightdynamics.statetensor import getStateTensor
+from ....utils.tracer import span
 from ....utils.timeconverter import getDatetimeFromDate
 
 #Import docx
@@ -37,21 +38,17 @@ deltaAngle = 5     #[deg]
 
 def write(doc: Document, outputDataFolderPath: str, outputPlotFolderPath: str, flightDynamicsDataOutputPath: str):
     tick = time.time()
-    #Read from Flight Dynamics file and extract EME2000 coordinates
-    satsStatesDf = {}
+    #Get Flight Dynamics data and extract EME2000 coordinates
+    stateTensor = getStateTensor(flightDynamicsDataOutputPath)
     totSats = 0
     totPlanes = 0
-    for fileName in glob.glob(os.path.join(flightDynamicsDataOutputPath, "*_orbit-state.csv")):
-        satId = fileName.split(os.sep)[-1].split("_")[0]
-        df = pd.read_csv(fileName)
-        df = df[['utcTime', 'X', 'Y', 'Z']].iloc[0:1]
-        satsStatesDf[satId] = df
-        t = getDatetimeFromDate(df.iloc[0]['utcTime'])
+    for satId in stateTensor.satIds:
         totSats = int(satId.split("-")[-1]) if int(satId.split("-")[-1]) > totSats else totSats
         totPlanes = int(satId.split("-")[-2].replace('P','')) if int(satId.split("-")[-2].replace('P','')) > totPlanes else totPlanes 
 
-    if satsStatesDf == {}:
+    if len(stateTensor.satIds) == 0:
         return
+    t = getDatetimeFromDate(stateTensor.utcTimes[0])
     
     outputAnalysFolderPath = os.path.join(outputDataFolderPath, 'analysis')
     makeOutputFolder(outputAnalysFolderPath)
@@ -70,92 +67,90 @@ def write(doc: Document, outputDataFolderPath: str, outputPlotFolderPath: str, f
         latitudes = np.arange(0, 95, 5)
         #Save mesh
         with open(os.path.join(outputAnalysFolderPath, "analysis_connections-{}-mesh-time-0.txt".format(tag.replace(" ", ""))), "w") as f:
-            for satId in satsStatesDf:
+            for satId in stateTensor.satIds:
                 f.write("{} {}\n".format(satId, getMesh(satId, totPlanes, totSats)))
         images = []
         for latitude in latitudes:
-            longitude = 0
-            firstGeoPoint = getGeopointFromLatLong(latitude, longitude, t)
-
-            #Get first communication distance
-            firstDistance, firstSatId = getCloserSatelliteDistance(satsStatesDf, firstGeoPoint)
-            firstDelay = firstDistance / c
-
-            #Empty delays
-            delays = np.empty(shape=(len(lats), len(lngs)))
-            worstDelay = 0
-            worstLatLng = []
-            #Get closer satellite distance and calculate delay as d * c
-            for i, lat in enumerate(lats):
-                for j, lng in enumerate(lngs):
-                    geoPoint = getGeopointFromLatLong(lat, lng, t)
-                    distance, closerSatId = getCloserSatelliteDistance(satsStatesDf, geoPoint)
-                    #Go through mesh from initial geo point up to target point
-                    nextSatId = closerSatId
-                    contactedSatIds = [closerSatId, ]
-                    #[DEBUG]print("\n", lat, lng, "from SAT", closerSatId, "to SAT", firstSatId)
-                    while nextSatId != firstSatId:
-                        #From the current point, amongh the ones in the mesh, get closer to initial geo point
-                        closerSatId = getCloserSatelliteDistanceMesh(getMesh, totPlanes, totSats, satsStatesDf, firstGeoPoint, contactedSatIds + [nextSatId,], firstSatId)
-                        #[DEBUG]print(nextSatId, [satId for satId in getMesh(nextSatId) if satId not in contactedSatIds], 'closer', closerSatId)
-                        contactedSatIds.append(closerSatId)
-                        #Add intersatellite distance and go to next
-                        distance += getDistance(getSatellitePosition(satsStatesDf[closerSatId]),
-                                                getSatellitePosition(satsStatesDf[nextSatId]))
+            with span('latency frame', 'render', mesh=tag, latitude=latitude):
+                longitude = 0
+                firstGeoPoint = getGeopointFromLatLong(latitude, longitude, t)
+
+                #Get first communication distance
+                firstDistance, firstSatId = getCloserSatelliteDistance(stateTensor, firstGeoPoint)
+                firstDelay = firstDistance / c
+
+                #Empty delays
+                delays = np.empty(shape=(len(lats), len(lngs)))
+                worstDelay = 0
+                worstLatLng = []
+                #Get closer satellite distance and calculate delay as d * c
+                for i, lat in enumerate(lats):
+                    for j, lng in enumerate(lngs):
+                        geoPoint = getGeopointFromLatLong(lat, lng, t)
+                        distance, closerSatId = getCloserSatelliteDistance(stateTensor, geoPoint)
+                        #Go through mesh from initial geo point up to target point
                         nextSatId = closerSatId
-                    #[DEBUG]if (distance / c + firstDelay) * 1000.0 > 300:
-                        #[DEBUG]print('Delay:', (distance / c + firstDelay) * 1000.0)
-                        #[DEBUG]print(lat, lng, "from SAT", contactedSatIds[0], "to SAT", firstSatId, "\n")
-                        #[DEBUG]print(contactedSatIds + [nextSatId,])
-                    delay = (distance / c + firstDelay) * 1000.0 #to [millis]
-                    delays[i][j] = delay
-                    if delay > worstDelay:
-                        worstDelay = delay
-                        worstLatLng = [lat, lng]
-
-            #Build heat map
-            worldmap = gpd.read_file(gpd.datasets.get_path("naturalearth_lowres"))
-            fig, ax = plt.subplots(figsize=(8, 8))
-            worldmap.plot(color="darkgrey", ax=ax)
-            cs = ax.contourf(lngs, lats, delays, alpha=0.3)
-            cf = fig.colorbar(cs, fraction=0.046, pad=0.04)
-            cf.ax.set_ylabel("Latency [millis]", loc='center')
-            ax.set_xlabel("Longitude [deg]")
-            ax.set_ylabel("Latitude [deg]")
-            ax.set(xlim=[lngs[0], lngs[-1]], ylim=[lats[0], lats[-1]])
-            for satId in satsStatesDf:
-                lat, lng = getSatelliteLatitudeLongitude(satsStatesDf[satId])
-                ax.scatter(lng, lat, s=10, c=['black'], alpha=0.7)
-                #[DEBUG]ax.annotate(satId, (lng, lat), fontsize=7)
-            ax.scatter(longitude, latitude, s=30, c=['black'], alpha=0.9)
-            ax.annotate("UT", (longitude, latitude))
-            ax.scatter(worstLatLng[1], worstLatLng[0], s=30, c=['red'], alpha=0.9, marker="*")
-            ax.annotate("WUL", (worstLatLng[1], worstLatLng[0]))
-            #Save initial figure
-            if latitude == 0:
-                figPath = os.path.join(outputPlotFolderPath, "analysis_latency-{}-mesh.jpg".format(tag.replace(" ", "")))
+                        contactedSatIds = [closerSatId, ]
+                        #[DEBUG]print("\n", lat, lng, "from SAT", closerSatId, "to SAT", firstSatId)
+                        while nextSatId != firstSatId:
+                            #From the current point, amongh the ones in the mesh, get closer to initial geo point
+                            closerSatId = getCloserSatelliteDistanceMesh(getMesh, totPlanes, totSats, stateTensor, firstGeoPoint, contactedSatIds + [nextSatId,], firstSatId)
+                            #[DEBUG]print(nextSatId, [satId for satId in getMesh(nextSatId) if satId not in contactedSatIds], 'closer', closerSatId)
+                            contactedSatIds.append(closerSatId)
+                            #Add intersatellite distance and go to next
+                            distance += getDistance(stateTensor.getPosition(closerSatId, 0), stateTensor.getPosition(nextSatId, 0))
+                            nextSatId = closerSatId
+                        #[DEBUG]if (distance / c + firstDelay) * 1000.0 > 300:
+                            #[DEBUG]print('Delay:', (distance / c + firstDelay) * 1000.0)
+                            #[DEBUG]print(lat, lng, "from SAT", contactedSatIds[0], "to SAT", firstSatId, "\n")
+                            #[DEBUG]print(contactedSatIds + [nextSatId,])
+                        delay = (distance / c + firstDelay) * 1000.0 #to [millis]
+                        delays[i][j] = delay
+                        if delay > worstDelay:
+                            worstDelay = delay
+                            worstLatLng = [lat, lng]
+
+                #Build heat map
+                worldmap = getWorldMap()
+                fig, ax = plt.subplots(figsize=(8, 8))
+                worldmap.plot(color="darkgrey", ax=ax)
+                cs = ax.contourf(lngs, lats, delays, alpha=0.3)
+                cf = fig.colorbar(cs, fraction=0.046, pad=0.04)
+                cf.ax.set_ylabel("Latency [millis]", loc='center')
+                ax.set_xlabel("Longitude [deg]")
+                ax.set_ylabel("Latitude [deg]")
+                ax.set(xlim=[lngs[0], lngs[-1]], ylim=[lats[0], lats[-1]])
+                satLats, satLngs = getSatellitesLatitudeLongitude(stateTensor)
+                ax.scatter(satLngs, satLats, s=10, c=['black'], alpha=0.7)
+                ax.scatter(longitude, latitude, s=30, c=['black'], alpha=0.9)
+                ax.annotate("UT", (longitude, latitude))
+                ax.scatter(worstLatLng[1], worstLatLng[0], s=30, c=['red'], alpha=0.9, marker="*")
+                ax.annotate("WUL", (worstLatLng[1], worstLatLng[0]))
+                #Save initial figure
+                if latitude == 0:
+                    figPath = os.path.join(outputPlotFolderPath, "analysis_latency-{}-mesh.jpg".format(tag.replace(" ", "")))
+                    fig.tight_layout()
+                    fig.savefig(figPath, bbox_inches='tight')
+                    doc.add_paragraph('The picture below shows signal delay in milliseconds, from an user terminal set at Latitude {} deg, Longitude {} deg, for {} mesh geometry'.format(latitude, longitude, tag))
+                    p = doc.add_paragraph()
+                    r = p.add_run()
+                    r.add_picture(figPath)
+                    doc.add_paragraph('The table below summarizes position of WUL, Worst User Location, considering transmission delay from UT at different latitudes')
+                    table = doc.add_table(rows=1, cols=2, style="Table Grid")
+                    heading = table.rows[0].cells
+                    heading[0].text = "UT Coordinates"
+                    heading[1].text = "WUL Coordinates"
+                ax.set_title("Lat = {} deg".format(latitude))
+                pd.DataFrame(delays, columns=lngs, index=lats).to_csv(os.path.join(outputAnalysFolderPath, 'analysis_latency-{}-mesh-{}.csv'.format(tag.replace(" ", ""), latitude)))
+                # Set value of worst condition
+                cells = table.add_row().cells
+                cells[0].text = "Lng = 00 deg\nLat = {} deg".format(str(int(latitude)).zfill(2))
+                cells[1].text = "Lng = {} deg\nLat = {} deg\nDelay = {} ms".format(str(int(worstLatLng[1])).zfill(2), str(int(worstLatLng[0])).zfill(2), str(int(worstDelay)).zfill(3))
+
+                figTmpPath = os.path.join(tmpPath, "analysis_latency-{}-mesh-{}.jpg".format(tag.replace(" ", ""), latitude))
                 fig.tight_layout()
-                fig.savefig(figPath, bbox_inches='tight')
-                doc.add_paragraph('The picture below shows signal delay in milliseconds, from an user terminal set at Latitude {} deg, Longitude {} deg, for {} mesh geometry'.format(latitude, longitude, tag))
-                p = doc.add_paragraph()
-                r = p.add_run()
-                r.add_picture(figPath)
-                doc.add_paragraph('The table below summarizes position of WUL, Worst User Location, considering transmission delay from UT at different latitudes')
-                table = doc.add_table(rows=1, cols=2, style="Table Grid")
-                heading = table.rows[0].cells
-                heading[0].text = "UT Coordinates"
-                heading[1].text = "WUL Coordinates"
-            ax.set_title("Lat = {} deg".format(latitude))
-            pd.DataFrame(delays, columns=lngs, index=lats).to_csv(os.path.join(outputAnalysFolderPath, 'analysis_latency-{}-mesh-{}.csv'.format(tag.replace(" ", ""), latitude)))
-            # Set value of worst condition
-            cells = table.add_row().cells
-            cells[0].text = "Lng = 00 deg\nLat = {} deg".format(str(int(latitude)).zfill(2))
-            cells[1].text = "Lng = {} deg\nLat = {} deg\nDelay = {} ms".format(str(int(worstLatLng[1])).zfill(2), str(int(worstLatLng[0])).zfill(2), str(int(worstDelay)).zfill(3))
-
-            figTmpPath = os.path.join(tmpPath, "analysis_latency-{}-mesh-{}.jpg".format(tag.replace(" ", ""), latitude))
-            fig.tight_layout()
-            fig.savefig(figTmpPath, bbox_inches='tight')
-            images.append(figTmpPath)
+                fig.savefig(figTmpPath, bbox_inches='tight')
+                images.append(figTmpPath)
 
         #Save gif
         frames = [Image.open(image) for image in images]
@@ -7,9 +7,12 @@ import os
 import glob
 import time
 
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 
+from ....orchestrator.preprocessor.preprocessor import readUserTerminals
+from ....orchestrator.preprocessor.utcells import getUserTerminalsWeights
 from ....utils.filemanager import makeOutputFolder
 
 # Register time converters
@@ -20,7 +23,7 @@ from docx import Document
 
 """ E2E Performance Simulator Analysis: Links """
 
-def write(doc: Document, outputDataFolderPath: str, outputPlotFolderPath: str, linkDataOutputPath: str):
+def write(doc: Document, simulationRequest: dict, outputDataFolderPath: str, outputPlotFolderPath: str, linkDataOutputPath: str):
     """Write analyis chapter """
     tick = time.time()
     #Read from Link Budget file and extract links info
@@ -59,11 +62,53 @@ def write(doc: Document, outputDataFolderPath: str, outputPlotFolderPath: str, l
     doc.add_heading("Calculated Links", 1)
 
     ###################################################################
-    #Plot number of visible satellites for each User Terminal and Ground Station
-    #TODO
+    #Links statistics for Ground Stations and User Terminals, User Terminals cells weighted by their members
+    weights = getUserTerminalsWeights(readUserTerminals(simulationRequest))
+    statistics = {'GS': getLinksStatistics(gssDf, {}), 'UT': getLinksStatistics(utsDf, weights)}
+    pd.DataFrame(statistics).T.to_csv(os.path.join(outputAnalysFolderPath, 'analysis_links-statistics.csv'))
+    doc.add_paragraph('The table below shows, for ground stations and user terminals with links, the mean carrier to noise ratio of uplink and downlink over all links.')
+    table = doc.add_table(rows=1, cols=4, style="Table Grid")
+    heading = table.rows[0].cells
+    for cell, text in zip(heading, ['Ground Points', 'Number', 'Mean uCNR [dB]', 'Mean dCNR [dB]']):
+        cell.text = text
+    for t, stats in statistics.items():
+        if stats['grounds'] == 0:
+            continue
+        row = table.add_row().cells
+        row[0].text = t
+        row[1].text = str(stats['grounds'])
+        row[2].text = '{:.2f}'.format(stats['uCNR'])
+        row[3].text = '{:.2f}'.format(stats['dCNR'])
+
+    #Histogram of downlink carrier to noise ratio of User Terminals links
+    if utsDf != {}:
+        df = pd.concat(utsDf.values(), ignore_index=True)
+        fig, ax = plt.subplots(figsize=(8, 4))
+        ax.hist(df['dCNR'], bins=50, weights=df['grId'].map(weights).fillna(1))
+        ax.set_xlabel("dCNR [dB]")
+        ax.set_ylabel("User Terminals Links")
+        figPath = os.path.join(outputPlotFolderPath, "analysis_UT-links-dCNR.png")
+        fig.tight_layout()
+        fig.savefig(figPath, bbox_inches='tight')
+        doc.add_paragraph('The picture below shows the distribution of downlink carrier to noise ratio of user terminals links')
+        p = doc.add_paragraph()
+        r = p.add_run()
+        r.add_picture(figPath)
 
     plt.close('all')
     print('   - Added section on Ground Stations and User Terminals Link analysis in {:.4f} seconds'.format(time.time() - tick))
 
+def getLinksStatistics(linksDfs: dict, weights: dict) -> dict:
+    """ Get number of ground points with links and mean carrier to noise ratios [dB] over their links,
+        each ground point counted as its weight, 1 if not given
+    """
+    if linksDfs == {}:
+        return {'grounds': 0, 'links': 0, 'uCNR': np.nan, 'dCNR': np.nan}
+    df = pd.concat(linksDfs.values(), ignore_index=True)
+    linkWeights = df['grId'].map(weights).fillna(1).to_numpy(dtype=float)
+    return {'grounds': int(sum([weights.get(grId, 1) for grId in linksDfs.keys()])),
+            'links': int(linkWeights.sum()),
+            'uCNR': float(np.average(df['uCNR'], weights=linkWeights)),
+            'dCNR': float(np.average(df['dCNR'], weights=linkWeights))}
 
 # -*- coding: utf-8 -*-
\ No newline at end of file
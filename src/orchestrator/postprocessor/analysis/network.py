@@ -4,13 +4,11 @@
 # Author: alberto-ferrero
 
 import os
-import glob
 import time
 
 import pandas as pd
 import numpy as np
 
-import geopandas as gpd
 import matplotlib.pyplot as plt
 from PIL import Image
 
@@ -19,10 +17,14 @@ import warnings
 warnings.simplefilter(action='ignore')
 
 from ..analysis.noc import getCloserSatelliteDistance, getCloserSatelliteContactDistance
-from ..analysis.noc import getGeopointFromLatLong, getSatelliteLatitudeLongitude
+from ..analysis.noc import getGeopointFromLatLong, getSatelliteLatitudeLongitude, getSatellitesLatitudeLongitude
+from ..analysis.basemap import getWorldMap
 
 from ....utils.filemanager import makeOutputFolder
-from ....utils.timeconverter import getDateFromTimestamp, getTimestampFromDate
+from ....utils.tracer import span
+from ....utils.timeconverter import getDateFromTimestamp
+from ....flightdynamics.dataset import getPropagationDataset
+from ....flightdynamics.statetensor import getStateTensor
 
 from ....spacelink.request import getContactStates
 
@@ -40,32 +42,15 @@ def write(doc: Document, outputDataFolderPath: str, outputPlotFolderPath: str, f
     tick = time.time()    
     
     #Extract intersatellite visibility
-    utcTimestamps = []
-    satsStatesDf = {}
+    propagationDataset = getPropagationDataset(flightDynamicsDataOutputPath)
+    stateTensor = getStateTensor(flightDynamicsDataOutputPath)
     satsContactsDf = {}
-    for fileName in glob.glob(os.path.join(flightDynamicsDataOutputPath, "*_orbit-state.csv")):
-        satId = fileName.split(os.sep)[-1].split("_")[0]
-        df = pd.read_csv(fileName)
-        df = df[['utcTime', 'X', 'Y', 'Z']]
-        df['timestamp'] = df['utcTime'].apply(getTimestampFromDate)
-        satsStatesDf[satId] = df
-        #Get list of timestamps
-        if utcTimestamps == []:
-            utcTimestamps = df['timestamp'].to_list()
-        else:
-            utcTimestamps = set(utcTimestamps).intersection(df['timestamp'].to_list())
-        #Read contacts
-        df = pd.read_csv(os.path.join(flightDynamicsDataOutputPath, satId + "_contacts.csv"))
-        df['startTimestamp'] = df['startUtcTime'].apply(getTimestampFromDate)
-        df['endTimestamp'] = df['endUtcTime'].apply(getTimestampFromDate)
-        df = df[df['contactType'] == 'ISV']
-        satsContactsDf[satId] = df
-
-    if satsStatesDf == {}:
+    for satId in stateTensor.satIds:
+        #Get contacts
+        satsContactsDf[satId] = propagationDataset.getContacts(satId, 'ISV')
+
+    if len(stateTensor.satIds) == 0:
         return
-    
-    #Get list of timestamps
-    [set(utcTimestamps)].sort()
 
     outputAnalysFolderPath = os.path.join(outputDataFolderPath, 'analysis')
     makeOutputFolder(outputAnalysFolderPath)
@@ -80,82 +65,79 @@ def write(doc: Document, outputDataFolderPath: str, outputPlotFolderPath: str, f
     rivadaSpaceNetworks = (48.144802679076044, 11.595048249556703)
     terranOrbital = (33.683465115437244, -117.77589876915086)
     images = []
-    for i, utcTimestamp in enumerate(utcTimestamps):
+    for i, utcTimestamp in enumerate(stateTensor.timestamps.tolist()):
         if i > 100:
             break
-        #Build map
-        worldmap = gpd.read_file(gpd.datasets.get_path("naturalearth_lowres"))
-        fig, ax = plt.subplots(figsize=(8, 8))
-        ax.set_xlabel("Longitude [deg]")
-        ax.set_ylabel("Latitude [deg]")
-        worldmap.plot(color="darkgrey", ax=ax)
-        ax.set(xlim=[-180, 180], ylim=[-90, 90])
-        t = getDateFromTimestamp(utcTimestamp)
-        #Plot ground
-        ax.scatter(terranOrbital[1], terranOrbital[0], s=30, c=['red'], alpha=0.9, marker="*")
-        ax.annotate("TO", (terranOrbital[1], terranOrbital[0]))
-        ax.scatter(rivadaSpaceNetworks[1], rivadaSpaceNetworks[0], s=30, c=['red'], alpha=0.9, marker="*")
-        ax.annotate("RSN", (rivadaSpaceNetworks[1], rivadaSpaceNetworks[0]))
-        geoTerran = getGeopointFromLatLong(terranOrbital[0], terranOrbital[1], t)
-        geoRsn = getGeopointFromLatLong(rivadaSpaceNetworks[0], rivadaSpaceNetworks[1], t)
-        #Plot satellites
-        for satId in satsStatesDf:
-            index = np.where(satsStatesDf[satId]["timestamp"] == utcTimestamp)[0].tolist()[0]
-            lat, lng = getSatelliteLatitudeLongitude(satsStatesDf[satId], index=index)
-            ax.scatter(lng, lat, s=10, c=['black'], alpha=0.7)
-            ax.annotate(satId, (lng, lat), fontsize=6)
-        #Get mesh to communicate between two points (TO -> RSN)
-        _, firstSatId = getCloserSatelliteDistance(satsStatesDf, geoTerran, utcTimestamp)
-        _, lastSatId = getCloserSatelliteDistance(satsStatesDf, geoRsn, utcTimestamp)
-        #Go through mesh from initial geo point up to target point
-        nextSatId = lastSatId
-        contactedSatIds = [lastSatId, ]
-        #[DEBUG]print("closest to TO", firstSatId)
-        while nextSatId != firstSatId:
-            #From the current point, amongh the ones in the mesh, get closer
-            _, closerSatId = getCloserSatelliteContactDistance(utcTimestamp, nextSatId, geoTerran, satsStatesDf, satsContactsDf, contactedSatIds)
-            if closerSatId == "":
-                break
-            contactedSatIds.append(closerSatId)
-            nextSatId = closerSatId
-        #Plot lines
-        satId = contactedSatIds[0]
-        index = np.where(satsStatesDf[satId]["timestamp"] == utcTimestamp)[0].tolist()[0]
-        satLat, satLng = getSatelliteLatitudeLongitude(satsStatesDf[satId], index=index)
-        for id in range(len(contactedSatIds)):
-            if id == 0:
-                ax.plot([rivadaSpaceNetworks[1], satLng], [rivadaSpaceNetworks[0], satLat], 'b-')
-                if len(contactedSatIds) == 2:
+        with span('network frame', 'render', timestamp=utcTimestamp):
+            #Build map
+            worldmap = getWorldMap()
+            fig, ax = plt.subplots(figsize=(8, 8))
+            ax.set_xlabel("Longitude [deg]")
+            ax.set_ylabel("Latitude [deg]")
+            worldmap.plot(color="darkgrey", ax=ax)
+            ax.set(xlim=[-180, 180], ylim=[-90, 90])
+            t = stateTensor.getDatetime(i)
+            #Plot ground
+            ax.scatter(terranOrbital[1], terranOrbital[0], s=30, c=['red'], alpha=0.9, marker="*")
+            ax.annotate("TO", (terranOrbital[1], terranOrbital[0]))
+            ax.scatter(rivadaSpaceNetworks[1], rivadaSpaceNetworks[0], s=30, c=['red'], alpha=0.9, marker="*")
+            ax.annotate("RSN", (rivadaSpaceNetworks[1], rivadaSpaceNetworks[0]))
+            geoTerran = getGeopointFromLatLong(terranOrbital[0], terranOrbital[1], t)
+            geoRsn = getGeopointFromLatLong(rivadaSpaceNetworks[0], rivadaSpaceNetworks[1], t)
+            #Plot satellites
+            lats, lngs = getSatellitesLatitudeLongitude(stateTensor, i)
+            ax.scatter(lngs, lats, s=10, c=['black'], alpha=0.7)
+            for satId, lat, lng in zip(stateTensor.satIds, lats, lngs):
+                ax.annotate(satId, (lng, lat), fontsize=6)
+            #Get mesh to communicate between two points (TO -> RSN)
+            _, firstSatId = getCloserSatelliteDistance(stateTensor, geoTerran, i)
+            _, lastSatId = getCloserSatelliteDistance(stateTensor, geoRsn, i)
+            #Go through mesh from initial geo point up to target point
+            nextSatId = lastSatId
+            contactedSatIds = [lastSatId, ]
+            #[DEBUG]print("closest to TO", firstSatId)
+            while nextSatId != firstSatId:
+                #From the current point, amongh the ones in the mesh, get closer
+                _, closerSatId = getCloserSatelliteContactDistance(utcTimestamp, nextSatId, geoTerran, stateTensor, satsContactsDf, contactedSatIds)
+                if closerSatId == "":
+                    break
+                contactedSatIds.append(closerSatId)
+                nextSatId = closerSatId
+            #Plot lines
+            satId = contactedSatIds[0]
+            satLat, satLng = getSatelliteLatitudeLongitude(stateTensor, satId, i)
+            for id in range(len(contactedSatIds)):
+                if id == 0:
+                    ax.plot([rivadaSpaceNetworks[1], satLng], [rivadaSpaceNetworks[0], satLat], 'b-')
+                    if len(contactedSatIds) == 2:
+                        satId = contactedSatIds[id+1]
+                        nextSatLat, nextSatLng = getSatelliteLatitudeLongitude(stateTensor, satId, i)
+                        ax.plot([nextSatLng, satLng], [nextSatLat, satLat], 'b-')
+                        satLng = nextSatLng
+                        satLat = nextSatLat
+                if id < len(contactedSatIds) - 1:
                     satId = contactedSatIds[id+1]
-                    index = np.where(satsStatesDf[satId]["timestamp"] == utcTimestamp)[0].tolist()[0]
-                    nextSatLat, nextSatLng = getSatelliteLatitudeLongitude(satsStatesDf[satId], index=index)
+                    nextSatLat, nextSatLng = getSatelliteLatitudeLongitude(stateTensor, satId, i)
                     ax.plot([nextSatLng, satLng], [nextSatLat, satLat], 'b-')
                     satLng = nextSatLng
                     satLat = nextSatLat
-            if id < len(contactedSatIds) - 1:
-                satId = contactedSatIds[id+1]
-                index = np.where(satsStatesDf[satId]["timestamp"] == utcTimestamp)[0].tolist()[0]
-                nextSatLat, nextSatLng = getSatelliteLatitudeLongitude(satsStatesDf[satId], index=index)
-                ax.plot([nextSatLng, satLng], [nextSatLat, satLat], 'b-')
-                satLng = nextSatLng
-                satLat = nextSatLat
-            else:
-                ax.plot([terranOrbital[1], satLng], [terranOrbital[0], satLat], 'b-')
-            #Save fig
-            ax.set_title(t)
-            ax.margins(x=0.9,y=0)
-            figPath = os.path.join(tmpPath, "analysis_constellation-network-mesh-{}.jpg".format(utcTimestamp))
-            images.append(figPath)
-            fig.savefig(figPath)
-        #Save first, image and position
-        if i == 0:
-            timezero = getDateFromTimestamp(utcTimestamp).replace("T", " at ").replace("Z", "")
-            figPath = os.path.join(outputPlotFolderPath, "analysis_constellation-network-mesh.jpg")
-            fig.savefig(figPath, bbox_inches='tight')                
-            doc.add_paragraph('The picture below shows the constellation network communication, at simulation time zero: {}, between Rivada Space Network offices in Munich and Terran Orbital facility, in Irvine, for mesh'.format(timezero))
-            p = doc.add_paragraph()
-            r = p.add_run()
-            r.add_picture(figPath)
+                else:
+                    ax.plot([terranOrbital[1], satLng], [terranOrbital[0], satLat], 'b-')
+                #Save fig
+                ax.set_title(getDateFromTimestamp(utcTimestamp))
+                ax.margins(x=0.9,y=0)
+                figPath = os.path.join(tmpPath, "analysis_constellation-network-mesh-{}.jpg".format(utcTimestamp))
+                images.append(figPath)
+                fig.savefig(figPath)
+            #Save first, image and position
+            if i == 0:
+                timezero = getDateFromTimestamp(utcTimestamp).replace("T", " at ").replace("Z", "")
+                figPath = os.path.join(outputPlotFolderPath, "analysis_constellation-network-mesh.jpg")
+                fig.savefig(figPath, bbox_inches='tight')                
+                doc.add_paragraph('The picture below shows the constellation network communication, at simulation time zero: {}, between Rivada Space Network offices in Munich and Terran Orbital facility, in Irvine, for mesh'.format(timezero))
+                p = doc.add_paragraph()
+                r = p.add_run()
+                r.add_picture(figPath)
     #Save gifs
     images.sort()
     frames = [Image.open(image) for image in images]
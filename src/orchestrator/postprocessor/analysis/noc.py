@@ -8,6 +8,7 @@ import numpy as np
 import pandas as pd
 
 from ....utils.timeconverter import getDatetimeFromDate
+from ....flightdynamics.statetensor import StateTensor
 
 """ E2E Performance Simulator Analysis: utilty methods """
 
@@ -129,93 +130,61 @@ def getGeopointFromLatLong(lat: float, lng: float, time) -> np.array:
 def getDistance(a, b) -> float:
     return np.linalg.norm(a-b)
 
-def getLastContactedMeshSatsDataframe(getMesh, totPlanes: int, totSats: int, satsStatesDf: dict, contactedSatIds: list) -> dict:
+def getLastContactedMeshSatIds(getMesh, totPlanes: int, totSats: int, stateTensor: StateTensor, contactedSatIds: list) -> list:
     #Get last contacted satellite
     satId = contactedSatIds[-1]
     #Get mesh satellites, not passing from the onese already contacted
     meshSatsIds = getMesh(satId, totPlanes, totSats)
     meshSatsIds = [satId for satId in meshSatsIds if satId not in contactedSatIds]
-    meshDf = {}
     for meshSatId in meshSatsIds:
-        if meshSatId not in satsStatesDf:
+        if meshSatId not in stateTensor.satIndex:
             raise Exception('ERROR: for satellite {}, mesh satellite {} was not propagated, not found in Propagation Data'.format(satId, meshSatId))
-        meshDf[meshSatId] = satsStatesDf[meshSatId]
-    return meshDf
+    return meshSatsIds
 
-def getSatellitePosition(df, index: int =0) -> np.array:
-    return np.array((df.iloc[index]['X'], df.iloc[index]['Y'], df.iloc[index]['Z']))
+def getSatellitesLatitudeLongitude(stateTensor: StateTensor, timeIndex: int = 0, satIds: list = None) -> (np.array, np.array):
+    """ Get latitude and longitude [deg] of all satellites, or of satellites ids, at time index """
+    pos: np.array = stateTensor.getPositions(timeIndex, satIds)
+    lla = pm.eci2geodetic(pos[:, 0], pos[:, 1], pos[:, 2], getDatetimeFromDate(stateTensor.utcTimes[timeIndex]))
+    return np.atleast_1d(lla[0]), np.atleast_1d(lla[1])
 
-def getSatellitePositionVelocity(df, index: int) -> np.array:
-    return np.array((df.iloc[index]['X'], df.iloc[index]['Y'], df.iloc[index]['Z'], df.iloc[index]['Vx'], df.iloc[index]['Vy'], df.iloc[index]['Vz']))
+def getSatelliteLatitudeLongitude(stateTensor: StateTensor, satId: str, timeIndex: int = 0) -> (float, float):
+    lats, lngs = getSatellitesLatitudeLongitude(stateTensor, timeIndex, [satId])
+    return lats[0], lngs[0]
 
-def getSatelliteLatitudeLongitude(df, index: int = 0) -> (float, float):
-    pos: np.array = getSatellitePosition(df, index)
-    lla = pm.eci2geodetic(pos[0], pos[1], pos[2], getDatetimeFromDate(df.iloc[index]['utcTime']))
-    return lla[0], lla[1]
-
-def getCloserSatelliteDistanceMesh(getMesh, totPlanes: int, totSats: int, satsStatesDf: dict, geoPoint: np.array, contactedSatIds: list, firstSatId: str) -> str:
+def getCloserSatelliteDistanceMesh(getMesh, totPlanes: int, totSats: int, stateTensor: StateTensor, geoPoint: np.array, contactedSatIds: list, firstSatId: str, timeIndex: int = 0) -> str:
     """ Iterate 1 step into mesh, get for each of the connected satellites, the next closer and choose the one with less distance as root point """
-    subsatsStatesDf = getLastContactedMeshSatsDataframe(getMesh, totPlanes, totSats, satsStatesDf, contactedSatIds)
-    if firstSatId in subsatsStatesDf:
+    meshSatIds = getLastContactedMeshSatIds(getMesh, totPlanes, totSats, stateTensor, contactedSatIds)
+    if firstSatId in meshSatIds:
         return firstSatId
-    elif subsatsStatesDf == {}:
-        return Exception("ERROR: impossible to find satellite in mesh, for satellite {}, as already contacted {}".format(contactedSatIds))
+    elif meshSatIds == []:
+        raise Exception("ERROR: impossible to find satellite in mesh, for satellite {}, as already contacted {}".format(contactedSatIds[-1], contactedSatIds))
     #Get distance over mesh
     distances = {}
-    for satId in subsatsStatesDf:
-        pos = getSatellitePosition(satsStatesDf[satId])
-        d = getDistance(pos, geoPoint)
-        nextSubsatsStatesDf = getLastContactedMeshSatsDataframe(getMesh, totPlanes, totSats, satsStatesDf, contactedSatIds + [satId,])
+    for satId in meshSatIds:
+        d = getDistance(stateTensor.getPosition(satId, timeIndex), geoPoint)
+        nextMeshSatIds = getLastContactedMeshSatIds(getMesh, totPlanes, totSats, stateTensor, contactedSatIds + [satId,])
         #Get closer in next step and add to distance
-        dd, _ = getCloserSatelliteDistance(nextSubsatsStatesDf, geoPoint)
+        dd, _ = getCloserSatelliteDistance(stateTensor, geoPoint, timeIndex, nextMeshSatIds)
         distances[dd+d] = satId
     #Get closer satellite id by distance saved in the list
     return distances[min(distances.keys())]
 
-def getCloserSatelliteDistance(satsStatesDf: dict, geoPoint: np.array) -> (float, str):
-    """ Iterate over entire list of satellites and get closer """
-    from sys import maxsize
-    minD = maxsize
-    minSatId = ""
-    for satId in satsStatesDf.keys():
-        pos = getSatellitePosition(satsStatesDf[satId])
-        d = getDistance(pos, geoPoint)
-        if d < minD:
-            minSatId = satId
-            minD = d
-    return minD, minSatId
-
-def getCloserSatelliteDistance(satsStatesDf: dict, geoPoint: np.array, timestamp: int) -> (float, str):
-    """ Iterate over entire list of satellites and get closer """
+def getCloserSatelliteDistance(stateTensor: StateTensor, geoPoint: np.array, timeIndex: int = 0, satIds: list = None) -> (float, str):
+    """ Get closer satellite, among all or among satellites ids, at time index """
     from sys import maxsize
-    minD = maxsize
-    minSatId = ""
-    for satId in satsStatesDf.keys():
-        index = np.where(satsStatesDf[satId]["timestamp"] == timestamp)[0].tolist()[0]
-        pos = getSatellitePosition(satsStatesDf[satId], index)
-        d = getDistance(pos, geoPoint)
-        if d < minD:
-            minSatId = satId
-            minD = d
-    return minD, minSatId
-
-def getCloserSatelliteContactDistance(timestamp: int, satId: str, geoPoint: np.array, satsStatesDf: pd.DataFrame, satsContactsDf: pd.DataFrame, contactedSatIds: list) -> (float, str):
+    satIds = stateTensor.satIds if satIds is None else satIds
+    if len(satIds) == 0:
+        return maxsize, ""
+    distances = np.linalg.norm(stateTensor.getPositions(timeIndex, satIds) - geoPoint, axis=1)
+    k = int(np.argmin(distances))
+    return distances[k], satIds[k]
+
+def getCloserSatelliteContactDistance(timestamp: int, satId: str, geoPoint: np.array, stateTensor: StateTensor, satsContactsDf: pd.DataFrame, contactedSatIds: list) -> (float, str):
     """ Get from a time, the matching contacts and select the closer satellite """
-    from sys import maxsize
-    minD = maxsize
-    minSatId = ""
     df = satsContactsDf[satId]
     contactsDf = df[(df['startTimestamp'] <= timestamp) & (timestamp <= df['endTimestamp'])]
-    soiIds = set(contactsDf['argumentOfInterestId'].to_list())
+    soiIds = sorted(set(contactsDf['argumentOfInterestId'].to_list()) - set(contactedSatIds))
     #[DEBUG]print(satId, 'connects', soiIds, 'seen', contactedSatIds)
-    for soiId in soiIds:
-        if soiId not in contactedSatIds:
-            index = np.where(satsStatesDf[soiId]["timestamp"] == timestamp)[0].tolist()[0]
-            pos = getSatellitePosition(satsStatesDf[soiId], index)
-            d = getDistance(pos, geoPoint)
-            if d < minD:
-                minSatId = soiId
-                minD = d
-    return minD, minSatId
+    return getCloserSatelliteDistance(stateTensor, geoPoint, stateTensor.getTimeIndex(timestamp), soiIds)
 
 # -*- coding: utf-8 -*-
\ No newline at end of file
@@ -4,10 +4,10 @@
 # Author: alberto-ferrero
 
 import os
-import geopandas as gpd
 import matplotlib.pyplot as plt
 import time
 
+from ..analysis.basemap import getWorldMap
 from ....orchestrator.preprocessor.preprocessor import readUserTerminals
 
 #Import docx
@@ -28,20 +28,22 @@ def write(doc: Document, outputPlotFolderPath: str, simulationRequest: dict):
         gss.append({
             "id": gs['id'],
             "latitude": gs['location']['latitude'],
-            "longitude": gs['location']['longitude']
+            "longitude": gs['location']['longitude'],
+            "weight": gs.get('weight', 1)
         })
     
     if len(gss) > 0:
 
         #Build image
-        worldmap = gpd.read_file(gpd.datasets.get_path("naturalearth_lowres"))
+        worldmap = getWorldMap()
         fig, ax = plt.subplots(figsize=(8, 8))
         worldmap.plot(color="lightgrey", ax=ax)
         ax.set(xlim=[-180, 180], ylim=[-90, 90])
         for gs in gss:
           lat = gs['latitude']
           lng = gs['longitude']
-          ax.scatter(lng, lat, s=40, c=['red'], alpha=0.9)
+          #User terminals cells sized by their members
+          ax.scatter(lng, lat, s=40 * gs['weight'], c=['red'], alpha=0.9)
           ax.annotate(gs['id'], (lng, lat))
         ax.set_xlabel("Longitude [deg]")
         ax.set_ylabel("Latitude [deg]")
@@ -52,7 +54,7 @@ def write(doc: Document, outputPlotFolderPath: str, simulationRequest: dict):
 
         #Write       
         doc.add_heading("User Terminals Locations", 1)
-        doc.add_paragraph('The picture below shows user terminals locations, as defined in configuration')
+        doc.add_paragraph('The picture below shows the locations of {} user terminals, as defined in configuration, in {} points'.format(sum([gs['weight'] for gs in gss]), len(gss)))
         p = doc.add_paragraph()
         r = p.add_run()
         r.add_picture(figPath)
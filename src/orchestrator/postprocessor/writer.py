@@ -9,22 +9,13 @@ from datetime import datetime
 
 from ...utils.filemanager import getLogoPath, makeOutputFolder
 from ..preprocessor.preprocessor import readSatellites
-
-#Import docx
-from docx import Document
-from docx.shared import Inches, Pt, Mm
-
-#Import analyis
-from ..postprocessor.analysis import constellationgeom as constgeom
-from ..postprocessor.analysis import gslocation as gsloc
-from ..postprocessor.analysis import utlocation as utloc
-from ..postprocessor.analysis import contacts as contacts
-from ..postprocessor.analysis import links as links
-from ..postprocessor.analysis import latency as latency
-from ..postprocessor.analysis import network as network
+from ...utils.tracer import span
+from ...utils.manifest import getCompletedItems, setItemsCompleted
 
 """ E2E Performance Simulator post processor report writed """
 
+PARTIAL_REPORT_FILE = 'report.partial.docx'
+
 def writeReport(simulationRequest: dict,
                 outputDataFolderPath: str,
                 outputReportFolderPath: str,
@@ -34,65 +25,56 @@ def writeReport(simulationRequest: dict,
                 spaceLinkDataOutputPath: str,
                 networkDataOutputPath: str,
                 outputPlotFolderPath: str):
-    #Write report based on config request properties
-    doc = Document()
-    style = doc.styles['Normal']
-    font = style.font
-    font.name = 'Calibri'
-    section = doc.sections[0]
-    section.left_margin = Mm(15)
-    section.right_margin = Mm(15)
-
-    #Add logo
-    p = doc.add_paragraph()
-    r = p.add_run()
-    r.add_picture(os.path.join(getLogoPath(), "Logo.png"), width=Inches(3), )
-
-    #First header page
-    for i in range(3):
-        doc.add_paragraph()
-    title = 'E2E Performance Simulator Report'
-    currentTime = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
-    p = doc.add_heading(title, 0)
-    p.bold = True
-    for i in range(12):
-        doc.add_paragraph()
-    
-    p = doc.add_paragraph()
-    r = p.add_run("RSN-SYS")
-    r.bold = True
-    r.font.size = Pt(20)
-    
-    p = doc.add_paragraph()
-    r = p.add_run(currentTime)
-    r.font.size = Pt(11)
-    
-    doc.add_page_break()
+    #Import docx and analysis only when writing report, not to slow down start up
+    from docx import Document
+
+    #Write report based on config request properties, resuming sections completed in a previous run
+    partialReportPath = os.path.join(outputDataFolderPath, PARTIAL_REPORT_FILE)
+    completedSections = getCompletedItems(outputDataFolderPath, 'analysis')
+    if completedSections and os.path.isfile(partialReportPath):
+        print('   - Resuming report, {} analysis sections already written'.format(len(completedSections)))
+        doc = Document(partialReportPath)
+    else:
+        completedSections = []
+        doc = newReportDocument()
 
     #Add Section for the E2E Perfomances
     analysis: dict = simulationRequest['analysis']
     for analyisTag in analysis:
-
-        if analyisTag == 'constellation-geometry':
-            constgeom.write(doc, simulationRequest, outputPlotFolderPath, flightDynamicsDataOutputPath)
-
-        if analyisTag == 'groundstations-location':
-            gsloc.write(doc, outputPlotFolderPath, simulationRequest)
-
-        if analyisTag == 'userterminals-location':
-            utloc.write(doc, outputPlotFolderPath, simulationRequest)
+        if analyisTag in completedSections:
+            continue
+        with span(analyisTag, 'analysis'):
+            if analyisTag == 'constellation-geometry':
+                from ..postprocessor.analysis import constellationgeom as constgeom
+                constgeom.write(doc, simulationRequest, outputPlotFolderPath, flightDynamicsDataOutputPath)
+
+            if analyisTag == 'groundstations-location':
+                from ..postprocessor.analysis import gslocation as gsloc
+                gsloc.write(doc, outputPlotFolderPath, simulationRequest)
+
+            if analyisTag == 'userterminals-location':
+                from ..postprocessor.analysis import utlocation as utloc
+                utloc.write(doc, outputPlotFolderPath, simulationRequest)
   
-        if analyisTag == 'contacts':
-            contacts.write(doc, simulationRequest, outputDataFolderPath, outputPlotFolderPath, flightDynamicsDataOutputPath)
+            if analyisTag == 'contacts':
+                from ..postprocessor.analysis import contacts
+                contacts.write(doc, simulationRequest, outputDataFolderPath, outputPlotFolderPath, flightDynamicsDataOutputPath)
     
-        if analyisTag == 'links':
-            links.write(doc, outputDataFolderPath, outputPlotFolderPath, airLinkDataOutputPath)
+            if analyisTag == 'links':
+                from ..postprocessor.analysis import links
+                links.write(doc, simulationRequest, outputDataFolderPath, outputPlotFolderPath, airLinkDataOutputPath)
   
-        if analyisTag == 'latency':
-            latency.write(doc, outputDataFolderPath, outputPlotFolderPath, flightDynamicsDataOutputPath)
+            if analyisTag == 'latency':
+                from ..postprocessor.analysis import latency
+                latency.write(doc, outputDataFolderPath, outputPlotFolderPath, flightDynamicsDataOutputPath)
+
+            if analyisTag == 'network':
+                from ..postprocessor.analysis import network
+                network.write(doc, outputDataFolderPath, outputPlotFolderPath, flightDynamicsDataOutputPath)
 
-        if analyisTag == 'network':
-            network.write(doc, outputDataFolderPath, outputPlotFolderPath, flightDynamicsDataOutputPath)
+        #Checkpoint report with completed section
+        doc.save(partialReportPath)
+        setItemsCompleted(outputDataFolderPath, 'analysis', [analyisTag])
   
     #Add Sections for each module
     modules: dict = simulationRequest['modules']
@@ -143,6 +125,49 @@ def writeReport(simulationRequest: dict,
 
     #Save doc
     makeOutputFolder(outputReportFolderPath)
-    doc.save(os.path.join(outputReportFolderPath, "E2E_Performance_Simulator_Report.docx"))
+    with span('save report', 'io'):
+        doc.save(os.path.join(outputReportFolderPath, "E2E_Performance_Simulator_Report.docx"))
+    if os.path.isfile(partialReportPath):
+        os.remove(partialReportPath)
+
+def newReportDocument():
+    """ Create report document, with logo and first header page """
+    from docx import Document
+    from docx.shared import Inches, Pt, Mm
+    doc = Document()
+    style = doc.styles['Normal']
+    font = style.font
+    font.name = 'Calibri'
+    section = doc.sections[0]
+    section.left_margin = Mm(15)
+    section.right_margin = Mm(15)
+
+    #Add logo
+    p = doc.add_paragraph()
+    r = p.add_run()
+    r.add_picture(os.path.join(getLogoPath(), "Logo.png"), width=Inches(3), )
+
+    #First header page
+    for i in range(3):
+        doc.add_paragraph()
+    title = 'E2E Performance Simulator Report'
+    currentTime = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+    p = doc.add_heading(title, 0)
+    p.bold = True
+    for i in range(12):
+        doc.add_paragraph()
+    
+    p = doc.add_paragraph()
+    r = p.add_run("RSN-SYS")
+    r.bold = True
+    r.font.size = Pt(20)
+    
+    p = doc.add_paragraph()
+    r = p.add_run(currentTime)
+    r.font.size = Pt(11)
+    
+    doc.add_page_break()
+
+    return doc
     
 # -*- coding: utf-8 -*-
\ No newline at end of file
@@ -3,19 +3,38 @@
 # Copyright (C)
 # Author: alberto-ferrero
 
+import numpy as np
 import pandas as pd
 
-from ...utils.filemanager import getBasePath, readInputYmlFile
-from ...airlink.mapper import getClassFromThroughput
+from ...utils.filemanager import getBasePath, getUserCachePath, readInputYmlFile
+from ...utils.schemas import validateWithSchema
+from ...airlink.mapper import getClassesFromThroughputs
+from .utcells import getUserTerminalsCells
 
-from jsonschema import validate
-import json
+import copy
 import os
+import threading
+from collections import OrderedDict
 
 """ E2E Performance Simulator pre processor """
 
 NOT_DEFINED = "NOT_DEFINED"
 
+#Parsed and validated assets files, by file path, with their modification time, shared by all the calls in the process
+catalogsLock = threading.Lock()
+catalogs = {}
+
+#User terminals files columns, binary copies folder in user cache, and default seed of samples
+USER_TERMINALS_COLUMNS = {'utIndex': 'utIndex', 'utLat (deg)': 'latitude', 'utLon (deg)': 'longitude', 'Max DL (Mbps)': 'maxDownlink'}
+USER_TERMINALS_CACHE_FOLDER = 'userterminals'
+DEFAULT_USER_TERMINALS_SEED = 0
+
+#Sampled user terminals, by file version, usage, seed and cell size, for all the consumers of a run to read the same ones,
+#the most recently used ones only, as a service reads many
+MAX_USER_TERMINALS_SAMPLES = 16
+userTerminalsSamplesLock = threading.Lock()
+userTerminalsSamples = OrderedDict()
+
 def preProcessSimulationRequest(inputFilePath: str) -> dict:
     """ Read input file and extrac Simulation Request as dictionary """
     #Read file
@@ -31,11 +50,8 @@ def preProcessSimulationRequest(inputFilePath: str) -> dict:
 
 def validateSimulationRequest(simulationRequest: dict) -> dict:
     try:
-        #Set validation schema
-        simulationRequestSchema = os.path.join('api', 'simulationrequest-schema.json')
         #Validate with schema
-        with open(os.path.join(getBasePath(), simulationRequestSchema), "r") as f: 
-            validate(instance=simulationRequest, schema=json.load(f))
+        validateWithSchema(simulationRequest, 'simulationrequest-schema.json')
         return simulationRequest
     
     except Exception as e:
@@ -44,19 +60,37 @@ def validateSimulationRequest(simulationRequest: dict) -> dict:
 
 ################################################################################################
 
+def getCatalog(filePath: str, loader):
+    """ Get assets file content, loading it only the first time, or again if file changed """
+    try:
+        mtime = os.path.getmtime(filePath)
+    except OSError:
+        #Missing file, loader to raise
+        mtime = None
+    with catalogsLock:
+        if filePath not in catalogs or catalogs[filePath][0] != mtime:
+            catalogs[filePath] = (mtime, loader(filePath))
+        return catalogs[filePath][1]
+
+def preloadCatalogs(simulationRequest: dict):
+    """ Load assets files referenced by the Simulation Request, to be shared with forked processes """
+    readSatellites(simulationRequest)
+    readGroundStations(simulationRequest)
+    readUserTerminals(simulationRequest)
+
 def readSatellites(simulationRequest: dict) -> list:
     """ Read satellites file and return validated list """
     fileName = simulationRequest['satellites']['file']
     satellitesFilePath = os.path.join(getBasePath(), 'data', 'satellites', fileName)
+    return copy.deepcopy(getCatalog(satellitesFilePath, loadSatellites))
+
+def loadSatellites(satellitesFilePath: str) -> list:
     satellites = readInputYmlFile(satellitesFilePath)
     #Validate format
     try:
-        #Set validation schema
-        propagationDataSchema = os.path.join('api', 'satellites-schema.json')
         #Validate with schema
-        with open(os.path.join(getBasePath(), propagationDataSchema), "r") as f:
-            validate(instance=satellites, schema=json.load(f))
-            return satellites['satellites']
+        validateWithSchema(satellites, 'satellites-schema.json')
+        return satellites['satellites']
     except Exception as e:
         #Raise error
         raise Exception('ERROR: validation of Satellties list from file {} failed due to: {}'.format(satellitesFilePath, str(e)))
@@ -68,44 +102,38 @@ def readGroundStations(simulationRequest: dict) -> list:
     if fileName == NOT_DEFINED:
         return []
     groundstationsFilePath = os.path.join(getBasePath(), 'data', 'groundstations', fileName)
+    return copy.deepcopy(getCatalog(groundstationsFilePath, loadGroundStations))
+
+def loadGroundStations(groundstationsFilePath: str) -> list:
     groundstations = readInputYmlFile(groundstationsFilePath)
     #Validate format
     try:
-        #Set validation schema
-        propagationDataSchema = os.path.join('api', 'groundstations-schema.json')
         #Validate with schema
-        with open(os.path.join(getBasePath(), propagationDataSchema), "r") as f:
-            validate(instance=groundstations, schema=json.load(f))
-            return groundstations['groundstations']
+        validateWithSchema(groundstations, 'groundstations-schema.json')
+        return groundstations['groundstations']
     except Exception as e:
         #Raise error
         raise Exception('ERROR: validation of Ground Stations list from file {} failed due to: {}'.format(groundstationsFilePath, str(e)))
 
 def readUserTerminals(simulationRequest: dict, all: bool = False) -> list:
-    """ Read user terminals file and return validated list """
+    """ Read user terminals file and return validated list, sampled with a seed, the same for all the calls of a run """
     uts: dict = simulationRequest.get('userterminals', [])
     if uts == []:
         return []
     userTerminals = []
-    import random
     for ut in uts:
         fileName = ut['file']
-        usage = ut['usage']
         userterminalsFilePath = os.path.join(getBasePath(), 'data', 'userterminals', fileName)
-        df = pd.read_csv(userterminalsFilePath, sep='\t')
-        id = "ut-" + fileName.split("_")[0]
-        n = len(df)
-        indexes = random.sample(range(n), int(usage * n)) if not all else range(n)
-        for i in indexes:
-            userTerminals.append({'id' : id + str(int(df.iloc[i]['utIndex'])),
-                                'location': {
-                                    'latitude': df.iloc[i]['utLat (deg)'],
-                                    'longitude': df.iloc[i]['utLon (deg)'],
-                                    'altitude': 0
-                                },
-                                'class': getClassFromThroughput(df.iloc[i]['Max DL (Mbps)'])
-                             }
-                            )
+        catalog = getCatalog(userterminalsFilePath, loadUserTerminals)
+        key = (userterminalsFilePath, catalog['mtime'], 1.0 if all else float(ut['usage']), ut.get('seed', DEFAULT_USER_TERMINALS_SEED), ut.get('cellSize'))
+        with userTerminalsSamplesLock:
+            if key not in userTerminalsSamples:
+                userTerminalsSamples[key] = sampleUserTerminals(catalog, "ut-" + fileName.split("_")[0], key[2], key[3], key[4])
+            userTerminalsSamples.move_to_end(key)
+            fileUserTerminals = userTerminalsSamples[key]
+            while len(userTerminalsSamples) > MAX_USER_TERMINALS_SAMPLES:
+                userTerminalsSamples.popitem(last=False)
+        userTerminals.extend(copy.deepcopy(fileUserTerminals))
     # TODO validation
     # #Validate format
     # try:
@@ -120,5 +148,48 @@ def readUserTerminals(simulationRequest: dict, all: bool = False) -> list:
     #     raise Exception('ERROR: validation of User Terminals list from file {} failed due to: {}'.format(userterminalsFilePath, str(e)))
     return userTerminals
 
+def sampleUserTerminals(catalog: dict, id: str, usage: float, seed: int, cellSize: float = None) -> list:
+    """ Sample usage fraction of user terminals catalog, with a seeded permutation, so that smaller samples are part of larger ones,
+        aggregated in cells if cell size [km] given
+    """
+    n = len(catalog['utIndex'])
+    indexes = np.arange(n) if usage >= 1 else np.sort(np.random.default_rng(seed).permutation(n)[:int(usage * n)])
+    ids = [id + str(utIndex) for utIndex in catalog['utIndex'][indexes].tolist()]
+    classes = getClassesFromThroughputs(catalog['maxDownlink'][indexes])
+    userTerminals = [{'id': utId,
+                      'location': {
+                          'latitude': latitude,
+                          'longitude': longitude,
+                          'altitude': 0
+                      },
+                      'class': utClass
+                     } for utId, latitude, longitude, utClass in zip(ids, catalog['latitude'][indexes].tolist(), catalog['longitude'][indexes].tolist(), classes)]
+    #Aggregate user terminals in cells, if cell size [km] given
+    if cellSize:
+        userTerminals = getUserTerminalsCells(userTerminals, cellSize, id)
+    return userTerminals
+
+def loadUserTerminals(userterminalsFilePath: str) -> dict:
+    """ Load user terminals file as columns arrays, from its binary copy in cache if made from the same file version """
+    mtime = os.path.getmtime(userterminalsFilePath)
+    cacheFilePath = os.path.join(getUserCachePath(), USER_TERMINALS_CACHE_FOLDER, os.path.basename(userterminalsFilePath) + '.npz')
+    try:
+        with np.load(cacheFilePath) as cached:
+            if float(cached['mtime']) == mtime:
+                return {column: cached[column] for column in USER_TERMINALS_COLUMNS.values()} | {'mtime': mtime}
+    except (OSError, KeyError, ValueError):
+        pass
+    df = pd.read_csv(userterminalsFilePath, sep='\t', usecols=list(USER_TERMINALS_COLUMNS.keys()))
+    catalog = {column: df[fileColumn].to_numpy(dtype=np.int64 if column == 'utIndex' else float) for fileColumn, column in USER_TERMINALS_COLUMNS.items()}
+    #Binary copy, written aside and renamed, not to be read while written by another process
+    try:
+        os.makedirs(os.path.dirname(cacheFilePath), exist_ok=True)
+        with open(cacheFilePath + '.tmp', 'wb') as f:
+            np.savez(f, mtime=mtime, **catalog)
+        os.replace(cacheFilePath + '.tmp', cacheFilePath)
+    except OSError:
+        pass
+    return catalog | {'mtime': mtime}
+
 
 # -*- coding: utf-8 -*-
\ No newline at end of file
@@ -0,0 +1,77 @@
+#! /usr/bin/env python3
+
+# Copyright (C)
+# Author: alberto-ferrero
+
+""""
+User terminals cells, aggregating user terminals close to each other and of the same class in weighted cells.
+
+Cells are on an equal area grid: latitude bands as high as the cell size, each split in longitude in as many
+cells as fit the band length at its middle latitude. User terminals of the same class in the same cell are a
+single user terminal, at the location of the member closest to the members mean position, with the number of
+members as weight and the members ids, so that one point of interest and one link are calculated for the cell,
+and statistics over user terminals weight each cell by its members.
+"""
+
+import numpy as np
+import pandas as pd
+
+from ...airlink.mapper import Class
+
+#Earth mean radius [km]
+EARTH_RADIUS = 6371.0
+
+def getUserTerminalsCells(userTerminals: list, cellSize: float, idPrefix: str) -> list:
+    """ Aggregate user terminals in cells of size [km], by class, as user terminals with weight and members ids """
+    if len(userTerminals) == 0:
+        return []
+    df = pd.DataFrame({'id': [ut['id'] for ut in userTerminals],
+                       'latitude': [float(ut['location']['latitude']) for ut in userTerminals],
+                       'longitude': [float(ut['location']['longitude']) for ut in userTerminals],
+                       'class': [Class(ut['class']).value for ut in userTerminals],
+                       'weight': [ut.get('weight', 1) for ut in userTerminals]})
+    df['band'], df['cell'] = getCellIndexes(df['latitude'].to_numpy(), df['longitude'].to_numpy(), cellSize)
+    #Unit vectors, for mean positions across the antimeridian
+    latitudes, longitudes = np.radians(df['latitude'].to_numpy()), np.radians(df['longitude'].to_numpy())
+    positions = np.stack([np.cos(latitudes) * np.cos(longitudes), np.cos(latitudes) * np.sin(longitudes), np.sin(latitudes)], axis=-1)
+    #Cells of each class, with members weighted mean position, and member closest to it
+    groups = df.groupby(['class', 'band', 'cell'], sort=True).ngroup().to_numpy()
+    nGroups = int(groups.max()) + 1
+    weights = df['weight'].to_numpy(dtype=float)
+    meanPositions = np.zeros((nGroups, 3))
+    np.add.at(meanPositions, groups, positions * weights[:, None])
+    scores = np.einsum('ij,ij->i', positions, meanPositions[groups])
+    order = np.lexsort((-scores, groups))
+    members = np.split(order, np.flatnonzero(np.diff(groups[order])) + 1)
+    ids, classes, bands, cellIndexes = df['id'].to_numpy(), df['class'].to_numpy(), df['band'].to_numpy(), df['cell'].to_numpy()
+    cells = []
+    for k in members:
+        r = k[0]
+        cells.append({'id': '{}-{}-{}-{}'.format(idPrefix, classes[r], bands[r], cellIndexes[r]),
+                      'location': {
+                          'latitude': float(df['latitude'].iat[r]),
+                          'longitude': float(df['longitude'].iat[r]),
+                          'altitude': 0
+                      },
+                      'class': Class(classes[r]),
+                      'weight': int(weights[k].sum()),
+                      'members': ids[np.sort(k)].tolist()
+                     })
+    return cells
+
+def getUserTerminalsWeights(userTerminals: list) -> dict:
+    """ Get weight of user terminals by id, number of members for cells, 1 otherwise """
+    return {ut['id']: ut.get('weight', 1) for ut in userTerminals}
+
+def getCellIndexes(latitudes: np.ndarray, longitudes: np.ndarray, cellSize: float) -> tuple:
+    """ Get latitude band and longitude cell indexes of locations [deg], on equal area grid of cells of size [km] """
+    bandHeight = np.degrees(cellSize / EARTH_RADIUS)
+    nBands = max(int(np.ceil(180.0 / bandHeight)), 1)
+    bands = np.clip(np.floor((latitudes + 90.0) / bandHeight).astype(int), 0, nBands - 1)
+    #Cells in each band, fewer toward the poles
+    bandLatitudes = np.radians(np.minimum(-90.0 + (bands + 0.5) * bandHeight, 90.0))
+    nCells = np.maximum(np.round(360.0 * np.cos(bandLatitudes) / bandHeight).astype(int), 1)
+    cells = np.floor(np.mod(longitudes + 180.0, 360.0) / 360.0 * nCells).astype(int) % nCells
+    return bands, cells
+
+# -*- coding: utf-8 -*-
@@ -0,0 +1,126 @@
+#! /usr/bin/env python3
+
+# Copyright (C)
+# Author: alberto-ferrero
+
+""" E2E Performance Simulator modules scheduler
+
+Modules requested by the Simulation Request are run as a Directed Acyclic Graph:
+each module declares the modules it takes inputs from, and all modules with their
+inputs available are run at the same time in a thread pool.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from ..utils.cache import isModuleCached, getCachedModuleData
+from ..utils.tracer import tracedCall, getCurrentSpanId
+from ..utils.manifest import isStageCompleted, getStageOutputPath, setStageCompleted
+
+DEFAULT_MAX_WORKERS = 4
+
+def runModules(simulationRequest: dict, outputDataFolderPath: str, moduleHandlers: dict, maxWorkers: int = DEFAULT_MAX_WORKERS) -> dict:
+    """ Run requested modules concurrently, respecting declared inputs, and return output path of each module
+
+        moduleHandlers maps each module tag to a dict with:
+        - 'name': text used in logs
+        - 'handler': function called as handler(simulationRequest, outputDataFolderPath, *inputsOutputPaths)
+        - 'inputs': list of module tags whose output path is passed to the handler, in the same order
+        - 'outputPath': function returning the module output folder, from the data output folder
+    """
+    requestedModules = [tag for tag in moduleHandlers if tag in simulationRequest['modules']]
+    for tag in moduleHandlers:
+        if tag not in requestedModules:
+            print(' - {} Data not generated'.format(moduleHandlers[tag]['name']))
+
+    #Get dependencies among requested modules only, not requested inputs are passed as None
+    dependencies = {tag: [inputTag for inputTag in moduleHandlers[tag]['inputs'] if inputTag in requestedModules] for tag in requestedModules}
+    checkModulesDependencies(dependencies)
+
+    outputPaths = {tag: None for tag in moduleHandlers}
+    timings = {}
+    pending = list(requestedModules)
+    running = {}
+    init = time.time()
+    with ThreadPoolExecutor(max_workers=max(1, maxWorkers)) as executor:
+        while pending or running:
+            #Launch all modules with inputs available
+            for tag in [tag for tag in pending if all(inputTag in timings for inputTag in dependencies[tag])]:
+                pending.remove(tag)
+                if isStageCompleted(outputDataFolderPath, tag):
+                    #Completed in the run being resumed
+                    outputPaths[tag] = getStageOutputPath(outputDataFolderPath, tag)
+                    timings[tag] = {'start': 0, 'end': 0, 'duration': 0}
+                    print(' - {} Data already generated, in {}'.format(moduleHandlers[tag]['name'], outputPaths[tag]))
+                    continue
+                moduleInfo = simulationRequest['modules'][tag]
+                print(' - Getting {} Data {}'.format(moduleHandlers[tag]['name'], textDataFrom(moduleInfo['data'])))
+                inputsOutputPaths = [outputPaths[inputTag] for inputTag in moduleHandlers[tag]['inputs']]
+                handlerArgs = (simulationRequest, outputDataFolderPath, *inputsOutputPaths)
+                if isModuleCached(simulationRequest, tag):
+                    #Reuse output of previous runs with same inputs
+                    moduleOutputPath = moduleHandlers[tag]['outputPath'](outputDataFolderPath)
+                    handlerArgs = (simulationRequest, tag, moduleOutputPath, moduleHandlers[tag]['handler'], *handlerArgs)
+                    handler = getCachedModuleData
+                else:
+                    handler = moduleHandlers[tag]['handler']
+                future = executor.submit(tracedCall, tag, 'module', getCurrentSpanId(), handler, *handlerArgs)
+                running[future] = (tag, time.time())
+            if not running:
+                continue
+            #Wait for the first module to complete
+            done, _ = wait(running.keys(), return_when=FIRST_COMPLETED)
+            for future in done:
+                tag, start = running.pop(future)
+                try:
+                    outputPaths[tag] = future.result()
+                except Exception:
+                    #Do not launch other modules, and wait for running ones before raising
+                    pending = []
+                    raise
+                end = time.time()
+                timings[tag] = {'start': start - init, 'end': end - init, 'duration': end - start}
+                setStageCompleted(outputDataFolderPath, tag, outputPaths[tag])
+                print(' - {} Data generated in {:.4f} seconds'.format(moduleHandlers[tag]['name'], end - start))
+
+    #Report critical path
+    criticalPath = getCriticalPath(dependencies, timings)
+    if criticalPath:
+        print(' - Critical path: {} ({:.4f} seconds)'.format(
+            ' -> '.join(['{} ({:.4f} s)'.format(moduleHandlers[tag]['name'], timings[tag]['duration']) for tag in criticalPath]),
+            sum([timings[tag]['duration'] for tag in criticalPath])))
+    return outputPaths
+
+def checkModulesDependencies(dependencies: dict):
+    """ Check that modules dependencies have no cycles """
+    visited = set()
+    def visit(tag: str, stack: list):
+        if tag in stack:
+            raise Exception('ERROR: modules dependencies have a cycle: {}'.format(' -> '.join(stack + [tag])))
+        if tag in visited:
+            return
+        for inputTag in dependencies[tag]:
+            visit(inputTag, stack + [tag])
+        visited.add(tag)
+    for tag in dependencies:
+        visit(tag, [])
+
+def getCriticalPath(dependencies: dict, timings: dict) -> list:
+    """ Get chain of dependent modules with the longest cumulated duration """
+    pathDurations = {}
+    def getPath(tag: str) -> tuple:
+        if tag not in pathDurations:
+            inputPaths = [getPath(inputTag) for inputTag in dependencies[tag]]
+            duration, path = max(inputPaths, key=lambda p: p[0]) if inputPaths else (0, [])
+            pathDurations[tag] = (duration + timings[tag]['duration'], path + [tag])
+        return pathDurations[tag]
+    paths = [getPath(tag) for tag in dependencies if tag in timings]
+    return max(paths, key=lambda p: p[0])[1] if paths else []
+
+def textDataFrom(tag: str) -> str:
+    if tag == 'run':
+        return "running calculation from server"
+    elif tag == 'builtin':
+        return "running builtin calculation"
+    else:
+        return "from stored {} repository".format(tag)
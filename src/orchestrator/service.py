@@ -0,0 +1,177 @@
+#! /usr/bin/env python3
+
+# Copyright (C)
+# Author: alberto-ferrero
+
+"""
+
+E2E Performance Simulator service
+
+Long running local HTTP service, accepting Simulation Requests and running them in queue,
+in the same warm process. Parsed assets files, compiled json schemas validators, the world
+base map and the most recent propagation datasets are kept in memory among runs.
+
+    POST /simulations           Simulation Request as json or yaml, validated and queued
+    GET  /simulations           status of all recent simulations
+    GET  /simulations/<id>      status of a simulation, with its output folder once completed
+
+Simulations are run one at a time, each one running its modules in parallel.
+
+"""
+
+import os
+import copy
+import json
+import time
+import queue
+import threading
+from datetime import datetime, timezone
+from collections import OrderedDict
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from ..utils.filemanager import getBasePath, makeOutputFolder, readInputYml
+from ..utils.manifest import initManifest
+from ..utils.tracer import resetTrace, saveTrace
+from .preprocessor.preprocessor import validateSimulationRequest, preloadCatalogs
+from .main import runSimulation
+from .scheduler import DEFAULT_MAX_WORKERS
+
+DEFAULT_SERVICE_ADDRESS = '127.0.0.1'
+DEFAULT_SERVICE_PORT = 8090
+#Max number of queued simulations, and of simulations kept in status history
+MAX_QUEUED_SIMULATIONS = 100
+MAX_SIMULATIONS_HISTORY = 1000
+
+class SimulationService:
+    """ Queue of Simulation Requests, run in sequence by a worker thread """
+    def __init__(self, workers: int = DEFAULT_MAX_WORKERS, outputFolderPath: str = None):
+        self.workers: int = workers
+        self.outputFolderPath: str = outputFolderPath or os.path.join(getBasePath(), 'output')
+        self.queue = queue.Queue(maxsize=MAX_QUEUED_SIMULATIONS)
+        self.simulations = OrderedDict()
+        self.lock = threading.Lock()
+        self.counter: int = 0
+        self.worker = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.worker.start()
+
+    def submit(self, simulationRequest: dict) -> dict:
+        """ Validate and queue Simulation Request, returning simulation status """
+        simulationRequest = validateSimulationRequest(copy.deepcopy(simulationRequest))
+        #Parse assets files now, so that wrong references are reported to the caller
+        preloadCatalogs(simulationRequest)
+        with self.lock:
+            self.counter += 1
+            simId = datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S") + "_" + simulationRequest['id'] + "-" + str(self.counter).zfill(4)
+            simulation = {'id': simId, 'status': 'queued', 'submitted': time.time(), 'duration': None, 'outputPath': None, 'error': None}
+            self.queue.put_nowait((simId, simulationRequest))
+            self.simulations[simId] = simulation
+            while len(self.simulations) > MAX_SIMULATIONS_HISTORY:
+                self.simulations.popitem(last=False)
+            return dict(simulation)
+
+    def getSimulation(self, simId: str) -> dict:
+        with self.lock:
+            return dict(self.simulations[simId]) if simId in self.simulations else None
+
+    def getSimulations(self) -> list:
+        with self.lock:
+            return [dict(simulation) for simulation in self.simulations.values()]
+
+    def setSimulation(self, simId: str, **values):
+        with self.lock:
+            if simId in self.simulations:
+                self.simulations[simId].update(values)
+
+    def run(self):
+        """ Run queued simulations, one at a time """
+        while True:
+            simId, simulationRequest = self.queue.get()
+            tick = time.time()
+            outputPath = makeOutputFolder(os.path.join(self.outputFolderPath, simId))
+            self.setSimulation(simId, status='running', outputPath=outputPath)
+            print(' - Running simulation {}'.format(simId))
+            resetTrace()
+            try:
+                initManifest(os.path.join(outputPath, 'data'), simulationRequest)
+                runSimulation(simulationRequest, outputPath, self.workers)
+                self.setSimulation(simId, status='completed', duration=time.time() - tick)
+            except Exception as e:
+                print(' - Simulation {} failed due to: {}'.format(simId, str(e)))
+                self.setSimulation(simId, status='failed', duration=time.time() - tick, error=str(e))
+            finally:
+                saveTrace(outputPath)
+                self.queue.task_done()
+            print(' - Simulation {} {} in {:.4f} seconds'.format(simId, self.getSimulation(simId)['status'], time.time() - tick))
+
+def getServiceRequestHandler(service: SimulationService):
+    """ Get HTTP handler class, calling the simulation service """
+
+    class ServiceRequestHandler(BaseHTTPRequestHandler):
+
+        def sendJson(self, code: int, data):
+            body = json.dumps(data).encode('utf-8')
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            path = self.path.rstrip('/')
+            if path == '/simulations':
+                return self.sendJson(200, service.getSimulations())
+            if path.startswith('/simulations/'):
+                simulation = service.getSimulation(path.split('/')[-1])
+                if simulation is None:
+                    return self.sendJson(404, {'error': 'simulation not found'})
+                return self.sendJson(200, simulation)
+            return self.sendJson(404, {'error': 'unknown path {}'.format(self.path)})
+
+        def do_POST(self):
+            if self.path.rstrip('/') != '/simulations':
+                return self.sendJson(404, {'error': 'unknown path {}'.format(self.path)})
+            try:
+                #Json being also yaml, accept both, parsed as input files, with safe loader
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                simulationRequest = readInputYml(body.decode('utf-8'), safe=True)
+                if not isinstance(simulationRequest, dict):
+                    raise Exception('ERROR: Simulation Request is not an object')
+            except Exception as e:
+                return self.sendJson(400, {'error': 'not possible to parse Simulation Request due to: {}'.format(str(e))})
+            try:
+                return self.sendJson(202, service.submit(simulationRequest))
+            except queue.Full:
+                return self.sendJson(503, {'error': 'too many simulations queued'})
+            except Exception as e:
+                return self.sendJson(400, {'error': str(e)})
+
+        def log_message(self, format, *args):
+            #Quiet, simulations progress is printed by the service
+            pass
+
+    return ServiceRequestHandler
+
+def warmUp():
+    """ Import report and analysis dependencies, once for all simulations """
+    from docx import Document
+    from .postprocessor.analysis import constellationgeom, gslocation, utlocation, contacts, links, latency, network
+
+def serve(address: str = DEFAULT_SERVICE_ADDRESS, port: int = DEFAULT_SERVICE_PORT, workers: int = DEFAULT_MAX_WORKERS):
+    """ Run simulation service, until interrupted """
+    print('\nWelcome to RSN E2E Performance Simulator, service mode\n')
+    tick = time.time()
+    warmUp()
+    service = SimulationService(workers)
+    service.start()
+    server = ThreadingHTTPServer((address, port), getServiceRequestHandler(service))
+    print(' - Service ready in {:.4f} seconds, listening at http://{}:{}/simulations'.format(time.time() - tick, address, port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print('\n - Service stopped')
+    finally:
+        server.server_close()
+
+# -*- coding: utf-8 -*-
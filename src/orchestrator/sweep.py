@@ -0,0 +1,153 @@
+#! /usr/bin/env python3
+
+# Copyright (C)
+# Author: alberto-ferrero
+
+"""
+
+E2E Performance Simulator parameter sweep
+
+Run many variants of a base Simulation Request in a process pool, where each variant
+overrides some values of the base request, as the combination of a matrix of overrides:
+
+    overrides:
+      userterminals.0.usage: [0.2, 0.6]
+      analysis: [[contacts], [latency]]
+
+Variants share the parsed assets files, loaded once before forking the workers, and the
+output of upstream modules with identical inputs, through the modules output cache.
+
+"""
+
+import os
+import copy
+import time
+import itertools
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from ..utils.filemanager import getBasePath, makeOutputFolder, readInputYmlFile
+from ..utils.cache import CACHED_MODULES_INPUTS, getModuleCacheKey
+from ..utils.tracer import resetTrace, saveTrace
+from .preprocessor.preprocessor import preProcessSimulationRequest, validateSimulationRequest, preloadCatalogs
+from .main import runSimulation
+from .scheduler import DEFAULT_MAX_WORKERS
+
+DEFAULT_SWEEP_PROCESSES = 4
+
+def sweep(inputFile: str, matrixFile: str, processes: int = DEFAULT_SWEEP_PROCESSES, workers: int = DEFAULT_MAX_WORKERS) -> str:
+    """ Run all variants of the base Simulation Request, and return path of the summary table """
+
+    print('\nWelcome to RSN E2E Performance Simulator, parameter sweep\n')
+    tick = time.time()
+
+    #Parse base simulation request and overrides matrix
+    inputFileAbsPath = os.path.abspath(inputFile)
+    print(' - Reading input scenario file: {}'.format(inputFileAbsPath))
+    baseRequest: dict = preProcessSimulationRequest(inputFileAbsPath)
+    matrix: dict = readInputYmlFile(os.path.abspath(matrixFile)).get('overrides', {})
+    variants: list = getSweepVariants(baseRequest, matrix)
+    print(' - Sweeping {} variants, over {}'.format(len(variants), ', '.join(matrix.keys())))
+
+    #Build output folder
+    sweepId = datetime.fromtimestamp(tick).strftime("%Y%m%d-%H%M%S") + "_" + baseRequest['id'] + "-sweep"
+    sweepOutputPath = makeOutputFolder(os.path.join(getBasePath(), 'output', sweepId))
+
+    #Load assets once, so that forked workers inherit them
+    for _, _, simulationRequest in variants:
+        preloadCatalogs(simulationRequest)
+
+    #Run variants in phases, each cached module output computed by one variant, before the variants reading it
+    results = []
+    with ProcessPoolExecutor(max_workers=max(1, processes), mp_context=getProcessContext()) as executor:
+        for phaseVariants in getSweepPhases(variants):
+            futures = [executor.submit(runSweepVariant, variantId, simulationRequest, sweepOutputPath, workers) for variantId, _, simulationRequest in phaseVariants]
+            for (variantId, overrides, _), future in zip(phaseVariants, futures):
+                result = future.result()
+                result.update(overrides)
+                results.append(result)
+                print(' - Variant {} {} in {:.4f} seconds'.format(variantId, result['status'], result['duration']))
+
+    #Write consolidated summary
+    summaryDf = pd.DataFrame(results, columns=['variant'] + list(matrix.keys()) + ['status', 'duration', 'outputPath', 'error'])
+    summaryDf.sort_values(by='variant', inplace=True)
+    summaryPath = os.path.join(sweepOutputPath, 'sweep-summary.csv')
+    summaryDf.to_csv(summaryPath, index=False)
+    print('\n' + summaryDf.drop(columns=['outputPath']).to_string(index=False) + '\n')
+    print(' - Sweep completed in {:.4f} seconds, summary saved in {}\n'.format(time.time() - tick, summaryPath))
+    return summaryPath
+
+################################################################################################
+
+def getSweepVariants(baseRequest: dict, matrix: dict) -> list:
+    """ Get list of (variant id, overrides, simulation request), one for each combination of overrides """
+    variants = []
+    paths = list(matrix.keys())
+    for index, values in enumerate(itertools.product(*[matrix[path] for path in paths])):
+        variantId = baseRequest['id'] + '-v{}'.format(str(index).zfill(3))
+        overrides = dict(zip(paths, values))
+        simulationRequest = copy.deepcopy(baseRequest)
+        for path, value in overrides.items():
+            setRequestValue(simulationRequest, path, copy.deepcopy(value))
+        simulationRequest['id'] = variantId
+        #Share upstream modules results among variants
+        simulationRequest['cache'] = {**simulationRequest.get('cache', {}), 'enabled': True}
+        variants.append((variantId, overrides, validateSimulationRequest(simulationRequest)))
+    return variants
+
+def setRequestValue(simulationRequest: dict, path: str, value):
+    """ Set value in Simulation Request, at dotted path, where list items are referred by index """
+    keys = path.split('.')
+    obj = simulationRequest
+    for key in keys[:-1]:
+        obj = obj[int(key)] if isinstance(obj, list) else obj.setdefault(key, {})
+    if isinstance(obj, list):
+        obj[int(keys[-1])] = value
+    else:
+        obj[keys[-1]] = value
+
+def getSweepPhases(variants: list) -> list:
+    """ Split variants in phases, to be run one after the other: the cache key of each module is computed by the first variant
+        requiring it, and variants requiring a key computed by another variant run in a later phase than that variant
+    """
+    phases = []
+    keysPhases = {}
+    for variant in variants:
+        simulationRequest = variant[2]
+        keys = [(moduleTag, getModuleCacheKey(simulationRequest, moduleTag)) for moduleTag in CACHED_MODULES_INPUTS
+                if simulationRequest['modules'].get(moduleTag, {}).get('data') == 'run']
+        phase = max([keysPhases[key] + 1 for key in keys if key in keysPhases], default=0)
+        for key in keys:
+            keysPhases.setdefault(key, phase)
+        while len(phases) <= phase:
+            phases.append([])
+        phases[phase].append(variant)
+    return phases
+
+def getProcessContext():
+    """ Fork workers where possible, to share the assets loaded by the parent process """
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return multiprocessing.get_context()
+
+def runSweepVariant(variantId: str, simulationRequest: dict, sweepOutputPath: str, workers: int) -> dict:
+    """ Run a variant in a worker process, and return its summary """
+    tick = time.time()
+    resetTrace()
+    outputPath = makeOutputFolder(os.path.join(sweepOutputPath, variantId))
+    result = {'variant': variantId, 'outputPath': outputPath, 'error': ''}
+    try:
+        runSimulation(simulationRequest, outputPath, workers)
+        result['status'] = 'completed'
+    except Exception as e:
+        result['status'] = 'failed'
+        result['error'] = str(e)
+    finally:
+        saveTrace(outputPath)
+    result['duration'] = time.time() - tick
+    return result
+
+# -*- coding: utf-8 -*-
@@ -9,12 +9,11 @@ import time
 from ..spacelink.request import spacelink, getSpaceLinkRequest
 
 from ..orchestrator.preprocessor.preprocessor import readSatellites
-from ..flightdynamics.filemanager import readCsvPropagationDataFilesAsDataframe
-from ..spacelink.filemanager import extractSpaceLinkDataFromCsv, saveSpaceLinkData
+from ..flightdynamics.dataset import getPropagationDataset
+from ..spacelink.filemanager import extractSpaceLinkDataFromCsv, saveSpaceLinkData, getSpaceLinkDataOutputPath
 
 from ..utils.results import AppResult
-from ..utils.timeconverter import getTimestampFromDate
-from ..utils.filemanager import saveDictToJson
+from ..utils.manifest import getCompletedItems, setItemsCompleted, saveItemJournal, mergeItemsJournals
 
 """ E2E Performance Simulator Space Link Budget Handler """
 
@@ -25,7 +24,9 @@ def getSpaceLinkBudgetData(simulationRequest: dict, outputDataFolderPath: str, f
 
     linkBudgetInfo = simulationRequest['modules']['spaceLinkBudget']
     
-    linkRequestFull = {}
+    #Satellites with link requests journals, to merge in a single file
+    journaledSatIds = []
+    spaceLinkBudgetDataOutputPath = getSpaceLinkDataOutputPath(outputDataFolderPath)
 
     #Define propagation data source
     if linkBudgetInfo['data'] == 'run':
@@ -41,34 +42,34 @@ def getSpaceLinkBudgetData(simulationRequest: dict, outputDataFolderPath: str, f
         #Load assets
         satellites = readSatellites(simulationRequest)
      
-        #Read propagation data, from Flight Dynamics calculation
-        propagationData = readCsvPropagationDataFilesAsDataframe(flightDynamicsDataOutputPath)
-
-        #Pre process dataframes, adding timestamps and filtering only Inter Satellite Visibility (ISV)
+        #Get propagation data, from Flight Dynamics calculation, filtering only Inter Satellite Visibility (ISV)
+        propagationDataset = getPropagationDataset(flightDynamicsDataOutputPath)
         satIds = [sat['id'] for sat in satellites]
-        satStatesDf = {}
+        journaledSatIds = satIds
+        stateIndexes = {}
         satContactsDf = {}
         for satId in satIds:
-            statesDf = propagationData[satId]['orbitStateList']
-            statesDf['timestamp'] = statesDf['utcTime'].apply(getTimestampFromDate)
-            contactsDf = propagationData[satId]['contactList']
-            contactsDf = contactsDf[contactsDf['contactType'] == 'ISV']
-            contactsDf['startTimestamp'] = contactsDf['startUtcTime'].apply(getTimestampFromDate)
-            contactsDf['endTimestamp'] = contactsDf['endUtcTime'].apply(getTimestampFromDate)
-            #Store
-            satStatesDf[satId] = statesDf
-            satContactsDf[satId] = contactsDf
-        
-        del propagationData
+            stateIndexes[satId] = propagationDataset.getStateIndex(satId)
+            satContactsDf[satId] = propagationDataset.getContacts(satId, 'ISV')
+
+        #Resume satellites completed in a previous run, their link requests kept in their journals
+        completedSatIds = getCompletedItems(outputDataFolderPath, 'spaceLinkBudget')
+        if completedSatIds:
+            print('   - Resuming, {} satellites already calculated'.format(len(completedSatIds)))
 
         #Get Space Link Budget request, for each satellite, considering calculated contacts        
         for satId in satIds:
+            if satId in completedSatIds:
+                continue
             #Calculate space link
-            spaceLinkRequest = getSpaceLinkRequest(satId, satStatesDf, satContactsDf[satId])
-            linkRequestFull[satId] = spaceLinkRequest
+            spaceLinkRequest = getSpaceLinkRequest(satId, stateIndexes, satContactsDf[satId])
             spaceLinkDataRes: AppResult = spacelink(url, spaceLinkRequest)
             #Save for satId
             spaceLinkBudgetDataOutputPath = saveSpaceLinkData(outputDataFolderPath, satId, spaceLinkDataRes.result[satId])
+            #Journal of satellite request, not kept in memory for the whole constellation
+            saveItemJournal(spaceLinkBudgetDataOutputPath, 'linkrequest', satId, spaceLinkRequest)
+            setItemsCompleted(outputDataFolderPath, 'spaceLinkBudget', [satId])
+            del spaceLinkRequest, spaceLinkDataRes
             
         print('   - Space Link Budget calculation completed in {:.4f} seconds'.format(time.time() - tick))
     
@@ -79,7 +80,7 @@ def getSpaceLinkBudgetData(simulationRequest: dict, outputDataFolderPath: str, f
         for satId in spaceLinkDataRes:
             spaceLinkBudgetDataOutputPath = saveSpaceLinkData(outputDataFolderPath, satId, spaceLinkDataRes[satId])
     
-    saveDictToJson(linkRequestFull, os.path.join(spaceLinkBudgetDataOutputPath, 'linkrequest.json'))
+    mergeItemsJournals(spaceLinkBudgetDataOutputPath, 'linkrequest', journaledSatIds, os.path.join(spaceLinkBudgetDataOutputPath, 'linkrequest.json'))
     
     print('   - Saved Propagation Data in output folder {}'.format(spaceLinkBudgetDataOutputPath))        
     return spaceLinkBudgetDataOutputPath
@@ -6,8 +6,11 @@
 """ E2E Performance Simulator Space Link Budget Calculator Handler: REST API Requests """
 
 from ..utils.results import AppResult
+from ..utils.tracer import span
+from ..utils.filemanager import getDfRecords
 from ..spacelink.mapper import getSatelliteOpticalLinkProperties
 
+import numpy as np
 import pandas as pd
 
 import requests
@@ -17,16 +20,17 @@ def spacelink(url: str, spaceLinkRequest: dict) -> dict:
     """ Call the Space Link Budget Calculator and get link data """
     return AppResult(200, spaceLinkRequest, {spaceLinkRequest['satellite']['id']: [{"margin": 2}, {"margin": 3}]})
     #TODO
-    payload = json.dumps(spaceLinkRequest)
-    response = requests.request("POST", url,
-                                headers={'Content-Type': 'application/json'},
-                                data=payload).json()
+    with span('space link request', 'http', satellite=spaceLinkRequest['satellite']['id']):
+        payload = json.dumps(spaceLinkRequest)
+        response = requests.request("POST", url,
+                                    headers={'Content-Type': 'application/json'},
+                                    data=payload).json()
     if 'status' in response:
         return AppResult(response['status'], spaceLinkRequest, response['error'])
     else:
         return AppResult(200, spaceLinkRequest, response)
 
-def getSpaceLinkRequest(satId: str, satStatesDf: dict, contactsDf: pd.DataFrame) -> dict:
+def getSpaceLinkRequest(satId: str, stateIndexes: dict, contactsDf: pd.DataFrame) -> dict:
     """ For couple Satellite-Satellite, get all satellite states in between contacts, and assets communication properties """
     spaceLinkRequest = {}
     spaceLinkRequest = {}
@@ -36,34 +40,32 @@ def getSpaceLinkRequest(satId: str, satStatesDf: dict, contactsDf: pd.DataFrame)
         spaceLinkRequest['satellite']['id'] = satId
         spaceLinkRequest['satellite']['oisl'] = getSatelliteOpticalLinkProperties()
         # Get states for each contact window
-        spaceLinkRequest['satellite']['states'] = getContactStates(satId, satStatesDf, contactsDf)
+        spaceLinkRequest['satellite']['states'] = getContactStates(satId, stateIndexes, contactsDf)
     return spaceLinkRequest
 
-def getContactStates(satId: str, satStatesDf: dict, soiContacts: pd.DataFrame) -> list:
-    def getDistancesOfDeputy(soiIds: list, satsStates: dict, timestamp: int, pos: tuple):
-        distances = {}
-        for soiId in soiIds:
-            df = satsStates[soiId]
-            deputyState = df[df['timestamp'] == timestamp]
-            if len(deputyState) == 1:
-                distances[soiId] = getDistance(pos[0], pos[1], pos[2], deputyState.iloc[0]['X'], deputyState.iloc[0]['Y'], deputyState.iloc[0]['Z'])
-        return distances
-
+def getContactStates(satId: str, stateIndexes: dict, soiContacts: pd.DataFrame) -> list:
+    """ Get states of satellite in contact windows, from satellites state indexes, with distances of deputy satellites """
     soiIds = soiContacts['argumentOfInterestId'].unique().tolist()
-    states: pd.DataFrame = satStatesDf[satId]
-    #Build intervals
-    intervals = [pd.Interval(soiContacts.iloc[i]['startTimestamp'], soiContacts.iloc[i]['endTimestamp'], 'both') for i in range(len(soiContacts))]
-    #Get states inside intervales
-    mask = states['timestamp'].apply(lambda x: any([x in interval for interval in intervals]))
-    filteredStates = states[mask]
+    #Get states inside contacts windows
+    filteredStates = stateIndexes[satId].getStates(soiContacts['startTimestamp'], soiContacts['endTimestamp'])
     filteredStates = filteredStates[['utcTime', 'timestamp', 'X', 'Y', 'Z']]
     #Get for each states into a ISV contact, the distance of deputy satellites, if position known
-    filteredStates["distances"] = filteredStates.apply(lambda s: getDistancesOfDeputy(soiIds, satStatesDf, s["timestamp"], (s["X"], s["Y"], s["Z"])), axis=1)
-    return filteredStates.T.apply(lambda x: x.dropna().to_dict()).tolist()
+    distances = [{} for _ in range(len(filteredStates))]
+    timestamps = filteredStates['timestamp'].to_numpy()
+    x, y, z = [filteredStates[c].to_numpy(dtype=float) for c in ['X', 'Y', 'Z']]
+    for soiId in soiIds:
+        deputyIndex = stateIndexes[soiId]
+        indexes = deputyIndex.getStatesIndexes(timestamps)
+        known = np.flatnonzero(indexes >= 0)
+        deputyPos = deputyIndex.statesDf[['X', 'Y', 'Z']].to_numpy(dtype=float)[indexes[known]]
+        soiDistances = getDistance(x[known], y[known], z[known], deputyPos[:, 0], deputyPos[:, 1], deputyPos[:, 2])
+        for k, distance in zip(known.tolist(), soiDistances.tolist()):
+            distances[k][soiId] = distance
+    filteredStates = filteredStates.assign(distances=distances)
+    return getDfRecords(filteredStates)
 
-def getDistance(x1: float, y1: float, z1: float, x2: float, y2: float, z2: float) -> float:
-    """ Get distance between componenst of 2 3D vectors """
-    from math import sqrt
-    return sqrt((x1 - x2) * (x1 - x2) + (y1 - y2) * (y1 - y2) + (z1 - z2) * (z1 - z2))
+def getDistance(x1, y1, z1, x2, y2, z2):
+    """ Get distance between componenst of 2 3D vectors, or of arrays of them """
+    return np.sqrt((x1 - x2) * (x1 - x2) + (y1 - y2) * (y1 - y2) + (z1 - z2) * (z1 - z2))
 
 # -*- coding: utf-8 -*-
@@ -0,0 +1,200 @@
+#! /usr/bin/env python3
+
+# Copyright (C)
+# Author: alberto-ferrero
+
+""""
+Collection of methods to cache modules output data across runs.
+
+Entries are addressed by a hash of the part of the Simulation Request the module output
+depends on, plus the content of the referenced satellites, ground stations and user terminals files,
+and the listing of the upstream modules data read from a local repository. Modules reading upstream
+data from a remote repository are not cached, as the repository may change at the same address.
+"""
+
+import os
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    #Not on posix, cache locked only among threads
+    fcntl = None
+
+from .filemanager import getBasePath, getUserCachePath, makeOutputFolder, removeFolder
+from ..flightdynamics.dataset import linkPropagationDataset
+
+DEFAULT_CACHE_MAX_SIZE = 2000 #[MB]
+DEFAULT_CACHE_MAX_ENTRIES = 50
+
+#Modules whose output can be cached, with the modules they depend on
+CACHED_MODULES_INPUTS = {
+    'flightDynamics': [],
+    'airLinkBudget': ['flightDynamics'],
+    'spaceLinkBudget': ['flightDynamics']
+}
+
+#Modules properties only affecting speed, not output data, left out of the cache key
+CACHE_KEY_IGNORED_PROPERTIES = ['maxParallelRequests', 'maxParallelReads', 'maxBatchSize', 'shardDuration', 'storage', 'maxGroundsPerRequest']
+
+CACHE_ENTRY_FILE = 'entry.json'
+CACHE_ENTRY_DATA = 'data'
+CACHE_LOCK_FILE = '.lock'
+
+cacheLock = threading.Lock()
+
+def isModuleCached(simulationRequest: dict, moduleTag: str) -> bool:
+    """ Check if module output is cached, only for data calculated running the modules, from upstream data not in a remote repository """
+    return simulationRequest.get('cache', {}).get('enabled', False) and \
+        moduleTag in CACHED_MODULES_INPUTS and \
+        simulationRequest['modules'][moduleTag]['data'] == 'run' and \
+        all([simulationRequest['modules'].get(tag, {}).get('data') != 'remote' for tag in CACHED_MODULES_INPUTS[moduleTag]])
+
+def getCachePath(simulationRequest: dict) -> str:
+    """ Get cache folder of the Simulation Request, by default in the user cache, out of the source tree """
+    return simulationRequest.get('cache', {}).get('path', os.path.join(getUserCachePath(), 'modules'))
+
+def getModuleCacheKey(simulationRequest: dict, moduleTag: str) -> str:
+    """ Get hash of the Simulation Request parts, of the assets files and of the upstream local data, the module output depends on """
+    def getModuleRequest(tag: str) -> dict:
+        moduleRequest = {k: v for k, v in simulationRequest['modules'].get(tag, {}).items() if k != 'report'}
+        properties = {k: v for k, v in moduleRequest.pop('properties', {}).items() if k not in CACHE_KEY_IGNORED_PROPERTIES}
+        if properties:
+            moduleRequest['properties'] = properties
+        return moduleRequest
+
+    key = {
+        'simulationWindow': simulationRequest['simulationWindow'],
+        'modules': {tag: getModuleRequest(tag) for tag in [moduleTag] + CACHED_MODULES_INPUTS[moduleTag]},
+        'satellites': simulationRequest['satellites'],
+        'groundstations': simulationRequest.get('groundstations', {}),
+        'userterminals': simulationRequest.get('userterminals', []),
+        'files': getAssetsFilesDigests(simulationRequest),
+        'upstream': {tag: getLocalDataListing(simulationRequest['modules'][tag]['address']) for tag in CACHED_MODULES_INPUTS[moduleTag]
+                     if simulationRequest['modules'].get(tag, {}).get('data') == 'local'}
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode('utf-8')).hexdigest()
+
+def getAssetsFilesDigests(simulationRequest: dict) -> dict:
+    """ Get digest of the content of satellites, ground stations and user terminals files """
+    filesPaths = [os.path.join('satellites', simulationRequest['satellites']['file'])]
+    if 'file' in simulationRequest.get('groundstations', {}):
+        filesPaths.append(os.path.join('groundstations', simulationRequest['groundstations']['file']))
+    for ut in simulationRequest.get('userterminals', []):
+        filesPaths.append(os.path.join('userterminals', ut['file']))
+    digests = {}
+    for filePath in filesPaths:
+        with open(os.path.join(getBasePath(), 'data', filePath), 'rb') as f:
+            digests[filePath] = hashlib.sha256(f.read()).hexdigest()
+    return digests
+
+def getLocalDataListing(dataPath: str) -> list:
+    """ Get name, size and last modification time of files in local repository folder """
+    listing = []
+    for root, _, fileNames in os.walk(dataPath):
+        for fileName in sorted(fileNames):
+            filePath = os.path.join(root, fileName)
+            stat = os.stat(filePath)
+            listing.append([os.path.relpath(filePath, dataPath), stat.st_size, stat.st_mtime_ns])
+    return sorted(listing)
+
+def getCachedModuleData(simulationRequest: dict, moduleTag: str, moduleOutputPath: str, handler, *args) -> str:
+    """ Restore module output from cache if available, otherwise call handler and store its output in cache """
+    cachePath = getCachePath(simulationRequest)
+    key = getModuleCacheKey(simulationRequest, moduleTag)
+    entryPath = os.path.join(cachePath, moduleTag, key)
+    if restoreCacheEntry(entryPath, moduleOutputPath):
+        print('   - Restored {} data from cache entry {}'.format(moduleTag, key[:12]))
+        #Reuse propagation data still in memory, from a previous run of the process
+        linkPropagationDataset(os.path.join(entryPath, CACHE_ENTRY_DATA), moduleOutputPath)
+        return moduleOutputPath
+    outputPath = handler(*args)
+    storeCacheEntry(entryPath, outputPath)
+    linkPropagationDataset(outputPath, os.path.join(entryPath, CACHE_ENTRY_DATA))
+    evictCacheEntries(cachePath,
+                      simulationRequest['cache'].get('maxSize', DEFAULT_CACHE_MAX_SIZE),
+                      simulationRequest['cache'].get('maxEntries', DEFAULT_CACHE_MAX_ENTRIES))
+    return outputPath
+
+@contextmanager
+def lockCache(cachePath: str, shared: bool = False):
+    """ Lock cache folder among threads and processes, shared by readers of entries or exclusive to add and remove entries """
+    makeOutputFolder(cachePath)
+    with open(os.path.join(cachePath, CACHE_LOCK_FILE), 'a') as lockFile:
+        if fcntl is None:
+            with cacheLock:
+                yield
+            return
+        fcntl.flock(lockFile, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lockFile, fcntl.LOCK_UN)
+
+def restoreCacheEntry(entryPath: str, outputPath: str) -> bool:
+    """ Copy cached data into output folder, updating entry last access, entry not evicted while copied """
+    entryFilePath = os.path.join(entryPath, CACHE_ENTRY_FILE)
+    if not os.path.isfile(entryFilePath):
+        return False
+    try:
+        with lockCache(os.path.dirname(os.path.dirname(entryPath)), shared=True):
+            shutil.copytree(os.path.join(entryPath, CACHE_ENTRY_DATA), outputPath, dirs_exist_ok=True)
+            with open(entryFilePath, 'r') as f:
+                entry = json.load(f)
+            entry['lastAccess'] = time.time()
+            #Replaced once written, as other readers may update it at the same time
+            tmpEntryFilePath = entryFilePath + '.tmp-' + uuid.uuid4().hex
+            with open(tmpEntryFilePath, 'w') as f:
+                json.dump(entry, f)
+            os.replace(tmpEntryFilePath, entryFilePath)
+        return True
+    except Exception as e:
+        #Entry evicted or corrupted while reading, compute again
+        print('   - Cache entry {} not usable due to: {}'.format(entryPath, str(e)))
+        return False
+
+def storeCacheEntry(entryPath: str, outputPath: str):
+    """ Copy module output folder into cache, moving it in place once completed """
+    tmpEntryPath = entryPath + '.tmp-' + uuid.uuid4().hex
+    shutil.copytree(outputPath, os.path.join(tmpEntryPath, CACHE_ENTRY_DATA))
+    size = sum([os.path.getsize(os.path.join(root, fileName)) for root, _, fileNames in os.walk(tmpEntryPath) for fileName in fileNames])
+    with open(os.path.join(tmpEntryPath, CACHE_ENTRY_FILE), 'w') as f:
+        json.dump({'created': time.time(), 'lastAccess': time.time(), 'size': size}, f)
+    with lockCache(os.path.dirname(os.path.dirname(entryPath))):
+        makeOutputFolder(os.path.dirname(entryPath))
+        try:
+            os.rename(tmpEntryPath, entryPath)
+        except OSError:
+            if not os.path.isdir(entryPath):
+                removeFolder(tmpEntryPath)
+                raise
+            #Same entry stored meanwhile, by another thread or process
+            removeFolder(tmpEntryPath)
+
+def evictCacheEntries(cachePath: str, maxSize: float, maxEntries: int):
+    """ Remove least recently used entries, until cache is below size [MB] and number of entries limits """
+    with lockCache(cachePath):
+        entries = []
+        for moduleTag in CACHED_MODULES_INPUTS:
+            modulePath = os.path.join(cachePath, moduleTag)
+            if not os.path.isdir(modulePath):
+                continue
+            for key in os.listdir(modulePath):
+                entryFilePath = os.path.join(modulePath, key, CACHE_ENTRY_FILE)
+                if os.path.isfile(entryFilePath):
+                    with open(entryFilePath, 'r') as f:
+                        entries.append((json.load(f), os.path.join(modulePath, key)))
+        entries.sort(key=lambda e: e[0]['lastAccess'])
+        totSize = sum([entry['size'] for entry, _ in entries])
+        while entries and (totSize > maxSize * 1e6 or len(entries) > maxEntries):
+            entry, entryPath = entries.pop(0)
+            removeFolder(entryPath)
+            totSize -= entry['size']
+
+# -*- coding: utf-8 -*-
@@ -13,6 +13,8 @@ import yaml
 import json
 import re
 
+from .tracer import span
+
 def getBasePath() -> str:
     """ Get base path """
     currentPath = os.path.dirname(os.path.abspath(__file__))
@@ -21,6 +23,10 @@ def getBasePath() -> str:
     cpList.pop()
     return os.sep.join(cpList)
 
+def getUserCachePath() -> str:
+    """ Get cache folder of the user, out of the source tree """
+    return os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache')), 'e2e-performance-simulator')
+
 def getLogoPath() -> str:
     return os.path.join(getBasePath(), "src", "orchestrator", "postprocessor", "logo")
 
@@ -39,13 +45,48 @@ def removeFolder(folderPath: str):
 
 def saveDictToCsv(data: dict, filePath: str):
     """ Save dictionary to file, as csv """
-    df = pd.DataFrame.from_dict(data)
-    df.to_csv(filePath, index=False)
+    with span('write csv', 'io', file=os.path.basename(filePath)):
+        df = pd.DataFrame.from_dict(data)
+        df.to_csv(filePath, index=False)
 
 def saveListDictToCsv(jsonList: list, filePath: str):
     """ Save dictionary list to file, as csv """
-    df = pd.DataFrame(jsonList)
-    df.to_csv(filePath, index=False)
+    with span('write csv', 'io', file=os.path.basename(filePath)):
+        df = pd.DataFrame(jsonList)
+        df.to_csv(filePath, index=False)
+
+def saveDfToColumnar(df: pd.DataFrame, filePath: str):
+    """ Save dataframe to file, as parquet or feather by file extension, requiring optional pyarrow package """
+    requireColumnarEngine()
+    fileFormat = filePath.split('.')[-1]
+    with span('write ' + fileFormat, 'io', file=os.path.basename(filePath)):
+        if fileFormat == 'parquet':
+            df.to_parquet(filePath, index=False)
+        else:
+            df.reset_index(drop=True).to_feather(filePath)
+
+def readColumnarToDf(filePath: str) -> pd.DataFrame:
+    """ Read dataframe from parquet or feather file, by file extension, requiring optional pyarrow package """
+    requireColumnarEngine()
+    fileFormat = filePath.split('.')[-1]
+    try:
+        with span('read ' + fileFormat, 'io', file=os.path.basename(filePath)):
+            return pd.read_parquet(filePath) if fileFormat == 'parquet' else pd.read_feather(filePath)
+    except Exception as e:
+        raise Exception('ERROR: impossible to open file and read as {}: {}, due to {}'.format(fileFormat, filePath, str(e)))
+
+def requireColumnarEngine():
+    """ Check that optional pyarrow package, engine of parquet and feather files, is installed """
+    try:
+        import pyarrow
+    except ImportError:
+        raise Exception('ERROR: parquet and feather files require pyarrow package, not installed')
+
+def getDfRecords(df: pd.DataFrame) -> list:
+    """ Get dataframe rows as list of dictionaries, without null values, built from column lists """
+    columns = list(df.columns)
+    return [{column: value for column, value in zip(columns, row) if value is not None and value == value}
+            for row in zip(*[df[column].tolist() for column in columns])]
 
 def saveDictToJson(data: dict, filePath: str):
     """ Save dictionary to file, as json """
@@ -58,8 +99,9 @@ def readLocalCsvToDict(filePath: str) -> list:
     """ Save dictionary reading csv from local folder """
     if os.path.isfile(filePath):
         try:
-            df = pd.read_csv(filePath)
-            return df.T.apply(lambda x: x.dropna().to_dict()).tolist()
+            with span('read csv', 'io', file=os.path.basename(filePath)):
+                df = pd.read_csv(filePath)
+            return getDfRecords(df)
         except pd.errors.EmptyDataError:
             return []
         except Exception as e:
@@ -71,7 +113,8 @@ def readLocalCsvToDf(filePath: str) -> pd.DataFrame:
     """ Save dictionary reading csv from local folder """
     if os.path.isfile(filePath):
         try:
-            df = pd.read_csv(filePath)
+            with span('read csv', 'io', file=os.path.basename(filePath)):
+                df = pd.read_csv(filePath)
             return df
         except pd.errors.EmptyDataError:
             return []
@@ -83,8 +126,9 @@ def readLocalCsvToDf(filePath: str) -> pd.DataFrame:
 def readRemoteCsvToDict(filePath: str) -> list:
     """ Save dictionary reading csv from remote folder """ 
     try:
-        df = pd.read_csv(filePath)
-        return df.T.apply(lambda x: x.dropna().to_dict()).tolist()
+        with span('read csv', 'io', file=os.path.basename(filePath)):
+            df = pd.read_csv(filePath)
+        return getDfRecords(df)
     except pd.errors.EmptyDataError:
             return []
     except Exception as e:
@@ -93,39 +137,51 @@ def readRemoteCsvToDict(filePath: str) -> list:
 def readRemoteCsvToDf(filePath: str) -> pd.DataFrame:
     """ Save dictionary reading csv from remote folder """ 
     try:
-        df = pd.read_csv(filePath)
+        with span('read csv', 'io', file=os.path.basename(filePath)):
+            df = pd.read_csv(filePath)
         return df
     except pd.errors.EmptyDataError:
             return []
     except Exception as e:
         raise Exception('ERROR: impossible to open file and read as csv: {}, due to {}'.format(filePath, str(e)))
 
+class InputYamlLoader(getattr(yaml, 'CFullLoader', yaml.FullLoader)):
+    """ Full yaml loader, with libyaml parser if available, keeping booleans only as true or false,
+        and floats also with exponent and no dot
+    """
+    def constructBool(self, node):
+        value: str = self.construct_scalar(node)
+        if value.lower() in ['true', 'false']:
+            return self.bool_values[value.lower()]
+        else:
+            return value
+
+class InputYamlSafeLoader(getattr(yaml, 'CSafeLoader', yaml.SafeLoader)):
+    """ Safe yaml loader, for documents not from local files, with the same booleans and floats as the full one """
+    constructBool = InputYamlLoader.constructBool
+
+for inputYamlLoader in (InputYamlLoader, InputYamlSafeLoader):
+    inputYamlLoader.add_constructor(u'tag:yaml.org,2002:bool', inputYamlLoader.constructBool)
+    inputYamlLoader.add_implicit_resolver(
+            u'tag:yaml.org,2002:float',
+            re.compile(u'''^(?:
+                [-+]?(?:[0-9][0-9_]*)\\.[0-9_]*(?:[eE][-+]?[0-9]+)?
+            |[-+]?(?:[0-9][0-9_]*)(?:[eE][-+]?[0-9]+)
+            |\\.[0-9_]+(?:[eE][-+][0-9]+)?
+            |[-+]?[0-9][0-9_]*(?::[0-5]?[0-9])+\\.[0-9_]*
+            |[-+]?\\.(?:inf|Inf|INF)
+            |\\.(?:nan|NaN|NAN))$''', re.X),
+            list(u'-+0123456789.'))
+
+def readInputYml(content, safe: bool = False) -> dict:
+    """ Parse yaml (or json) string or stream, as input files, with safe loader if not from a local file """
+    return yaml.load(content, Loader=InputYamlSafeLoader if safe else InputYamlLoader)
+
 def readInputYmlFile(inputFilePath: str) -> dict:
     # Try to open as yaml
     try:
         with open(inputFilePath) as scenarioYaml:
-
-            def add_bool(self, node):
-                """Custom FullLoader for yaml files, overwriting the bolean conversion"""
-                value: str = self.construct_scalar(node)
-                if value.lower() in ['true', 'false']:
-                    return self.bool_values[value.lower()]
-                else:
-                    return value
-
-            loader = yaml.FullLoader
-            loader.add_constructor(u'tag:yaml.org,2002:bool', add_bool)
-            loader.add_implicit_resolver(
-                    u'tag:yaml.org,2002:float',
-                    re.compile(u'''^(?:
-                        [-+]?(?:[0-9][0-9_]*)\\.[0-9_]*(?:[eE][-+]?[0-9]+)?
-                    |[-+]?(?:[0-9][0-9_]*)(?:[eE][-+]?[0-9]+)
-                    |\\.[0-9_]+(?:[eE][-+][0-9]+)?
-                    |[-+]?[0-9][0-9_]*(?::[0-5]?[0-9])+\\.[0-9_]*
-                    |[-+]?\\.(?:inf|Inf|INF)
-                    |\\.(?:nan|NaN|NAN))$''', re.X),
-                    list(u'-+0123456789.'))
-            return yaml.load(scenarioYaml, Loader=loader)
+            return readInputYml(scenarioYaml)
 
     except Exception as e:
         #Raise error
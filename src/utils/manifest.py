@@ -0,0 +1,102 @@
+#! /usr/bin/env python3
+
+# Copyright (C)
+# Author: alberto-ferrero
+
+""""
+Collection of methods to checkpoint simulation runs.
+
+The manifest, stored in the output data folder, keeps the Simulation Request and records
+completed stages, and completed items of each stage (propagated satellites, satellites
+with link data, analysis sections), so that an interrupted run can be resumed.
+"""
+
+import os
+import json
+import shutil
+import threading
+
+MANIFEST_FILE = 'manifest.json'
+
+manifestLock = threading.Lock()
+
+def getManifestPath(outputDataFolderPath: str) -> str:
+    return os.path.join(outputDataFolderPath, MANIFEST_FILE)
+
+def initManifest(outputDataFolderPath: str, simulationRequest: dict):
+    """ Create manifest of a new run """
+    with manifestLock:
+        writeManifest(outputDataFolderPath, {'simulationRequest': simulationRequest, 'stages': {}, 'items': {}})
+
+def readManifest(outputDataFolderPath: str) -> dict:
+    """ Read manifest, empty if run not checkpointed """
+    manifestPath = getManifestPath(outputDataFolderPath)
+    if not os.path.isfile(manifestPath):
+        return {'stages': {}, 'items': {}}
+    with open(manifestPath, 'r') as f:
+        return json.load(f)
+
+def writeManifest(outputDataFolderPath: str, manifest: dict):
+    """ Write manifest, replacing it only once completely written """
+    os.makedirs(outputDataFolderPath, exist_ok=True)
+    manifestPath = getManifestPath(outputDataFolderPath)
+    with open(manifestPath + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(manifestPath + '.tmp', manifestPath)
+
+def readManifestSimulationRequest(outputPath: str) -> dict:
+    """ Read Simulation Request of the run to resume, from its output folder """
+    manifest = readManifest(os.path.join(outputPath, 'data'))
+    if 'simulationRequest' not in manifest:
+        raise Exception('ERROR: impossible to resume run from {}, no manifest found'.format(outputPath))
+    return manifest['simulationRequest']
+
+def isStageCompleted(outputDataFolderPath: str, stage: str) -> bool:
+    return stage in readManifest(outputDataFolderPath)['stages']
+
+def getStageOutputPath(outputDataFolderPath: str, stage: str) -> str:
+    return readManifest(outputDataFolderPath)['stages'][stage]['outputPath']
+
+def setStageCompleted(outputDataFolderPath: str, stage: str, outputPath: str):
+    with manifestLock:
+        manifest = readManifest(outputDataFolderPath)
+        manifest['stages'][stage] = {'outputPath': outputPath}
+        writeManifest(outputDataFolderPath, manifest)
+
+def getCompletedItems(outputDataFolderPath: str, stage: str) -> list:
+    return readManifest(outputDataFolderPath)['items'].get(stage, [])
+
+def setItemsCompleted(outputDataFolderPath: str, stage: str, items: list):
+    with manifestLock:
+        manifest = readManifest(outputDataFolderPath)
+        completedItems = manifest['items'].setdefault(stage, [])
+        completedItems.extend([item for item in items if item not in completedItems])
+        writeManifest(outputDataFolderPath, manifest)
+
+def getItemJournalPath(folderPath: str, journal: str, item: str) -> str:
+    return os.path.join(folderPath, '{}-{}.json'.format(journal, item))
+
+def saveItemJournal(folderPath: str, journal: str, item: str, data):
+    """ Save journal of an item, in its own file, not to write again the journals of the items completed before """
+    os.makedirs(folderPath, exist_ok=True)
+    journalPath = getItemJournalPath(folderPath, journal, item)
+    with open(journalPath + '.tmp', 'w') as f:
+        json.dump(data, f)
+    os.replace(journalPath + '.tmp', journalPath)
+
+def mergeItemsJournals(folderPath: str, journal: str, items: list, filePath: str):
+    """ Merge journals of items in a json file, as item: journal, copying each journal file as it is, not to load all of them at once """
+    os.makedirs(folderPath, exist_ok=True)
+    with open(filePath, 'w') as f:
+        f.write('{')
+        separator = ''
+        for item in items:
+            journalPath = getItemJournalPath(folderPath, journal, item)
+            if os.path.isfile(journalPath):
+                f.write('{}{}: '.format(separator, json.dumps(item)))
+                with open(journalPath, 'r') as journalFile:
+                    shutil.copyfileobj(journalFile, f)
+                separator = ', '
+        f.write('}')
+
+# -*- coding: utf-8 -*-
@@ -0,0 +1,42 @@
+#! /usr/bin/env python3
+
+# Copyright (C)
+# Author: alberto-ferrero
+
+""""
+Collection of methods to validate data against the json schemas of the api folder.
+
+Schemas are read and their validators compiled only the first time, and then shared
+by all the validations in the process.
+"""
+
+import os
+import json
+import threading
+
+from jsonschema import validators
+from jsonschema.exceptions import best_match
+
+from .filemanager import getBasePath
+
+validatorsLock = threading.Lock()
+schemaValidators = {}
+
+def getSchemaValidator(schemaFile: str):
+    """ Get compiled validator of schema file in api folder """
+    with validatorsLock:
+        if schemaFile not in schemaValidators:
+            with open(os.path.join(getBasePath(), 'api', schemaFile), "r") as f:
+                schema = json.load(f)
+            validatorClass = validators.validator_for(schema)
+            validatorClass.check_schema(schema)
+            schemaValidators[schemaFile] = validatorClass(schema)
+        return schemaValidators[schemaFile]
+
+def validateWithSchema(instance, schemaFile: str):
+    """ Validate instance with schema file in api folder, raising the most relevant error as jsonschema validate """
+    error = best_match(getSchemaValidator(schemaFile).iter_errors(instance))
+    if error is not None:
+        raise error
+
+# -*- coding: utf-8 -*-
@@ -7,6 +7,8 @@
 Collection of methods to convert UTC time.
 """
 
+import numpy as np
+import pandas as pd
 from datetime import datetime, timezone
 from datetime import timezone
 
@@ -38,4 +40,24 @@ def getDatetimeFromDate(date: str) -> datetime:
         date = ".".join(dateList) + "Z"
         return datetime.strptime(date, "%Y-%m-%dT%H:%M:%S.%fZ").replace(tzinfo=UTC)
 
+def getTimestampsFromDates(dates) -> np.ndarray:
+        """ Convert dates into utctimestamps [millis], all at once, as getTimestampFromDate: fraction of second truncated to 4 digits,
+            then millis truncated
+        """
+        if len(dates) == 0:
+            return np.array([], dtype=np.int64)
+        ns = pd.to_datetime(np.asarray(dates, dtype=object), format='ISO8601', utc=True).as_unit('ns').asi8
+        us = ns // 100000 * 100
+        #Millis from float seconds, as datetime timestamp
+        return (us / 1e6 * 1000).astype(np.int64)
+
+def getDatesFromTimestamps(timestamps) -> np.ndarray:
+        """ Convert utctimestamps [millis] to dates, all at once, as getDateFromTimestamp """
+        dates = np.asarray(timestamps, dtype=np.int64).astype('datetime64[ms]')
+        return np.char.add(np.datetime_as_string(dates, unit='us').astype(str), 'Z')
+
+def getDatetimesFromTimestamps(timestamps) -> pd.DatetimeIndex:
+        """ Convert utctimestamps [millis] to UTC datetimes, all at once """
+        return pd.to_datetime(np.asarray(timestamps, dtype=np.int64), unit='ms', utc=True)
+
 # -*- coding: utf-8 -*-
\ No newline at end of file
@@ -0,0 +1,107 @@
+#! /usr/bin/env python3
+
+# Copyright (C)
+# Author: alberto-ferrero
+
+""""
+Collection of methods to trace simulation stages, as nested timed spans.
+
+Spans are exported as Chrome trace events (trace.json, to be opened with chrome://tracing
+or https://ui.perfetto.dev) and as machine-readable timings (timings.json).
+"""
+
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+TRACE_FILE = 'trace.json'
+TIMINGS_FILE = 'timings.json'
+
+traceLock = threading.Lock()
+traceState = {'init': time.perf_counter(), 'spans': [], 'nextId': 0}
+threadState = threading.local()
+
+def resetTrace():
+    """ Clear recorded spans and set trace time zero """
+    with traceLock:
+        traceState['init'] = time.perf_counter()
+        traceState['spans'] = []
+        traceState['nextId'] = 0
+
+def getCurrentSpanId() -> int:
+    """ Get id of the innermost open span of current thread, None if no span open """
+    stack = getattr(threadState, 'stack', [])
+    return stack[-1] if stack else getattr(threadState, 'parentId', None)
+
+@contextmanager
+def span(name: str, category: str = 'stage', **args):
+    """ Trace the enclosed block as span, nested into the current span of the thread """
+    with traceLock:
+        spanId = traceState['nextId']
+        traceState['nextId'] += 1
+    parentId = getCurrentSpanId()
+    if not hasattr(threadState, 'stack'):
+        threadState.stack = []
+    threadState.stack.append(spanId)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        threadState.stack.pop()
+        with traceLock:
+            traceState['spans'].append({
+                'id': spanId,
+                'parent': parentId,
+                'name': name,
+                'category': category,
+                'thread': threading.get_ident(),
+                'start': start - traceState['init'],
+                'duration': end - start,
+                'args': args
+            })
+
+def tracedCall(name: str, category: str, parentId: int, function, *args, **kwargs):
+    """ Call function traced as span, nested into parent span opened by another thread """
+    previousParentId = getattr(threadState, 'parentId', None)
+    threadState.parentId = parentId
+    try:
+        with span(name, category):
+            return function(*args, **kwargs)
+    finally:
+        threadState.parentId = previousParentId
+
+def saveTrace(outputPath: str) -> str:
+    """ Save recorded spans to Chrome trace events file and timings json file, in output folder """
+    with traceLock:
+        spans = sorted(traceState['spans'], key=lambda s: s['start'])
+    pid = os.getpid()
+    events = [{
+        'name': s['name'],
+        'cat': s['category'],
+        'ph': 'X',
+        'ts': s['start'] * 1e6, #[micros]
+        'dur': s['duration'] * 1e6, #[micros]
+        'pid': pid,
+        'tid': s['thread'],
+        'args': s['args']
+    } for s in spans]
+    with open(os.path.join(outputPath, TRACE_FILE), 'w') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f, default=str)
+
+    #Aggregate by category and name
+    summary = {}
+    for s in spans:
+        tag = s['category'] + '/' + s['name']
+        if tag not in summary:
+            summary[tag] = {'count': 0, 'total': 0, 'max': 0}
+        summary[tag]['count'] += 1
+        summary[tag]['total'] += s['duration']
+        summary[tag]['max'] = max(summary[tag]['max'], s['duration'])
+    with open(os.path.join(outputPath, TIMINGS_FILE), 'w') as f:
+        json.dump({'spans': spans, 'summary': summary}, f, indent=2, default=str)
+    return outputPath
+
+# -*- coding: utf-8 -*-
@@ -0,0 +1,20 @@
+#! /usr/bin/env python3
+
+# Copyright (C)
+# Author: alberto-ferrero
+
+""" Launch E2E Perfomance Simulation parameter sweep, running variants of the Simulation Request configuration file """
+
+###############################################################################
+
+if __name__ == "__main__":
+    from src.orchestrator.sweep import sweep, DEFAULT_SWEEP_PROCESSES
+    from src.orchestrator.scheduler import DEFAULT_MAX_WORKERS
+    import argparse
+    parser = argparse.ArgumentParser(description="Run E2E Performance Simulator parameter sweep")
+    parser.add_argument('-i', '--input', type=str, help="E2E Simulation Request configuration file, base of all variants", required=True)
+    parser.add_argument('-m', '--matrix', type=str, help="Overrides matrix file, mapping dotted paths of the Simulation Request to list of values", required=True)
+    parser.add_argument('-p', '--processes', type=int, default=DEFAULT_SWEEP_PROCESSES, help="Max number of variants run at the same time")
+    parser.add_argument('-w', '--workers', type=int, default=DEFAULT_MAX_WORKERS, help="Max number of modules run at the same time, for each variant")
+    args = parser.parse_args()
+    sweep(args.input, args.matrix, args.processes, args.workers)
@@ -0,0 +1,109 @@
+#! /usr/bin/env python3
+
+# Copyright (C)
+# Author: alberto-ferrero
+
+""" Test to cover modules output cache """
+
+import os
+import copy
+
+from concurrent.futures import ProcessPoolExecutor
+
+from src.utils.cache import isModuleCached, getModuleCacheKey, getCachedModuleData, storeCacheEntry, restoreCacheEntry
+
+def getSimulationRequest(cachePath: str) -> dict:
+    return {
+        'id': 'test-cache',
+        'simulationWindow': {'start': '2026-01-01T00:00:00.00Z', 'end': '2026-01-02T00:00:00.00Z'},
+        'modules': {
+            'flightDynamics': {'data': 'run', 'address': 'http://localhost', 'properties': {'propagator': 'KEPLERIAN'}},
+            'airLinkBudget': {'data': 'run', 'address': 'http://localhost'}
+        },
+        'analysis': ['contacts'],
+        'satellites': {'file': 'rsn-018-constellation.yml', 'groundcontacts': False, 'spacecontacts': False},
+        'groundstations': {'file': 'groundstations-sband.yml'},
+        'cache': {'enabled': True, 'path': cachePath, 'maxEntries': 1}
+    }
+
+def test_01_cache_key_depends_on_module_inputs_only():
+    """
+        Test: check that cache key ignores analysis and reports, but not simulation window or upstream modules
+    """
+    simulationRequest = getSimulationRequest('')
+    key = getModuleCacheKey(simulationRequest, 'flightDynamics')
+    otherRequest = copy.deepcopy(simulationRequest)
+    otherRequest['analysis'] = ['latency']
+    otherRequest['modules']['flightDynamics']['report'] = ['plot-something']
+    assert getModuleCacheKey(otherRequest, 'flightDynamics') == key
+    otherRequest['simulationWindow']['end'] = '2026-01-03T00:00:00.00Z'
+    assert getModuleCacheKey(otherRequest, 'flightDynamics') != key
+    otherRequest = copy.deepcopy(simulationRequest)
+    otherRequest['modules']['flightDynamics']['properties']['propagator'] = 'SGP4'
+    assert getModuleCacheKey(otherRequest, 'airLinkBudget') != getModuleCacheKey(simulationRequest, 'airLinkBudget')
+
+def test_02_cache_restore_and_eviction(tmp_path):
+    """
+        Test: check that second call restores from cache, and least recently used entries are evicted
+    """
+    calls = []
+    def handler(outputPath: str) -> str:
+        calls.append(outputPath)
+        os.makedirs(outputPath, exist_ok=True)
+        with open(os.path.join(outputPath, 'sat_orbit-state.csv'), 'w') as f:
+            f.write('utcTime\n')
+        return outputPath
+
+    simulationRequest = getSimulationRequest(str(tmp_path / 'cache'))
+    for run in ('run-1', 'run-2'):
+        outputPath = str(tmp_path / run)
+        assert getCachedModuleData(simulationRequest, 'flightDynamics', outputPath, handler, outputPath) == outputPath
+        assert os.path.isfile(os.path.join(outputPath, 'sat_orbit-state.csv'))
+    assert len(calls) == 1
+
+    #New entry exceeds max entries, first one is evicted
+    simulationRequest['simulationWindow']['end'] = '2026-01-03T00:00:00.00Z'
+    getCachedModuleData(simulationRequest, 'flightDynamics', str(tmp_path / 'run-3'), handler, str(tmp_path / 'run-3'))
+    assert len(os.listdir(tmp_path / 'cache' / 'flightDynamics')) == 1
+
+def storeOutput(entryPath: str, outputPath: str, i: int) -> bool:
+    os.makedirs(outputPath, exist_ok=True)
+    with open(os.path.join(outputPath, 'sat_orbit-state.csv'), 'w') as f:
+        f.write('utcTime\n')
+    storeCacheEntry(entryPath, outputPath)
+    return restoreCacheEntry(entryPath, outputPath + '-restored')
+
+def test_03_cache_entry_stored_by_processes(tmp_path):
+    """
+        Test: store the same cache entry from processes at the same time, check that all succeed and restore it, with no leftovers
+    """
+    entryPath = str(tmp_path / 'cache' / 'flightDynamics' / 'key')
+    with ProcessPoolExecutor(4) as executor:
+        results = list(executor.map(storeOutput, [entryPath] * 8, [str(tmp_path / 'run-{}'.format(i)) for i in range(8)], range(8)))
+    assert all(results)
+    assert os.listdir(tmp_path / 'cache' / 'flightDynamics') == ['key']
+
+def test_04_cache_key_depends_on_upstream_local_data(tmp_path):
+    """
+        Test: check that cache key ignores speed only properties, changes with upstream local data files, and upstream remote data is not cached
+    """
+    simulationRequest = getSimulationRequest('')
+    key = getModuleCacheKey(simulationRequest, 'airLinkBudget')
+    otherRequest = copy.deepcopy(simulationRequest)
+    otherRequest['modules']['flightDynamics']['properties'].update({'maxParallelRequests': 8, 'shardDuration': 3600000, 'storage': 'parquet'})
+    otherRequest['modules']['airLinkBudget']['properties'] = {'maxGroundsPerRequest': 10}
+    assert getModuleCacheKey(otherRequest, 'airLinkBudget') == key
+
+    dataPath = tmp_path / 'propagation'
+    dataPath.mkdir()
+    (dataPath / 'sat_orbit-state.csv').write_text('utcTime\n')
+    simulationRequest['modules']['flightDynamics'].update({'data': 'local', 'address': str(dataPath)})
+    assert isModuleCached(simulationRequest, 'airLinkBudget')
+    key = getModuleCacheKey(simulationRequest, 'airLinkBudget')
+    assert getModuleCacheKey(simulationRequest, 'airLinkBudget') == key
+    #Same repository changed in place
+    (dataPath / 'sat_orbit-state.csv').write_text('utcTime\n2026-01-01T00:00:00.00Z\n')
+    assert getModuleCacheKey(simulationRequest, 'airLinkBudget') != key
+
+    simulationRequest['modules']['flightDynamics'].update({'data': 'remote', 'address': 'https://github.com/some/repository'})
+    assert not isModuleCached(simulationRequest, 'airLinkBudget')
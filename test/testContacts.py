@@ -0,0 +1,79 @@
+#! /usr/bin/env python3
+
+# Copyright (C)
+# Author: alberto-ferrero
+
+""" Test to cover Flight Dynamics local contacts engine """
+
+import os
+import json
+import numpy as np
+import pandas as pd
+
+from src.flightdynamics.propagator import Ephemeris
+from src.flightdynamics.contacts import getGroundContacts, getSpaceContacts, getLocalSpaceContacts
+from src.flightdynamics.dataset import CONTACT_COLUMNS
+from src.utils.timeconverter import getTimestampFromDate
+
+TEST_DATA_PATH = os.path.join('test', 'data', 'test_flightdynamics', '18-satellites')
+
+def test_01_ground_contacts_match_server():
+    """
+        Test: detect ground contacts of stored server data satellites with ground stations, check that:
+        - contacts have the server contacts columns
+        - each server contact is detected, with start, end and max elevation time within 1 second
+        - max elevation and azimuths match the server ones
+    """
+    with open(os.path.join(TEST_DATA_PATH, 'propagationrequest.json'), 'r') as f:
+        propagationRequest = json.load(f)
+    groundstations = [poi for poi in propagationRequest['pointsOfInterest'] if poi['id'].startswith('gs-')]
+    scenario = propagationRequest['scenario']
+    contacts = getGroundContacts(Ephemeris(propagationRequest['assets']), groundstations, scenario['startTimestamp'], scenario['endTimestamp'])
+
+    for satId in ['rsn-A-P01-01', 'rsn-A-P02-03', 'rsn-A-P03-06']:
+        contactsDf = contacts[satId]
+        assert list(contactsDf.columns) == CONTACT_COLUMNS
+        serverContactsDf = pd.read_csv(os.path.join(TEST_DATA_PATH, satId + '_contacts.csv'))
+        serverContactsDf = serverContactsDf[serverContactsDf['contactType'] == 'POI']
+        assert len(contactsDf) == len(serverContactsDf)
+        for _, serverContact in serverContactsDf.iterrows():
+            poiContactsDf = contactsDf[contactsDf['argumentOfInterestId'] == serverContact['argumentOfInterestId']]
+            starts = np.array([getTimestampFromDate(utcTime) for utcTime in poiContactsDf['startUtcTime']])
+            contact = poiContactsDf.iloc[np.argmin(np.abs(starts - getTimestampFromDate(serverContact['startUtcTime'])))]
+            for event in ['start', 'maxElevation', 'end']:
+                assert abs(getTimestampFromDate(contact[event + 'UtcTime']) - getTimestampFromDate(serverContact[event + 'UtcTime'])) < 1000
+                assert abs((contact[event + 'Azimuth'] - serverContact[event + 'Azimuth'] + 180) % 360 - 180) < 0.1
+            assert abs(contact['maxElevationElevation'] - serverContact['maxElevationElevation']) < 0.05
+
+def test_02_space_contacts_match_server_and_all_pairs():
+    """
+        Test: detect space contacts of stored server data satellites, check that:
+        - each server contact of listed pairs is detected, with start and end within 1 second, and azimuth and elevation matching
+        - contacts of all pairs closer than max range, pruned by spatial hashing, are the ones of every pair with the same max range
+    """
+    with open(os.path.join(TEST_DATA_PATH, 'propagationrequest.json'), 'r') as f:
+        propagationRequest = json.load(f)
+    contacts = getLocalSpaceContacts(propagationRequest, propagationRequest['assets'])
+
+    for satId in ['rsn-A-P01-01', 'rsn-A-P02-03']:
+        contactsDf = pd.DataFrame(contacts[satId])
+        serverContactsDf = pd.read_csv(os.path.join(TEST_DATA_PATH, satId + '_contacts.csv'))
+        serverContactsDf = serverContactsDf[serverContactsDf['contactType'] == 'ISV']
+        assert len(serverContactsDf) > 0 and len(serverContactsDf) <= len(contactsDf) <= len(serverContactsDf) + 1
+        for _, serverContact in serverContactsDf.iterrows():
+            soiContactsDf = contactsDf[contactsDf['argumentOfInterestId'] == serverContact['argumentOfInterestId']]
+            starts = np.array([getTimestampFromDate(utcTime) for utcTime in soiContactsDf['startUtcTime']])
+            contact = soiContactsDf.iloc[np.argmin(np.abs(starts - getTimestampFromDate(serverContact['startUtcTime'])))]
+            for event in ['start', 'end']:
+                assert abs(getTimestampFromDate(contact[event + 'UtcTime']) - getTimestampFromDate(serverContact[event + 'UtcTime'])) < 1000
+                assert abs((contact[event + 'Azimuth'] - serverContact[event + 'Azimuth'] + 180) % 360 - 180) < 0.01
+                assert abs(contact[event + 'Elevation'] - serverContact[event + 'Elevation']) < 0.01
+
+    ephemeris = Ephemeris(propagationRequest['assets'])
+    scenario = propagationRequest['scenario']
+    everyPair = np.array([(i, j) for i in range(len(ephemeris.satIds)) for j in range(i + 1, len(ephemeris.satIds))])
+    hashedContacts = getSpaceContacts(ephemeris, scenario['startTimestamp'], scenario['endTimestamp'], maxRange=3000000.0)
+    pairsContacts = getSpaceContacts(ephemeris, scenario['startTimestamp'], scenario['endTimestamp'], pairs=everyPair, maxRange=3000000.0)
+    assert sum([len(contactsDf) for contactsDf in hashedContacts.values()]) > 0
+    for satId in ephemeris.satIds:
+        assert hashedContacts[satId].equals(pairsContacts[satId])
@@ -0,0 +1,159 @@
+#! /usr/bin/env python3
+
+# Copyright (C)
+# Author: alberto-ferrero
+
+""" Test to cover propagation dataset shared among modules """
+
+import os
+import shutil
+import numpy as np
+import pandas as pd
+import json
+import pytest
+from jsonschema import validate, ValidationError
+from copy import deepcopy
+
+from src.flightdynamics.dataset import PropagationDataset, getPropagationDataset, registerPropagationDataset
+from src.flightdynamics.filemanager import readCsvPropagationDataFiles, readCsvPropagationDataFilesAsDataframe, getPropagationDataRecords, savePropagationData
+from src.flightdynamics.main import extractPropagationDataFromCsv
+from src.flightdynamics.validator import validatePropagationData, PropagationDataValidationError
+from src.flightdynamics.statetensor import getStateTensor, STATE_TENSOR_FILE
+from src.utils.results import AppResult
+from src.utils.timeconverter import getTimestampFromDate, getTimestampsFromDates, getDateFromTimestamp, getDatesFromTimestamps
+
+DATA_PATH = os.path.join('test', 'data', 'test_flightdynamics', '18-satellites')
+
+def test_01_dataset_from_files_and_registered():
+    """
+        Test: get dataset of Flight Dynamics folder, check that:
+        - it is loaded from csv files, with timestamps parsed
+        - dataset built in memory from same data is returned once registered
+    """
+    dataset = getPropagationDataset(DATA_PATH)
+    assert len(dataset.getSatIds()) == 18
+    statesDf = dataset.getOrbitStates('rsn-A-P01-01')
+    assert statesDf['timestamp'].iloc[1] == getTimestampFromDate(statesDf['utcTime'].iloc[1])
+    contactsDf = dataset.getContacts('rsn-A-P01-01', 'POI')
+    assert len(contactsDf) > 0 and set(contactsDf['contactType']) == {'POI'}
+    #Copies returned, not to share changes among modules
+    statesDf['X'] = 0
+    assert dataset.getOrbitStates('rsn-A-P01-01')['X'].iloc[0] != 0
+
+    inMemoryDataset = PropagationDataset()
+    inMemoryDataset.addSatellitesData(readCsvPropagationDataFiles(DATA_PATH))
+    registerPropagationDataset('memory', inMemoryDataset)
+    assert getPropagationDataset('memory') is inMemoryDataset
+    assert inMemoryDataset.getOrbitStates('rsn-A-P01-01')['timestamp'].equals(dataset.getOrbitStates('rsn-A-P01-01')['timestamp'])
+
+@pytest.mark.parametrize('storage', ['parquet', 'feather'])
+def test_02_columnar_storage(tmp_path, storage):
+    """
+        Test: save propagation data as parquet or feather files, check that:
+        - files are read back as the csv ones, for Propagation Data
+        - dataset is loaded with epoch millis timestamps read from files, equal to the parsed ones
+    """
+    pytest.importorskip('pyarrow')
+    propagationData = readCsvPropagationDataFiles(DATA_PATH)
+    outputPath = savePropagationData(str(tmp_path), AppResult(200, {}, deepcopy(propagationData)), storage)
+    assert os.path.isfile(os.path.join(outputPath, 'rsn-A-P01-01_orbit-state.' + storage))
+    assert readCsvPropagationDataFiles(outputPath) == propagationData
+
+    dataset = getPropagationDataset(outputPath)
+    csvDataset = getPropagationDataset(DATA_PATH)
+    for satId in csvDataset.getSatIds():
+        assert dataset.getOrbitStates(satId)['timestamp'].equals(csvDataset.getOrbitStates(satId)['timestamp'])
+        assert dataset.getContacts(satId)['endTimestamp'].tolist() == csvDataset.getContacts(satId)['endTimestamp'].tolist()
+
+def test_03_state_tensor_memory_mapped(tmp_path):
+    """
+        Test: get state tensor of Flight Dynamics folder, check that:
+        - it is persisted in the folder and memory mapped, satellites x common times x 6
+        - states by index are the orbit states ones
+        - it is reused, and built again if orbit states files change
+    """
+    outputPath = str(tmp_path)
+    for fileName in os.listdir(DATA_PATH):
+        shutil.copy(os.path.join(DATA_PATH, fileName), outputPath)
+    stateTensor = getStateTensor(outputPath)
+    assert os.path.isfile(os.path.join(outputPath, STATE_TENSOR_FILE)) and isinstance(stateTensor.states, np.memmap)
+    assert stateTensor.states.shape == (18, len(stateTensor.timestamps), 6) and len(stateTensor.timestamps) >= 289
+    statesDf = getPropagationDataset(outputPath).getOrbitStates('rsn-A-P02-03')
+    state = statesDf[statesDf['timestamp'] == stateTensor.timestamps[10]].iloc[0]
+    timeIndex = stateTensor.getTimeIndex(state['timestamp'])
+    assert np.array_equal(stateTensor.getState('rsn-A-P02-03', timeIndex), state[['X', 'Y', 'Z', 'Vx', 'Vy', 'Vz']].to_numpy(dtype=float))
+    assert stateTensor.utcTimes[timeIndex] == state['utcTime']
+    assert getStateTensor(outputPath) is stateTensor
+
+    filePath = os.path.join(outputPath, 'rsn-A-P01-01_orbit-state.csv')
+    os.utime(filePath, (os.path.getmtime(filePath) + 10, os.path.getmtime(filePath) + 10))
+    assert getStateTensor(outputPath) is not stateTensor
+
+def test_04_propagation_data_read_in_parallel_as_dataframes():
+    """
+        Test: read propagation data repositories, check that:
+        - 288 satellites files are read in parallel as dataframes, as read one by one
+        - propagation data extracted from repository are dataframes, validated, with records as the propagation data api ones
+    """
+    largeDataPath = os.path.join('test', 'data', 'test_flightdynamics', '288-satellites')
+    propagationData = readCsvPropagationDataFilesAsDataframe(largeDataPath, maxParallelReads=4)
+    assert len(propagationData) == 288
+    assert all(isinstance(satData['orbitStateList'], pd.DataFrame) and isinstance(satData['contactList'], pd.DataFrame) for satData in propagationData.values())
+    sequentialData = readCsvPropagationDataFilesAsDataframe(largeDataPath, maxParallelReads=1)
+    for satId in ['rsn-A-P01-01', 'rsn-A-P12-24']:
+        assert propagationData[satId]['orbitStateList'].equals(sequentialData[satId]['orbitStateList'])
+        assert propagationData[satId]['contactList'].equals(sequentialData[satId]['contactList'])
+
+    simulationRequest = {'modules': {'flightDynamics': {'data': 'local', 'address': DATA_PATH, 'properties': {'maxParallelReads': 2}}}}
+    propagationData = extractPropagationDataFromCsv(simulationRequest).result
+    assert isinstance(propagationData['rsn-A-P01-01']['orbitStateList'], pd.DataFrame)
+    assert getPropagationDataRecords(propagationData) == readCsvPropagationDataFiles(DATA_PATH)
+
+def test_05_batch_time_conversion():
+    """
+        Test: convert dates of dataset columns and edge cases all at once, check that:
+        - timestamps are the ones of one by one conversion, with same truncation of second fractions
+        - dates from timestamps are the ones of one by one conversion
+    """
+    dataset = getPropagationDataset(DATA_PATH)
+    dates = dataset.getOrbitStates('rsn-A-P01-01')['utcTime'].tolist() + dataset.getContacts('rsn-A-P01-01')['endUtcTime'].tolist()
+    dates += ['2026-01-01T00:00:00Z', '2026-01-01T00:00:00.1Z', '2026-01-01T00:00:00.12999Z', '2026-01-01T00:00:00.999999999Z', '1969-12-31T23:59:59.0015Z']
+    timestamps = getTimestampsFromDates(dates)
+    assert timestamps.dtype == np.int64
+    assert timestamps.tolist() == [getTimestampFromDate(date) for date in dates]
+    assert getDatesFromTimestamps(timestamps).tolist() == [getDateFromTimestamp(timestamp) for timestamp in timestamps.tolist()]
+    assert len(getTimestampsFromDates([])) == 0
+
+def test_06_columnar_validation_as_schema():
+    """
+        Test: validate propagation data by columns, check that:
+        - valid data, all satellites or a sample of them, are validated
+        - not valid data raise with the message of the schema validation of records
+        - orbit states not in time order are not valid
+    """
+    propagationData = readCsvPropagationDataFilesAsDataframe(DATA_PATH)
+    validatePropagationData(propagationData)
+    validatePropagationData(propagationData, sample=0.1)
+    with open(os.path.join('api', 'propagationdata-schema.json'), 'r') as f:
+        schema = json.load(f)
+
+    statesDf = propagationData['rsn-A-P01-02']['orbitStateList']
+    contactsDf = propagationData['rsn-A-P01-02']['contactList']
+    for entry, df in [('orbitStateList', statesDf.assign(q0=statesDf['q0'].mask(statesDf.index == 5, -2.5))),
+                      ('orbitStateList', statesDf.assign(mass=statesDf['mass'].mask(statesDf.index == 7, np.nan))),
+                      ('orbitStateList', statesDf.assign(frame=statesDf['frame'].mask(statesDf.index == 3, 'ITRF'))),
+                      ('contactList', contactsDf.assign(durationInMillis=contactsDf['durationInMillis'].astype(float).mask(contactsDf.index == 1, 1.5))),
+                      ('contactList', contactsDf.assign(foo=1))]:
+        notValidData = {'rsn-A-P01-02': dict(propagationData['rsn-A-P01-02'], **{entry: df})}
+        with pytest.raises(ValidationError) as schemaError:
+            validate(instance=getPropagationDataRecords(notValidData), schema=schema)
+        with pytest.raises(PropagationDataValidationError) as columnarError:
+            validatePropagationData(notValidData)
+        assert columnarError.value.message == schemaError.value.message
+
+    #Contact types not restricted, as in schema
+    validatePropagationData({'rsn-A-P01-02': dict(propagationData['rsn-A-P01-02'], contactList=contactsDf.assign(contactType='AOI'))})
+
+    notValidData = {'rsn-A-P01-02': dict(propagationData['rsn-A-P01-02'], orbitStateList=statesDf.iloc[[1, 0, 2]].reset_index(drop=True))}
+    with pytest.raises(PropagationDataValidationError):
+        validatePropagationData(notValidData)
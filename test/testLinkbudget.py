@@ -3,4 +3,174 @@
 # Copyright (C)
 # Author: alberto-ferrero
 
-# -*- coding: utf-8 -*-
\ No newline at end of file
+""" Test to cover Air and Space Link Budget requests """
+
+import os
+import json
+import shutil
+import numpy as np
+import pandas as pd
+
+from src.flightdynamics.dataset import getPropagationDataset
+from src.airlink.main import getAirLinkBudgetData
+from src.spacelink import main as spacelinkmain
+from src.spacelink.main import getSpaceLinkBudgetData
+from src.airlink.request import getAirLinkRequest
+from src.spacelink.request import getSpaceLinkRequest
+from src.utils.manifest import setItemsCompleted
+
+DATA_PATH = os.path.join('test', 'data', 'test_flightdynamics', '18-satellites')
+AL_URL = "http://localhost:8082/air-link-budget/api/v1/air-link-data"
+
+def getSimulationRequest(properties: dict) -> dict:
+    return {
+        'id': 'test-airlink',
+        'simulationWindow': {'start': '2026-01-01T00:00:00.00Z', 'end': '2026-01-02T00:00:00.00Z'},
+        'modules': {'airLinkBudget': {'data': 'run', 'address': AL_URL, 'properties': properties}},
+        'satellites': {'file': 'rsn-018-constellation.yml'},
+        'groundstations': {'file': 'groundstations-sband.yml'},
+        'userterminals': []
+    }
+
+def getAirLinkResponse(request, context) -> dict:
+    """ Link data of each state, for single ground point requests, or for batches, with ground points in reverse order """
+    airLinkRequest = request.json()
+    satId = airLinkRequest['satellite']['id']
+    grounds = airLinkRequest['grounds'][::-1] if 'grounds' in airLinkRequest else [dict(airLinkRequest['ground'], states=airLinkRequest['satellite']['states'])]
+    return {satId: [{'grId': ground['id'], 'utcTime': state['utcTime'], 'uCNR': state['X'] / 1e6, 'dCNR': state['Y'] / 1e6}
+                    for ground in grounds for state in ground['states']]}
+
+def test_01_contact_states_from_state_index():
+    """
+        Test: get states in contacts windows of satellites from their state index, check that:
+        - states of each ground point are the ones inside any of its contacts, start and end included
+        - ground points with no contacts get no request
+        - space link states have distances of deputy satellites with a state at the same time
+    """
+    dataset = getPropagationDataset(DATA_PATH)
+    satId = 'rsn-A-P01-01'
+    statesDf = dataset.getOrbitStates(satId)
+    contactsDf = dataset.getContacts(satId)
+    contactStates = dataset.getStateIndex(satId).getStatesByArgument(contactsDf)
+    for gsId in ['gs-ksat-svalbard', 'gs-ssc-inuvik']:
+        gsContactsDf = contactsDf[contactsDf['argumentOfInterestId'] == gsId]
+        inside = np.zeros(len(statesDf), dtype=bool)
+        for start, end in zip(gsContactsDf['startTimestamp'], gsContactsDf['endTimestamp']):
+            inside |= (statesDf['timestamp'] >= start).to_numpy() & (statesDf['timestamp'] <= end).to_numpy()
+        airLinkRequest = getAirLinkRequest(satId, {}, contactStates.get(gsId), gsId, {}, {})
+        assert inside.sum() > 0
+        assert [state['utcTime'] for state in airLinkRequest['satellite']['states']] == statesDf['utcTime'][inside].tolist()
+    assert getAirLinkRequest(satId, {}, contactStates.get('gs-none'), 'gs-none', {}, {}) == {}
+
+    stateIndexes = {satId: dataset.getStateIndex(satId) for satId in dataset.getSatIds()}
+    spaceLinkRequest = getSpaceLinkRequest(satId, stateIndexes, dataset.getContacts(satId, 'ISV'))
+    state = spaceLinkRequest['satellite']['states'][10]
+    assert len(state['distances']) > 0
+    for soiId, distance in state['distances'].items():
+        deputyStatesDf = dataset.getOrbitStates(soiId)
+        deputyState = deputyStatesDf[deputyStatesDf['timestamp'] == state['timestamp']].iloc[0]
+        assert abs(distance - np.linalg.norm(np.array([state['X'] - deputyState['X'], state['Y'] - deputyState['Y'], state['Z'] - deputyState['Z']]))) < 1e-6
+
+def test_02_air_link_requests_batched_by_satellite(tmp_path, requests_mock):
+    """
+        Test: calculate air link data of ground stations, for each couple and in batches of ground points of a satellite, check that:
+        - batches have up to max ground points, with fewer requests than couples
+        - link data of batches are split back by ground point, as the ones of each couple
+        - all requests of a satellite are journaled
+    """
+    requests_mock.post(AL_URL, json=getAirLinkResponse)
+    outputPath = getAirLinkBudgetData(getSimulationRequest({}), str(tmp_path / 'couples'), DATA_PATH)
+    nCouples = len(requests_mock.request_history)
+    batchOutputPath = getAirLinkBudgetData(getSimulationRequest({'maxGroundsPerRequest': 3}), str(tmp_path / 'batches'), DATA_PATH)
+    batchRequests = [request.json() for request in requests_mock.request_history[nCouples:]]
+    assert all(0 < len(batchRequest['grounds']) <= 3 for batchRequest in batchRequests)
+    assert sum([len(batchRequest['grounds']) for batchRequest in batchRequests]) == nCouples and len(batchRequests) < nCouples / 2
+
+    for satId in ['rsn-A-P01-01', 'rsn-A-P02-03']:
+        linkDataDf = pd.read_csv(os.path.join(outputPath, satId + '_Air-Link-Data.csv'))
+        assert len(linkDataDf) > 0
+        assert linkDataDf.equals(pd.read_csv(os.path.join(batchOutputPath, satId + '_Air-Link-Data.csv')))
+    with open(os.path.join(outputPath, 'linkrequest.json'), 'r') as f:
+        linkRequestFull = json.load(f)
+    assert sum([len(satRequests) for satRequests in linkRequestFull.values()]) == nCouples
+    linkDataDf = pd.read_csv(os.path.join(outputPath, 'rsn-A-P01-01_Air-Link-Data.csv'))
+    assert set([request['ground']['id'] for request in linkRequestFull['rsn-A-P01-01']]) == set(linkDataDf['grId'])
+
+def test_03_builtin_air_link_budget(tmp_path):
+    """
+        Test: calculate air link data of ground stations with builtin engine, check that:
+        - there are link data for all states in contacts of each ground station
+        - slant ranges, from downlink CNR and link budget of antennas, are within contacts distances
+        - difference of uplink and downlink CNR does not depend on range
+    """
+    simulationRequest = getSimulationRequest({})
+    simulationRequest['modules']['airLinkBudget'] = {'data': 'builtin', 'properties': {}}
+    outputPath = getAirLinkBudgetData(simulationRequest, str(tmp_path), DATA_PATH)
+    dataset = getPropagationDataset(DATA_PATH)
+    satId = 'rsn-A-P01-01'
+    linkDataDf = pd.read_csv(os.path.join(outputPath, satId + '_Air-Link-Data.csv'))
+    contactsDf = dataset.getContacts(satId)
+    contactStates = dataset.getStateIndex(satId).getStatesByArgument(contactsDf)
+    gsIds = set(contactsDf[contactsDf['contactType'] == 'POI']['argumentOfInterestId'])
+    assert len(gsIds) > 0 and set(linkDataDf['grId']) == gsIds
+    for gsId in gsIds:
+        gsContactsDf = contactsDf[contactsDf['argumentOfInterestId'] == gsId]
+        gsLinkDataDf = linkDataDf[linkDataDf['grId'] == gsId]
+        assert gsLinkDataDf['utcTime'].tolist() == contactStates[gsId]['utcTime'].tolist()
+        #Downlink: satellite S band 20 W, 0.24 m, ground station 3.159 m, 2 GHz, 8 GHz bandwidth, 150 K, 60% efficiency
+        wavelength = 299792458.0 / 2e9
+        gains = sum([10 * np.log10(0.6 * (np.pi * size / wavelength) ** 2) for size in [0.240, 3.159]])
+        distances = wavelength / (4 * np.pi) * 10 ** ((10 * np.log10(20) + gains - 10 * np.log10(150) + 228.6 - 10 * np.log10(8e9) - gsLinkDataDf['dCNR']) / 20)
+        assert distances.min() > gsContactsDf['maxElevationDistance'].min() * 0.99
+        assert distances.max() < max(gsContactsDf['startDistance'].max(), gsContactsDf['endDistance'].max()) * 1.01
+        assert np.ptp(gsLinkDataDf['uCNR'] - gsLinkDataDf['dCNR']) < 1e-9
+
+def test_04_air_link_resumed_from_satellites_journals(tmp_path, requests_mock):
+    """
+        Test: calculate air link data, then again in the same output folder, as resuming a run, check that:
+        - requests of each satellite are journaled in their own file
+        - no requests are sent again for completed satellites, with the same final journal
+    """
+    requests_mock.post(AL_URL, json=getAirLinkResponse)
+    outputPath = getAirLinkBudgetData(getSimulationRequest({'maxGroundsPerRequest': 3}), str(tmp_path), DATA_PATH)
+    nRequests = len(requests_mock.request_history)
+    with open(os.path.join(outputPath, 'linkrequest.json'), 'r') as f:
+        linkRequestFull = json.load(f)
+    for satId, satRequests in linkRequestFull.items():
+        with open(os.path.join(outputPath, 'linkrequest-{}.json'.format(satId)), 'r') as f:
+            assert json.load(f) == satRequests
+
+    getAirLinkBudgetData(getSimulationRequest({'maxGroundsPerRequest': 3}), str(tmp_path), DATA_PATH)
+    assert len(requests_mock.request_history) == nRequests
+    with open(os.path.join(outputPath, 'linkrequest.json'), 'r') as f:
+        assert json.load(f) == linkRequestFull
+
+def test_05_space_link_requests_journaled_by_satellite(tmp_path, monkeypatch):
+    """
+        Test: calculate space link data, check that:
+        - requests of each satellite are journaled in their own file, merged in the final journal
+        - resuming a run stopped half way, only remaining satellites are calculated, with the same final journal
+    """
+    simulationRequest = getSimulationRequest({})
+    simulationRequest['modules'] = {'spaceLinkBudget': {'data': 'run', 'address': 'http://localhost'}}
+    outputPath = getSpaceLinkBudgetData(simulationRequest, str(tmp_path), DATA_PATH)
+    with open(os.path.join(outputPath, 'linkrequest.json'), 'r') as f:
+        linkRequestFull = json.load(f)
+    assert len(linkRequestFull) == 18
+    for satId, satRequest in linkRequestFull.items():
+        with open(os.path.join(outputPath, 'linkrequest-{}.json'.format(satId)), 'r') as f:
+            assert json.load(f) == satRequest
+
+    resumedPath = tmp_path / 'resumed'
+    satIds = sorted(linkRequestFull.keys())[:9]
+    os.makedirs(resumedPath / 'spacelink')
+    for satId in satIds:
+        shutil.copy(os.path.join(outputPath, 'linkrequest-{}.json'.format(satId)), resumedPath / 'spacelink')
+    setItemsCompleted(str(resumedPath), 'spaceLinkBudget', satIds)
+    calls = []
+    spacelink = spacelinkmain.spacelink
+    monkeypatch.setattr(spacelinkmain, 'spacelink', lambda url, request: calls.append(request['satellite']['id']) or spacelink(url, request))
+    resumedOutputPath = getSpaceLinkBudgetData(simulationRequest, str(resumedPath), DATA_PATH)
+    assert len(calls) == 9 and not set(calls) & set(satIds)
+    with open(os.path.join(resumedOutputPath, 'linkrequest.json'), 'r') as f:
+        assert json.load(f) == linkRequestFull
@@ -0,0 +1,147 @@
+#! /usr/bin/env python3
+
+# Copyright (C)
+# Author: alberto-ferrero
+
+""" Test to cover pre processor assets catalogs """
+
+import os
+import glob
+import json
+import shutil
+import numpy as np
+import pandas as pd
+import pytest
+
+from jsonschema import validate
+
+from src.orchestrator.preprocessor import preprocessor
+from src.utils.filemanager import readInputYmlFile
+from src.orchestrator.preprocessor.utcells import getUserTerminalsCells, getUserTerminalsWeights
+from src.orchestrator.postprocessor.analysis.links import getLinksStatistics
+from src.orchestrator.preprocessor.preprocessor import getCatalog, loadSatellites, readSatellites, readUserTerminals, loadUserTerminals, validateSimulationRequest
+
+SATELLITES_PATH = os.path.join('data', 'satellites', 'rsn-018-constellation.yml')
+
+def test_01_catalogs_loaded_once_per_file_version(tmp_path):
+    """
+        Test: get satellites catalog of a file, check that:
+        - it is loaded and validated only the first time
+        - it is loaded again once the file changes
+        - copies are returned to requests, not to share changes
+    """
+    filePath = str(tmp_path / 'satellites.yml')
+    shutil.copy(SATELLITES_PATH, filePath)
+    loads = []
+    def loader(path: str) -> list:
+        loads.append(path)
+        return loadSatellites(path)
+    satellites = getCatalog(filePath, loader)
+    assert len(satellites) == 18 and getCatalog(filePath, loader) is satellites and len(loads) == 1
+
+    with open(filePath, 'r') as f:
+        content = f.read()
+    with open(filePath, 'w') as f:
+        f.write(content.replace('rsn-A-P01-01', 'rsn-X-P01-01'))
+    os.utime(filePath, (os.path.getmtime(filePath) + 10, os.path.getmtime(filePath) + 10))
+    satellites = getCatalog(filePath, loader)
+    assert len(loads) == 2 and satellites[0]['id'] == 'rsn-X-P01-01'
+
+    simulationRequest = {'satellites': {'file': 'rsn-018-constellation.yml'}}
+    satellites = readSatellites(simulationRequest)
+    satellites[0]['id'] = 'changed'
+    assert readSatellites(simulationRequest)[0]['id'] != 'changed'
+
+def test_02_user_terminals_cells():
+    """
+        Test: read all user terminals of a file, aggregated in cells, check that:
+        - there are fewer cells than user terminals, each user terminal member of one cell
+        - cells weights are their number of members, all of the cell class
+        - cells are at one of their members location, members within cell size
+    """
+    cellSize = 500
+    userTerminals = readUserTerminals({'userterminals': [{'file': '04R_Corpo_ MPL.txt', 'usage': 1.0}]}, all=True)
+    cells = readUserTerminals({'userterminals': [{'file': '04R_Corpo_ MPL.txt', 'usage': 1.0, 'cellSize': cellSize}]}, all=True)
+    userTerminalsById = {ut['id']: ut for ut in userTerminals}
+    assert 0 < len(cells) < len(userTerminals) / 10
+    assert sorted([member for cell in cells for member in cell['members']]) == sorted(userTerminalsById.keys())
+    for cell in cells:
+        assert cell['weight'] == len(cell['members'])
+        assert all(userTerminalsById[member]['class'] == cell['class'] for member in cell['members'])
+        assert cell['location'] in [userTerminalsById[member]['location'] for member in cell['members']]
+        for member in cell['members']:
+            location = userTerminalsById[member]['location']
+            #Members in the same latitude band, as high as cell size
+            assert abs(location['latitude'] - cell['location']['latitude']) < np.degrees(cellSize / 6371.0)
+
+def test_03_user_terminals_sampled_once_per_run():
+    """
+        Test: read user terminals of a file, sampled, check that:
+        - all calls get the same user terminals, as copies
+        - smaller samples are part of larger ones
+        - catalog from binary copy is the same as from file
+        - only the most recently used samples are kept
+    """
+    simulationRequest = {'userterminals': [{'file': '01R_Gov_Defense.txt', 'usage': 0.6}]}
+    userTerminals = readUserTerminals(simulationRequest)
+    assert len(userTerminals) == int(0.6 * 1162) and readUserTerminals(simulationRequest) == userTerminals
+    userTerminals[0]['id'] = 'changed'
+    assert readUserTerminals(simulationRequest)[0]['id'] != 'changed'
+    userTerminals = readUserTerminals(simulationRequest)
+    smallerUserTerminals = readUserTerminals({'userterminals': [{'file': '01R_Gov_Defense.txt', 'usage': 0.2}]})
+    assert set([ut['id'] for ut in smallerUserTerminals]) < set([ut['id'] for ut in userTerminals])
+
+    filePath = os.path.join('data', 'userterminals', '01R_Gov_Defense.txt')
+    catalog = loadUserTerminals(filePath)
+    cachedCatalog = loadUserTerminals(filePath)
+    for column in ['utIndex', 'latitude', 'longitude', 'maxDownlink']:
+        assert np.array_equal(catalog[column], cachedCatalog[column])
+
+    for seed in range(preprocessor.MAX_USER_TERMINALS_SAMPLES + 4):
+        readUserTerminals({'userterminals': [{'file': '01R_Gov_Defense.txt', 'usage': 0.6, 'seed': seed}]})
+    assert len(preprocessor.userTerminalsSamples) == preprocessor.MAX_USER_TERMINALS_SAMPLES
+
+def test_04_user_terminals_options_validated():
+    """
+        Test: validate Simulation Requests with user terminals options, check that seed and cell size are accepted, misspelled options rejected
+    """
+    simulationRequest = {
+        'id': 'test-userterminals',
+        'simulationWindow': {'start': '2026-01-01T00:00:00.00Z', 'end': '2026-01-02T00:00:00.00Z'},
+        'modules': {'flightDynamics': {'data': 'local', 'address': 'test'}},
+        'analysis': [],
+        'satellites': {'file': 'rsn-018-constellation.yml'},
+        'userterminals': [{'file': '01R_Gov_Defense.txt', 'usage': 0.6, 'seed': 3, 'cellSize': 100}]
+    }
+    validateSimulationRequest(simulationRequest)
+    simulationRequest['userterminals'][0] = {'file': '01R_Gov_Defense.txt', 'usage': 0.6, 'sead': 3}
+    with pytest.raises(Exception, match='sead'):
+        validateSimulationRequest(simulationRequest)
+
+    #Examples and input files with user terminals entries of the same shape
+    with open(os.path.join('api', 'simulationrequest-schema.json'), 'r') as f:
+        userTerminalsSchema = json.load(f)['properties']['userterminals']
+    for filePath in [os.path.join('api', 'examples', 'simulation-request-config.yaml')] + glob.glob(os.path.join('input', '*.yml')):
+        validate(instance=readInputYmlFile(filePath).get('userterminals', []), schema=userTerminalsSchema)
+
+def test_05_user_terminals_cell_statistics_preserved():
+    """
+        Test: aggregate co-located user terminals in a cell, check that the cell, of their number as weight, gets the same links statistics
+        as the user terminals, also along with a single user terminal
+    """
+    k = 5
+    userTerminals = [{'id': 'ut-01R{}'.format(i), 'location': {'latitude': 45.0, 'longitude': 9.0, 'altitude': 0}, 'class': 'small'} for i in range(k)]
+    other = {'id': 'ut-02R1', 'location': {'latitude': -30.0, 'longitude': 120.0, 'altitude': 0}, 'class': 'small'}
+    cells = getUserTerminalsCells(userTerminals, 100, 'ut-01R') + [other]
+    assert len(cells) == 2 and cells[0]['weight'] == k
+    assert sum(getUserTerminalsWeights(cells).values()) == k + 1
+
+    def getLinksDf(grId: str, cnr: float) -> pd.DataFrame:
+        return pd.DataFrame({'grId': [grId] * 3, 'utcTime': ['t0', 't1', 't2'], 'uCNR': [cnr, cnr + 1, cnr + 2], 'dCNR': [cnr - 1, cnr, cnr + 1]})
+    utsDf = {ut['id']: getLinksDf(ut['id'], 10.0) for ut in userTerminals}
+    utsDf[other['id']] = getLinksDf(other['id'], 20.0)
+    cellsDf = {cells[0]['id']: getLinksDf(cells[0]['id'], 10.0), other['id']: getLinksDf(other['id'], 20.0)}
+    statistics = getLinksStatistics(utsDf, getUserTerminalsWeights(userTerminals + [other]))
+    cellsStatistics = getLinksStatistics(cellsDf, getUserTerminalsWeights(cells))
+    assert statistics['grounds'] == cellsStatistics['grounds'] == k + 1 and statistics['links'] == cellsStatistics['links']
+    assert np.isclose(statistics['uCNR'], cellsStatistics['uCNR']) and np.isclose(statistics['dCNR'], cellsStatistics['dCNR'])
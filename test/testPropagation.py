@@ -0,0 +1,131 @@
+#! /usr/bin/env python3
+
+# Copyright (C)
+# Author: alberto-ferrero
+
+""" Test to cover Flight Dynamics batched propagation """
+
+import os
+import json
+import pandas as pd
+
+from src.flightdynamics.main import getFlightDynamicsPropagationData, getPropagationBatchSize
+from src.flightdynamics.planner import getPropagationBatches, getBatchPropagationRequest
+from src.flightdynamics.shards import getPropagationShards, getShardPropagationRequest, getShardPropagationData, mergeShardsPropagationData
+from src.flightdynamics.propagator import propagateBuiltin
+from src.flightdynamics.contacts import getLocalGroundContacts, getLocalSpaceContacts
+from src.utils.timeconverter import getTimestampFromDate
+from src.utils.manifest import setItemsCompleted
+
+FD_URL = "http://localhost:8081/flight-dynamics/api/v1/propagation-data"
+
+def getSimulationRequest(properties: dict) -> dict:
+    return {
+        'id': 'test-propagation',
+        'simulationWindow': {'start': '2026-01-01T00:00:00.00Z', 'end': '2026-01-02T00:00:00.00Z'},
+        'modules': {
+            'flightDynamics': {'data': 'run', 'address': FD_URL, 'properties': {'propagator': 'KEPLERIAN', **properties}}
+        },
+        'analysis': [],
+        'satellites': {'file': 'rsn-018-constellation.yml', 'groundcontacts': False, 'spacecontacts': False}
+    }
+
+def getPropagationResponse(request, context) -> dict:
+    return {sat['id']: {'orbitStateList': [{'utcTime': '2026-01-01T00:00:00Z', 'X': 7000000.0, 'Y': 0.0, 'Z': 0.0}], 'contactList': []}
+            for sat in request.json()['assets'] if sat.get('propagate', True)}
+
+def test_01_batch_size_from_scenario():
+    """
+        Test: get batch size, check that it decreases with points of interest, and that parallel requests are used
+    """
+    propagationRequest = {
+        'scenario': {'startTimestamp': 0, 'endTimestamp': 86400000, 'periodicUpdate': 500000},
+        'pointsOfInterest': [{}] * 13
+    }
+    assert getPropagationBatchSize(propagationRequest, 288, {}) == 50
+    assert getPropagationBatchSize(propagationRequest, 288, {'maxBatchSize': 20}) == 20
+    assert getPropagationBatchSize(propagationRequest, 18, {'maxParallelRequests': 4}) == 5
+    propagationRequest['pointsOfInterest'] = [{}] * 704
+    assert getPropagationBatchSize(propagationRequest, 288, {}) < 30
+    #No periodic orbit states, only contacts
+    propagationRequest['scenario']['periodicUpdate'] = 0
+    assert getPropagationBatchSize(propagationRequest, 288, {}) > 1
+    assert len(getPropagationShards(propagationRequest['scenario'], 6 * 3600000)) == 4
+
+def test_02_batches_propagated_and_resumed(tmp_path, requests_mock):
+    """
+        Test: propagate in batches, check that:
+        - each satellite is propagated once, in batches up to max size
+        - satellites propagated in run being resumed are not propagated again
+    """
+    requests_mock.post(FD_URL, json=getPropagationResponse)
+    outputDataFolderPath = str(tmp_path)
+    setItemsCompleted(outputDataFolderPath, 'flightDynamics', ['rsn-A-P01-01', 'rsn-A-P01-02'])
+    outputPath = getFlightDynamicsPropagationData(getSimulationRequest({'maxBatchSize': 4, 'maxParallelRequests': 2}), outputDataFolderPath)
+
+    propagatedSatIds = [sat['id'] for request in requests_mock.request_history for sat in request.json()['assets']]
+    assert all(len(request.json()['assets']) <= 4 for request in requests_mock.request_history)
+    assert len(propagatedSatIds) == 16 and len(set(propagatedSatIds)) == 16
+    assert 'rsn-A-P01-01' not in propagatedSatIds
+    assert os.path.isfile(os.path.join(outputPath, 'rsn-A-P01-03_orbit-state.csv'))
+
+def test_03_batches_keep_space_contacts_together():
+    """
+        Test: plan batches of a mesh of 12 planes of 24 satellites, each in contact with its 4 neighbours, check that:
+        - each satellite is in one batch, batches up to max size
+        - fewer non propagating satellites are added than cutting batches by index
+    """
+    assets = []
+    for p in range(12):
+        for s in range(24):
+            spaceContacts = ['s{}-{}'.format(p, (s + 1) % 24), 's{}-{}'.format(p, (s - 1) % 24), 's{}-{}'.format((p + 1) % 12, s), 's{}-{}'.format((p - 1) % 12, s)]
+            assets.append({'id': 's{}-{}'.format(p, s), 'orbit': {'rightAscensionAscendingNode': p * 15.0, 'meanAnomaly': s * 15.0}, 'spaceContacts': spaceContacts})
+    assetsIndex = {sat['id']: sat for sat in assets}
+    propagationRequest = {'scenario': {}, 'pointsOfInterest': []}
+
+    batches = getPropagationBatches(assets, 20)
+    assert sorted([sat['id'] for batch in batches for sat in batch]) == sorted(assetsIndex.keys())
+    assert max([len(batch) for batch in batches]) == 20 and len(batches) == 15
+
+    def countNonPropagating(batches: list) -> int:
+        return sum([len(getBatchPropagationRequest(propagationRequest, batch, assetsIndex)['assets']) - len(batch) for batch in batches])
+    assert countNonPropagating(batches) < 0.5 * countNonPropagating([assets[i:i + 20] for i in range(0, len(assets), 20)])
+
+def test_04_time_shards_merged():
+    """
+        Test: propagate stored server Propagation Request with builtin propagator and contacts engines, whole window and in time shards, check that:
+        - shards are on the periodic update grid, covering the window
+        - merged orbit states are the whole window ones, with boundary states once
+        - merged contacts are the whole window ones, contacts crossing shard boundaries stitched back
+          (times within few milliseconds, Earth precession being evaluated at the middle of each window)
+    """
+    with open(os.path.join('test', 'data', 'test_flightdynamics', '18-satellites', 'propagationrequest.json'), 'r') as f:
+        propagationRequest = json.load(f)
+    propagationRequest['pointsOfInterest'] = [poi for poi in propagationRequest['pointsOfInterest'] if poi['id'].startswith('gs-')]
+    scenario = propagationRequest['scenario']
+    shards = getPropagationShards(scenario, 6 * 3600000 + 100000)
+    assert len(shards) == 4 and shards[0][0] == scenario['startTimestamp'] and shards[-1][1] == scenario['endTimestamp']
+    assert all((shard[0] - scenario['startTimestamp']) % scenario['periodicUpdate'] == 0 for shard in shards)
+
+    def getPropagationData(propagationRequest: dict) -> dict:
+        propagationData = propagateBuiltin(propagationRequest)
+        groundContacts = getLocalGroundContacts(propagationRequest, propagationRequest['assets'])
+        spaceContacts = getLocalSpaceContacts(propagationRequest, propagationRequest['assets'])
+        for satId, satData in propagationData.items():
+            satData['contactList'] = groundContacts[satId] + spaceContacts[satId]
+        return propagationData
+
+    propagationData = getPropagationData(propagationRequest)
+    shardsData = [getShardPropagationData(getPropagationData(getShardPropagationRequest(propagationRequest, shard))) for shard in shards]
+    mergedData = mergeShardsPropagationData(shardsData, shards)
+    for satId, satData in propagationData.items():
+        assert mergedData[satId]['orbitStateList'].equals(satData['orbitStateList'])
+        contactsDf = pd.DataFrame(satData['contactList']).sort_values(['argumentOfInterestId', 'startUtcTime']).reset_index(drop=True)
+        mergedContactsDf = pd.DataFrame(mergedData[satId]['contactList']).sort_values(['argumentOfInterestId', 'startUtcTime']).reset_index(drop=True)
+        assert (mergedContactsDf['contactType'] == 'ISV').any()
+        for column in ['argumentOfInterestId', 'contactType']:
+            assert mergedContactsDf[column].equals(contactsDf[column])
+        for column in ['startUtcTime', 'endUtcTime']:
+            assert (mergedContactsDf[column].apply(getTimestampFromDate) - contactsDf[column].apply(getTimestampFromDate)).abs().max() <= 10
+        assert (mergedContactsDf['durationInMillis'] - contactsDf['durationInMillis']).abs().max() <= 20
+        assert ((mergedContactsDf['maxElevationElevation'] - contactsDf['maxElevationElevation']).abs().fillna(0) < 0.01).all()
@@ -0,0 +1,75 @@
+#! /usr/bin/env python3
+
+# Copyright (C)
+# Author: alberto-ferrero
+
+""" Test to cover Flight Dynamics builtin propagator """
+
+import os
+import json
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.flightdynamics.propagator import propagateBuiltin, propagateKeplerian, getKeplerianFromCartesian, getScenarioTimestamps
+from src.orchestrator.preprocessor.preprocessor import validateSimulationRequest
+
+TEST_DATA_PATH = os.path.join('test', 'data', 'test_flightdynamics', '18-satellites')
+
+def test_01_keplerian_propagation_matches_server():
+    """
+        Test: propagate Propagation Request of stored server data, check that:
+        - orbit states have the server columns, every periodic update, end included
+        - positions at the same times match the server Keplerian propagation
+        - attitude matches, up to quaternion sign
+    """
+    with open(os.path.join(TEST_DATA_PATH, 'propagationrequest.json'), 'r') as f:
+        propagationRequest = json.load(f)
+    propagationData = propagateBuiltin(propagationRequest)
+    assert sorted(propagationData.keys()) == sorted([sat['id'] for sat in propagationRequest['assets']])
+
+    statesDf = propagationData['rsn-A-P01-01']['orbitStateList']
+    serverStatesDf = pd.read_csv(os.path.join(TEST_DATA_PATH, 'rsn-A-P01-01_orbit-state.csv'))
+    assert list(statesDf.columns) == list(serverStatesDf.columns)
+    assert len(statesDf) == 289 and statesDf['utcTime'].iloc[-1] == '2026-01-02T00:00:00Z'
+    mergedDf = serverStatesDf.merge(statesDf, on='utcTime', suffixes=('Server', ''))
+    assert len(mergedDf) == 289
+    for column in ['X', 'Y', 'Z']:
+        assert np.max(np.abs(mergedDf[column] - mergedDf[column + 'Server'])) < 1.0
+    dot = sum([mergedDf['q{}'.format(k)] * mergedDf['q{}Server'.format(k)] for k in range(4)])
+    assert np.allclose(np.abs(dot), 1.0)
+
+def test_02_cartesian_and_j2():
+    """
+        Test: convert Cartesian state to Keplerian elements and propagate, check that:
+        - state at epoch is the Cartesian one
+        - with J2, node of a prograde orbit regresses
+    """
+    position, velocity = np.array([7000000.0, 100000.0, -300000.0]), np.array([100.0, 7000.0, 2500.0])
+    elements = {key: np.array([[value]]) for key, value in zip(['a', 'e', 'i', 'raan', 'argp', 'M'], getKeplerianFromCartesian(position, velocity))}
+    elements['epoch'] = np.array([[0]], dtype=np.int64)
+    positions, velocities = propagateKeplerian(elements, np.array([0, 86400000], dtype=np.int64))
+    assert np.allclose(positions[0, 0], position, atol=1e-3) and np.allclose(velocities[0, 0], velocity, atol=1e-6)
+
+    positions, velocities = propagateKeplerian(elements, np.array([0, 86400000], dtype=np.int64), j2=True)
+    h = np.cross(positions[0, 1], velocities[0, 1])
+    raan = np.arctan2(h[0], -h[1])
+    assert -0.2 < raan - elements['raan'][0, 0] < -0.01
+
+def test_03_periodic_update_required_positive():
+    """
+        Test: check that builtin propagation rejects a periodic update not positive, in the Simulation Request and in the scenario
+    """
+    simulationRequest = {
+        'id': 'test-builtin',
+        'simulationWindow': {'start': '2026-01-01T00:00:00.00Z', 'end': '2026-01-02T00:00:00.00Z'},
+        'modules': {'flightDynamics': {'data': 'builtin', 'properties': {'propagator': 'KEPLERIAN', 'periodicUpdate': 60000}}},
+        'analysis': [],
+        'satellites': {'file': 'rsn-018-constellation.yml'}
+    }
+    validateSimulationRequest(simulationRequest)
+    simulationRequest['modules']['flightDynamics']['properties']['periodicUpdate'] = 0
+    with pytest.raises(Exception):
+        validateSimulationRequest(simulationRequest)
+    with pytest.raises(Exception, match='positive periodic update'):
+        getScenarioTimestamps({'startTimestamp': 0, 'endTimestamp': 86400000, 'periodicUpdate': 0})
@@ -0,0 +1,73 @@
+#! /usr/bin/env python3
+
+# Copyright (C)
+# Author: alberto-ferrero
+
+""" Test to cover Orchestrator modules scheduler """
+
+import time
+import pytest
+
+from src.orchestrator.scheduler import runModules, getCriticalPath, checkModulesDependencies
+from src.utils.manifest import setStageCompleted, isStageCompleted
+
+def getModuleHandlers(calls: list, delay: float = 0.2) -> dict:
+    def getHandler(tag: str):
+        def handler(simulationRequest: dict, outputDataFolderPath: str, *inputs):
+            calls.append((tag, inputs))
+            time.sleep(delay)
+            return tag + '-output'
+        return handler
+    return {
+        'flightDynamics': {'name': 'Flight Dynamics', 'handler': getHandler('flightDynamics'), 'inputs': []},
+        'regulatoryMap': {'name': 'Regulatory', 'handler': getHandler('regulatoryMap'), 'inputs': []},
+        'airLinkBudget': {'name': 'Air Link Budget', 'handler': getHandler('airLinkBudget'), 'inputs': ['flightDynamics']},
+        'spaceLinkBudget': {'name': 'Space Link Budget', 'handler': getHandler('spaceLinkBudget'), 'inputs': ['flightDynamics']}
+    }
+
+def test_01_independent_modules_run_concurrently(tmp_path):
+    """
+        Test: run modules, check that:
+        - inputs are passed from upstream modules
+        - link budgets overlap, taking about two module durations in total
+    """
+    calls = []
+    simulationRequest = {'modules': {tag: {'data': 'run'} for tag in ('flightDynamics', 'regulatoryMap', 'airLinkBudget', 'spaceLinkBudget')}}
+    tick = time.time()
+    outputPaths = runModules(simulationRequest, str(tmp_path), getModuleHandlers(calls))
+    assert time.time() - tick < 0.6
+    assert outputPaths['airLinkBudget'] == 'airLinkBudget-output'
+    assert ('airLinkBudget', ('flightDynamics-output',)) in calls
+    assert [tag for tag, _ in calls].index('flightDynamics') < [tag for tag, _ in calls].index('spaceLinkBudget')
+
+def test_02_not_requested_input_passed_as_none(tmp_path):
+    """
+        Test: run air link without flight dynamics, check that the handler receives None as input
+    """
+    calls = []
+    outputPaths = runModules({'modules': {'airLinkBudget': {'data': 'run'}}}, str(tmp_path), getModuleHandlers(calls, 0))
+    assert calls == [('airLinkBudget', (None,))]
+    assert outputPaths['flightDynamics'] is None
+
+def test_03_critical_path_and_cycles():
+    """
+        Test: critical path follows the longest dependent chain, and cycles are rejected
+    """
+    dependencies = {'flightDynamics': [], 'regulatoryMap': [], 'airLinkBudget': ['flightDynamics']}
+    timings = {'flightDynamics': {'duration': 2}, 'regulatoryMap': {'duration': 3}, 'airLinkBudget': {'duration': 2}}
+    assert getCriticalPath(dependencies, timings) == ['flightDynamics', 'airLinkBudget']
+    with pytest.raises(Exception):
+        checkModulesDependencies({'a': ['b'], 'b': ['a']})
+
+def test_04_resume_skips_completed_stages(tmp_path):
+    """
+        Test: run modules where flight dynamics completed in previous run, check that:
+        - completed stage is not run again, and its output is passed downstream
+        - new completed stages are recorded in the manifest
+    """
+    calls = []
+    setStageCompleted(str(tmp_path), 'flightDynamics', 'previous-output')
+    outputPaths = runModules({'modules': {tag: {'data': 'run'} for tag in ('flightDynamics', 'airLinkBudget')}}, str(tmp_path), getModuleHandlers(calls, 0))
+    assert calls == [('airLinkBudget', ('previous-output',))]
+    assert outputPaths['flightDynamics'] == 'previous-output'
+    assert isStageCompleted(str(tmp_path), 'airLinkBudget')
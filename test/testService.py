@@ -0,0 +1,80 @@
+#! /usr/bin/env python3
+
+# Copyright (C)
+# Author: alberto-ferrero
+
+""" Test to cover simulation service mode """
+
+import os
+import json
+import time
+import threading
+import requests
+from http.server import ThreadingHTTPServer
+
+from src.orchestrator.service import SimulationService, getServiceRequestHandler
+from src.utils.filemanager import readInputYmlFile
+
+def getSimulationRequest() -> dict:
+    return {
+        'id': 'test-service',
+        'simulationWindow': {'start': '2026-01-01T00:00:00.00Z', 'end': '2026-01-02T00:00:00.00Z'},
+        'modules': {
+            'flightDynamics': {'data': 'local', 'address': os.path.abspath(os.path.join('test', 'data', 'test_flightdynamics', '18-satellites'))}
+        },
+        'analysis': [],
+        'satellites': {'file': 'rsn-018-constellation.yml', 'groundcontacts': False, 'spacecontacts': False}
+    }
+
+def test_01_post_and_run_simulations(tmp_path):
+    """
+        Test: post Simulation Requests to the service, check that:
+        - invalid request is refused
+        - valid request is queued, run and its output folder returned
+    """
+    service = SimulationService(outputFolderPath=str(tmp_path))
+    service.start()
+    server = ThreadingHTTPServer(('127.0.0.1', 0), getServiceRequestHandler(service))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = 'http://127.0.0.1:{}/simulations'.format(server.server_address[1])
+    try:
+        res = requests.post(url, data=json.dumps({'id': 'test-service'}))
+        assert res.status_code == 400
+        assert 'simulationWindow' in res.json()['error']
+
+        res = requests.post(url, data=json.dumps(getSimulationRequest()))
+        assert res.status_code == 202
+        simId = res.json()['id']
+        simulation = requests.get(url + '/' + simId).json()
+        tick = time.time()
+        while simulation['status'] in ('queued', 'running') and time.time() - tick < 60:
+            time.sleep(0.2)
+            simulation = requests.get(url + '/' + simId).json()
+        assert simulation['status'] == 'completed'
+        assert os.path.isfile(os.path.join(simulation['outputPath'], 'data', 'flightdynamics', 'rsn-A-P01-01_orbit-state.csv'))
+        assert requests.get(url + '/unknown').status_code == 404
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def test_02_posted_yaml_parsed_as_input_files(tmp_path):
+    """
+        Test: post a Simulation Request as yaml, check that it is parsed as the same input file, with floats with exponent and yes/no strings
+    """
+    content = 'id: test-service\nvalue: 1e6\nflag: yes\nenabled: true\n'
+    filePath = str(tmp_path / 'request.yml')
+    with open(filePath, 'w') as f:
+        f.write(content)
+    service = SimulationService(outputFolderPath=str(tmp_path))
+    submitted = []
+    service.submit = lambda simulationRequest: submitted.append(simulationRequest) or {'id': 'test-service'}
+    server = ThreadingHTTPServer(('127.0.0.1', 0), getServiceRequestHandler(service))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        res = requests.post('http://127.0.0.1:{}/simulations'.format(server.server_address[1]), data=content)
+        assert res.status_code == 202
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert submitted == [readInputYmlFile(filePath)]
+    assert submitted[0]['value'] == 1e6 and submitted[0]['flag'] == 'yes' and submitted[0]['enabled'] is True
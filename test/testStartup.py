@@ -0,0 +1,30 @@
+#! /usr/bin/env python3
+
+# Copyright (C)
+# Author: alberto-ferrero
+
+""" Test to cover simulator start up, not loading plotting and report dependencies """
+
+import sys
+import json
+import subprocess
+
+#Dependencies to be loaded only by report and analysis sections
+HEAVY_MODULES = ['matplotlib', 'geopandas', 'docx', 'PIL', 'pymap3d', 'pyorb', 'scipy']
+
+#Max import duration [s], generous as about 0.4 s, to catch start up getting slower by heavy imports
+MAX_IMPORT_DURATION = 2.0
+
+def test_01_orchestrator_import_is_light():
+    """
+        Test: import orchestrator in a fresh interpreter, check that:
+        - no heavy dependency is loaded
+        - import time is below a max duration, as start up benchmark
+    """
+    code = ("import sys, time, json\n"
+            "tick = time.perf_counter()\n"
+            "import src.orchestrator.main, src.orchestrator.sweep\n"
+            "print(json.dumps({'duration': time.perf_counter() - tick, 'modules': [m for m in sys.modules if m.split('.')[0] in " + repr(HEAVY_MODULES) + "]}))")
+    result = json.loads(subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout.strip().split('\n')[-1])
+    assert result['modules'] == []
+    assert result['duration'] < MAX_IMPORT_DURATION
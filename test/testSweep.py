@@ -0,0 +1,61 @@
+#! /usr/bin/env python3
+
+# Copyright (C)
+# Author: alberto-ferrero
+
+""" Test to cover parameter sweep variants """
+
+from src.orchestrator.sweep import getSweepVariants, getSweepPhases, setRequestValue
+
+def getBaseRequest() -> dict:
+    return {
+        'id': 'test-sweep',
+        'simulationWindow': {'start': '2026-01-01T00:00:00.00Z', 'end': '2026-01-02T00:00:00.00Z'},
+        'modules': {
+            'flightDynamics': {'data': 'run', 'address': 'http://localhost', 'properties': {'propagator': 'KEPLERIAN'}}
+        },
+        'analysis': [],
+        'satellites': {'file': 'rsn-018-constellation.yml', 'groundcontacts': False, 'spacecontacts': False},
+        'userterminals': [{'file': '01H_Gov_Defense.txt', 'usage': 0.1}]
+    }
+
+def test_01_variants_from_overrides_matrix():
+    """
+        Test: build variants as combination of overrides, check that:
+        - nested and list values are overridden, base request is untouched
+        - variants with same upstream inputs propagate only once, in first phase
+    """
+    baseRequest = getBaseRequest()
+    variants = getSweepVariants(baseRequest, {'userterminals.0.usage': [0.1, 0.2], 'analysis': [['contacts'], ['latency']]})
+    assert len(variants) == 4
+    variantId, overrides, simulationRequest = variants[3]
+    assert variantId == 'test-sweep-v003'
+    assert overrides == {'userterminals.0.usage': 0.2, 'analysis': ['latency']}
+    assert simulationRequest['userterminals'][0]['usage'] == 0.2
+    assert simulationRequest['cache']['enabled']
+    assert baseRequest['userterminals'][0]['usage'] == 0.1
+
+    phases = getSweepPhases(variants)
+    assert [[variant[0] for variant in phaseVariants] for phaseVariants in phases] == [['test-sweep-v000', 'test-sweep-v002'], ['test-sweep-v001', 'test-sweep-v003']]
+
+def test_03_sweep_phases_by_module_cache_key():
+    """
+        Test: split variants with the same propagation, and different link budgets, check that:
+        - propagation is computed by the first variant only, before the others
+        - each link budget is computed by one variant, and variants with the same one run after it
+    """
+    baseRequest = getBaseRequest()
+    baseRequest['modules']['airLinkBudget'] = {'data': 'run', 'address': 'http://localhost'}
+    variants = getSweepVariants(baseRequest, {'modules.airLinkBudget.address': ['http://localhost:1', 'http://localhost:2'], 'analysis': [['contacts'], ['latency']]})
+    phases = getSweepPhases(variants)
+    assert [[variant[0] for variant in phaseVariants] for phaseVariants in phases] == [['test-sweep-v000'], ['test-sweep-v001', 'test-sweep-v002'], ['test-sweep-v003']]
+
+def test_02_set_request_value_creates_missing_keys():
+    """
+        Test: set value on a path not defined in the request
+    """
+    simulationRequest = getBaseRequest()
+    setRequestValue(simulationRequest, 'modules.flightDynamics.properties.periodicUpdate', 500000)
+    setRequestValue(simulationRequest, 'cache.maxEntries', 10)
+    assert simulationRequest['modules']['flightDynamics']['properties']['periodicUpdate'] == 500000
+    assert simulationRequest['cache'] == {'maxEntries': 10}
@@ -0,0 +1,38 @@
+#! /usr/bin/env python3
+
+# Copyright (C)
+# Author: alberto-ferrero
+
+""" Test to cover stages tracer """
+
+import os
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from src.utils.tracer import resetTrace, span, tracedCall, getCurrentSpanId, saveTrace
+
+def test_01_nested_spans_exported(tmp_path):
+    """
+        Test: trace nested spans, also across threads, check that:
+        - parents are set, for spans opened in the same thread and in pool threads
+        - Chrome trace and timings files are written
+    """
+    resetTrace()
+    with span('modules'):
+        with span('read csv', 'io', file='sat_orbit-state.csv'):
+            pass
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            executor.submit(tracedCall, 'flightDynamics', 'module', getCurrentSpanId(), lambda: None).result()
+    saveTrace(str(tmp_path))
+
+    with open(os.path.join(tmp_path, 'timings.json')) as f:
+        timings = json.load(f)
+    spans = {s['name']: s for s in timings['spans']}
+    assert spans['read csv']['parent'] == spans['modules']['id']
+    assert spans['flightDynamics']['parent'] == spans['modules']['id']
+    assert timings['summary']['io/read csv']['count'] == 1
+
+    with open(os.path.join(tmp_path, 'trace.json')) as f:
+        events = json.load(f)['traceEvents']
+    assert len(events) == 3
+    assert all(event['ph'] == 'X' for event in events)